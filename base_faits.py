@@ -13,7 +13,96 @@ La base de faits represente l'ensemble des informations connues
 sur le PC a evaluer, collectees via le questionnaire utilisateur.
 """
 
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Sequence, Tuple
+
+
+# Ordre de reference des caracteristiques a choix multiples (ordre du questionnaire)
+CARACTERISTIQUES = [
+    "taille_ecran",
+    "usage",
+    "processeur",
+    "generation_cpu",
+    "ram",
+    "stockage",
+    "carte_graphique",
+    "ecran",
+    "taux_rafraichissement",
+    "marque",
+    "poids"
+]
+
+
+# Questions du questionnaire, dans l'ordre : (cle du fait, question)
+QUESTIONS = (
+    ("taille_ecran", "Quelle est la taille de l'ecran ?"),
+    ("usage", "Quel est l'usage principal prevu ?"),
+    ("processeur", "Quel est le type de processeur ?"),
+    ("generation_cpu", "Quelle est la generation du processeur ?"),
+    ("ram", "Quelle est la quantite de RAM ?"),
+    ("stockage", "Quel est le type et la capacite de stockage ?"),
+    ("carte_graphique", "Quel est le type de carte graphique ?"),
+    ("ecran", "Quelle est la definition de l'ecran ?"),
+    ("taux_rafraichissement", "Quel est le taux de rafraichissement de l'ecran ?"),
+    ("marque", "Quelle est la marque du PC ?"),
+    ("poids", "Quelle est la categorie de poids du PC ?"),
+    ("pave_numerique", "Le PC possede-t-il un pave numerique ?"),
+    ("clavier_retroeclaire", "Le clavier est-il retroeclaire ?"),
+    ("clavier_rgb", "Le clavier possede-t-il un eclairage RGB ?"),
+    ("thunderbolt", "Le PC possede-t-il un port Thunderbolt ?"),
+    ("webcam_hd", "Le PC possede-t-il une webcam HD ou superieure ?"),
+    ("lecteur_empreinte", "Le PC possede-t-il un lecteur d'empreintes digitales ?"),
+)
+
+# Valeurs d'une option booleenne, dans l'ordre de leur code (0, 1)
+VALEURS_BOOLEENNES = (False, True)
+
+# Reponses acceptees aux questions oui/non
+REPONSES_OUI = ("oui", "o", "yes", "y", "1")
+REPONSES_NON = ("non", "n", "no", "0")
+
+
+def lire_reponse_oui_non(reponse: str) -> bool:
+    """
+    Interprete la reponse a une question oui/non.
+    
+    Args:
+        reponse: Reponse saisie
+        
+    Returns:
+        True si oui, False si non
+        
+    Raises:
+        ValueError: Reponse non reconnue (message destine a l'utilisateur)
+    """
+    reponse = reponse.strip().lower()
+    if reponse in REPONSES_OUI:
+        return True
+    if reponse in REPONSES_NON:
+        return False
+    raise ValueError("Reponse non valide. Veuillez repondre par 'oui' ou 'non'.")
+
+
+def lire_reponse_choix(reponse: str, options: Sequence[str]) -> str:
+    """
+    Interprete la reponse (numero d'option) a une question a choix multiples.
+    
+    Args:
+        reponse: Reponse saisie
+        options: Liste des options possibles
+        
+    Returns:
+        L'option choisie
+        
+    Raises:
+        ValueError: Numero invalide ou hors limites (message destine a l'utilisateur)
+    """
+    try:
+        index = int(reponse.strip()) - 1
+    except ValueError:
+        raise ValueError("Veuillez entrer un numero valide.") from None
+    if 0 <= index < len(options):
+        return options[index]
+    raise ValueError(f"Veuillez entrer un numero entre 1 et {len(options)}.")
 
 
 class BaseFaits:
@@ -25,130 +114,156 @@ class BaseFaits:
     
     Attributes:
         faits (Dict[str, Any]): Dictionnaire des specifications collectees
-        options_* (List[str]): Listes des options possibles pour chaque caracteristique
+        options_* (Tuple[str, ...]): Options possibles de chaque caracteristique
+            (attributs de classe : un seul schema partage par toutes les instances)
     """
     
+    # ============================================================
+    # DEFINITION DES OPTIONS POUR CHAQUE CARACTERISTIQUE
+    # (tuples immuables partages par toutes les instances)
+    # ============================================================
+    
+    options_taille_ecran = (
+        "14 pouces",
+        "15.6 pouces",
+        "16 pouces",
+        "17 pouces ou plus"
+    )
+    
+    options_usage = (
+        "Bureautique",
+        "Multimedia",
+        "Gaming",
+        "Creation (video, 3D, photo)",
+        "Professionnel / Developpement"
+    )
+    
+    options_processeur = (
+        "Intel Core i3",
+        "Intel Core i5",
+        "Intel Core i7",
+        "Intel Core i9",
+        "AMD Ryzen 3",
+        "AMD Ryzen 5",
+        "AMD Ryzen 7",
+        "AMD Ryzen 9",
+        "Apple M1",
+        "Apple M2",
+        "Apple M3",
+        "Apple M4",
+        "Intel Celeron / Pentium",
+        "Autre / Ne sait pas"
+    )
+    
+    options_generation_cpu = (
+        "Ancienne generation (avant 2022)",
+        "Generation recente (2022-2023)",
+        "Derniere generation (2024-2025)",
+        "Ne sait pas"
+    )
+    
+    options_ram = (
+        "4 Go",
+        "8 Go",
+        "16 Go",
+        "32 Go",
+        "64 Go ou plus"
+    )
+    
+    options_stockage = (
+        "HDD uniquement",
+        "SSD 256 Go",
+        "SSD 512 Go",
+        "SSD 1 To",
+        "SSD 2 To ou plus"
+    )
+    
+    options_carte_graphique = (
+        "Graphique integre (Intel UHD, AMD Radeon integre)",
+        "GPU integre Apple (M1/M2/M3/M4)",
+        "NVIDIA GTX serie (GTX 1650, 1660)",
+        "NVIDIA RTX entree de gamme (RTX 3050, 4050)",
+        "NVIDIA RTX milieu de gamme (RTX 3060, 4060)",
+        "NVIDIA RTX haut de gamme (RTX 4070, 4080, 4090)",
+        "AMD Radeon RX dedie",
+        "Carte professionnelle (Quadro, RTX A series)"
+    )
+    
+    options_ecran = (
+        "HD (1366x768)",
+        "Full HD (1920x1080)",
+        "2.5K / QHD (2560x1440)",
+        "4K UHD (3840x2160)",
+        "OLED Full HD",
+        "OLED 4K"
+    )
+    
+    options_taux_rafraichissement = (
+        "60 Hz",
+        "90 Hz",
+        "120 Hz",
+        "144 Hz",
+        "165 Hz ou plus"
+    )
+    
+    options_marque = (
+        "Acer",
+        "ASUS",
+        "Apple",
+        "Dell",
+        "HP",
+        "Lenovo",
+        "MSI",
+        "Razer",
+        "Samsung",
+        "Autre marque"
+    )
+    
+    options_poids = (
+        "Ultraportable (moins de 1.3 kg)",
+        "Leger (1.3 kg - 2 kg)",
+        "Standard (plus de 2 kg)"
+    )
+    
+    # Options booleennes (oui/non)
+    options_booleennes = (
+        "pave_numerique",
+        "clavier_retroeclaire",
+        "clavier_rgb",
+        "thunderbolt",
+        "webcam_hd",
+        "lecteur_empreinte"
+    )
+    
     def __init__(self):
-        """Initialise la base de faits avec les options possibles."""
+        """Initialise une base de faits vide (les listes d'options sont partagees)."""
         
         # Dictionnaire pour stocker les faits (specifications de l'utilisateur)
         self.faits: Dict[str, Any] = {}
+    
+    def obtenir_attributs(self) -> List[str]:
+        """
+        Retourne la liste ordonnee de toutes les cles de faits.
         
-        # ============================================================
-        # DEFINITION DES OPTIONS POUR CHAQUE CARACTERISTIQUE
-        # ============================================================
-        
-        self.options_taille_ecran = [
-            "14 pouces",
-            "15.6 pouces",
-            "16 pouces",
-            "17 pouces ou plus"
-        ]
-        
-        self.options_usage = [
-            "Bureautique",
-            "Multimedia",
-            "Gaming",
-            "Creation (video, 3D, photo)",
-            "Professionnel / Developpement"
-        ]
-        
-        self.options_processeur = [
-            "Intel Core i3",
-            "Intel Core i5",
-            "Intel Core i7",
-            "Intel Core i9",
-            "AMD Ryzen 3",
-            "AMD Ryzen 5",
-            "AMD Ryzen 7",
-            "AMD Ryzen 9",
-            "Apple M1",
-            "Apple M2",
-            "Apple M3",
-            "Apple M4",
-            "Intel Celeron / Pentium",
-            "Autre / Ne sait pas"
-        ]
-        
-        self.options_generation_cpu = [
-            "Ancienne generation (avant 2022)",
-            "Generation recente (2022-2023)",
-            "Derniere generation (2024-2025)",
-            "Ne sait pas"
-        ]
-        
-        self.options_ram = [
-            "4 Go",
-            "8 Go",
-            "16 Go",
-            "32 Go",
-            "64 Go ou plus"
-        ]
-        
-        self.options_stockage = [
-            "HDD uniquement",
-            "SSD 256 Go",
-            "SSD 512 Go",
-            "SSD 1 To",
-            "SSD 2 To ou plus"
-        ]
-        
-        self.options_carte_graphique = [
-            "Graphique integre (Intel UHD, AMD Radeon integre)",
-            "GPU integre Apple (M1/M2/M3/M4)",
-            "NVIDIA GTX serie (GTX 1650, 1660)",
-            "NVIDIA RTX entree de gamme (RTX 3050, 4050)",
-            "NVIDIA RTX milieu de gamme (RTX 3060, 4060)",
-            "NVIDIA RTX haut de gamme (RTX 4070, 4080, 4090)",
-            "AMD Radeon RX dedie",
-            "Carte professionnelle (Quadro, RTX A series)"
-        ]
-        
-        self.options_ecran = [
-            "HD (1366x768)",
-            "Full HD (1920x1080)",
-            "2.5K / QHD (2560x1440)",
-            "4K UHD (3840x2160)",
-            "OLED Full HD",
-            "OLED 4K"
-        ]
-        
-        self.options_taux_rafraichissement = [
-            "60 Hz",
-            "90 Hz",
-            "120 Hz",
-            "144 Hz",
-            "165 Hz ou plus"
-        ]
-        
-        self.options_marque = [
-            "Acer",
-            "ASUS",
-            "Apple",
-            "Dell",
-            "HP",
-            "Lenovo",
-            "MSI",
-            "Razer",
-            "Samsung",
-            "Autre marque"
-        ]
-        
-        self.options_poids = [
-            "Ultraportable (moins de 1.3 kg)",
-            "Leger (1.3 kg - 2 kg)",
-            "Standard (plus de 2 kg)"
-        ]
+        Returns:
+            Les caracteristiques a choix multiples puis les options booleennes
+        """
+        return CARACTERISTIQUES + list(self.options_booleennes)
+    
+    def obtenir_options(self, cle: str) -> Sequence[Any]:
+        """
+        Retourne les valeurs possibles d'un fait.
         
-        # Liste des options booleennes (oui/non)
-        self.options_booleennes = [
-            "pave_numerique",
-            "clavier_retroeclaire",
-            "clavier_rgb",
-            "thunderbolt",
-            "webcam_hd",
-            "lecteur_empreinte"
-        ]
+        Args:
+            cle: La cle du fait
+            
+        Returns:
+            Le tuple des options (False/True pour une option booleenne),
+            ou un tuple vide si la cle est inconnue
+        """
+        if cle in self.options_booleennes:
+            return VALEURS_BOOLEENNES
+        return getattr(self, f"options_{cle}", ())
     
     def poser_question_oui_non(self, question: str) -> bool:
         """
@@ -161,16 +276,12 @@ class BaseFaits:
             True si oui, False si non
         """
         while True:
-            reponse = input(f"{question} (oui/non) : ").strip().lower()
-            
-            if reponse in ["oui", "o", "yes", "y", "1"]:
-                return True
-            elif reponse in ["non", "n", "no", "0"]:
-                return False
-            else:
-                print("[!] Reponse non valide. Veuillez repondre par 'oui' ou 'non'.")
+            try:
+                return lire_reponse_oui_non(input(f"{question} (oui/non) : "))
+            except ValueError as erreur:
+                print(f"[!] {erreur}")
     
-    def poser_question_choix(self, question: str, options: List[str]) -> str:
+    def poser_question_choix(self, question: str, options: Sequence[str]) -> str:
         """
         Pose une question a choix multiples a l'utilisateur.
         
@@ -187,110 +298,36 @@ class BaseFaits:
         
         while True:
             try:
-                choix = input("Votre choix (numero) : ").strip()
-                index = int(choix) - 1
-                
-                if 0 <= index < len(options):
-                    return options[index]
-                else:
-                    print(f"[!] Veuillez entrer un numero entre 1 et {len(options)}.")
-            except ValueError:
-                print("[!] Veuillez entrer un numero valide.")
+                return lire_reponse_choix(input("Votre choix (numero) : "), options)
+            except ValueError as erreur:
+                print(f"[!] {erreur}")
     
-    def collecter_faits(self) -> None:
+    def collecter_faits(self, questions: Iterable[Tuple[str, str]] = QUESTIONS) -> None:
         """
         Collecte toutes les specifications du PC aupres de l'utilisateur.
         
         Cette methode implemente le chainage avant : elle collecte tous
         les faits d'abord, puis le moteur d'inference evaluera les regles.
+        
+        Args:
+            questions: Questions a poser (defaut: QUESTIONS, toutes dans l'ordre ;
+                       voir QuestionsAdaptatives pour le mode adaptatif)
         """
         print("\n" + "-" * 50)
         print("    QUESTIONNAIRE - SPECIFICATIONS DU PC")
         print("-" * 50)
         print("Repondez aux questions suivantes concernant le PC.\n")
         
-        # Questions a choix multiples pour les specifications principales
-        self.faits["taille_ecran"] = self.poser_question_choix(
-            "Quelle est la taille de l'ecran ?",
-            self.options_taille_ecran
-        )
-        
-        self.faits["usage"] = self.poser_question_choix(
-            "Quel est l'usage principal prevu ?",
-            self.options_usage
-        )
-        
-        self.faits["processeur"] = self.poser_question_choix(
-            "Quel est le type de processeur ?",
-            self.options_processeur
-        )
-        
-        self.faits["generation_cpu"] = self.poser_question_choix(
-            "Quelle est la generation du processeur ?",
-            self.options_generation_cpu
-        )
-        
-        self.faits["ram"] = self.poser_question_choix(
-            "Quelle est la quantite de RAM ?",
-            self.options_ram
-        )
-        
-        self.faits["stockage"] = self.poser_question_choix(
-            "Quel est le type et la capacite de stockage ?",
-            self.options_stockage
-        )
-        
-        self.faits["carte_graphique"] = self.poser_question_choix(
-            "Quel est le type de carte graphique ?",
-            self.options_carte_graphique
-        )
-        
-        self.faits["ecran"] = self.poser_question_choix(
-            "Quelle est la definition de l'ecran ?",
-            self.options_ecran
-        )
-        
-        self.faits["taux_rafraichissement"] = self.poser_question_choix(
-            "Quel est le taux de rafraichissement de l'ecran ?",
-            self.options_taux_rafraichissement
-        )
-        
-        self.faits["marque"] = self.poser_question_choix(
-            "Quelle est la marque du PC ?",
-            self.options_marque
-        )
-        
-        self.faits["poids"] = self.poser_question_choix(
-            "Quelle est la categorie de poids du PC ?",
-            self.options_poids
-        )
-        
-        # Questions oui/non pour les options supplementaires
-        print("\n--- Options supplementaires ---")
-        
-        self.faits["pave_numerique"] = self.poser_question_oui_non(
-            "Le PC possede-t-il un pave numerique ?"
-        )
-        
-        self.faits["clavier_retroeclaire"] = self.poser_question_oui_non(
-            "Le clavier est-il retroeclaire ?"
-        )
-        
-        self.faits["clavier_rgb"] = self.poser_question_oui_non(
-            "Le clavier possede-t-il un eclairage RGB ?"
-        )
-        
-        self.faits["thunderbolt"] = self.poser_question_oui_non(
-            "Le PC possede-t-il un port Thunderbolt ?"
-        )
-        
-        self.faits["webcam_hd"] = self.poser_question_oui_non(
-            "Le PC possede-t-il une webcam HD ou superieure ?"
-        )
-        
-        self.faits["lecteur_empreinte"] = self.poser_question_oui_non(
-            "Le PC possede-t-il un lecteur d'empreintes digitales ?"
-        )
+        options_annoncees = False
+        for cle, question in questions:
+            if cle in self.options_booleennes:
+                # Options supplementaires (questions oui/non)
+                if not options_annoncees:
+                    print("\n--- Options supplementaires ---")
+                    options_annoncees = True
+                self.faits[cle] = self.poser_question_oui_non(question)
+            else:
+                self.faits[cle] = self.poser_question_choix(question, self.obtenir_options(cle))
         
         print("\n[OK] Specifications collectees. Analyse en cours...\n")
     
@@ -307,6 +344,34 @@ class BaseFaits:
         """
         return self.faits.get(cle, defaut)
     
+    def valider(self, faits: Dict[str, Any]) -> List[str]:
+        """
+        Verifie un dictionnaire de faits par rapport aux listes d'options.
+        
+        Chaque cle doit etre une caracteristique connue et chaque valeur
+        une des options de cette caracteristique (un booleen pour une
+        option booleenne). Un fait absent ou None est accepte.
+        
+        Args:
+            faits: Dictionnaire de faits a verifier
+            
+        Returns:
+            Liste des erreurs (vide si les faits sont valides)
+        """
+        erreurs = []
+        for cle, valeur in faits.items():
+            if valeur is None and (cle in CARACTERISTIQUES or cle in self.options_booleennes):
+                continue
+            if cle in self.options_booleennes:
+                if not isinstance(valeur, bool):
+                    erreurs.append(f"{cle} : booleen attendu, {valeur!r} recu")
+            elif cle in CARACTERISTIQUES:
+                if valeur not in self.obtenir_options(cle):
+                    erreurs.append(f"{cle} : valeur inconnue {valeur!r}")
+            else:
+                erreurs.append(f"Caracteristique inconnue : {cle}")
+        return erreurs
+    
     def ajouter_fait(self, cle: str, valeur: Any) -> None:
         """
         Ajoute ou modifie un fait dans la base de faits.
@@ -355,7 +420,8 @@ class BaseFaits:
         
         print("\nOptions :")
         for label, cle in options:
-            valeur = "Oui" if self.faits.get(cle, False) else "Non"
+            valeur = self.faits.get(cle)
+            valeur = "Non specifie" if valeur is None else ("Oui" if valeur else "Non")
             print(f"  - {label} : {valeur}")
         
         print("-" * 50)
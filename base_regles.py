@@ -8,6 +8,19 @@ Ce module contient la classe BaseRegles qui gere :
 - La definition des regles d'estimation de prix
 - L'ajout de nouvelles regles
 - L'acces aux regles pour le moteur d'inference
+- La compilation des regles (voir compilation_regles.py)
+- Le chargement des regles depuis des fichiers JSON externes
+  (rechargement a chaud : voir rechargement_regles.py)
+
+Les modifications sont faites par copie : chaque ajout ou suppression
+publie une nouvelle version (liste de regles et instantane compile) sans
+toucher a la precedente. Un moteur qui evalue des faits pendant une
+modification termine sur la version qu'il a lue ; les ecrivains sont
+serialises par un verrou que les lecteurs ne prennent jamais.
+
+Pour ajouter ou supprimer beaucoup de regles, BaseRegles.transaction()
+regroupe les modifications et ne compile la base qu'une fois, a la
+validation (voir TransactionRegles).
 
 Chaque regle est composee de :
 - nom : nom de la gamme de prix
@@ -19,7 +32,119 @@ Chaque regle est composee de :
 - confiance_base : niveau de confiance de base (0 a 1)
 """
 
-from typing import List, Dict, Optional
+import json
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, List, Dict, Optional, Tuple
+
+from compilation_regles import IndexRegles, InstantaneRegles, RegleCompilee, compiler_regle
+
+
+journal = logging.getLogger("base_regles")
+
+
+# Champs obligatoires d'une regle lue dans un fichier JSON
+CHAMPS_OBLIGATOIRES = ("nom", "prix_min", "prix_max", "description", "confiance_base")
+
+# Types de conditions d'une regle (facultatifs dans un fichier JSON)
+TYPES_CONDITIONS = ("conditions_requises", "conditions_optionnelles", "conditions_excluantes")
+
+
+def creer_regle(nom: str, prix_min: int, prix_max: int, description: str,
+                conditions_requises: Dict, conditions_optionnelles: Dict = None,
+                conditions_excluantes: Dict = None, confiance_base: float = 0.75) -> Dict:
+    """
+    Construit le dictionnaire d'une regle (voir BaseRegles.ajouter_regle).
+    
+    Returns:
+        La regle, avec les trois dictionnaires de conditions
+    """
+    return {
+        "nom": nom,
+        "prix_min": prix_min,
+        "prix_max": prix_max,
+        "description": description,
+        "conditions_requises": conditions_requises,
+        "conditions_optionnelles": conditions_optionnelles or {},
+        "conditions_excluantes": conditions_excluantes or {},
+        "confiance_base": confiance_base
+    }
+
+
+def normaliser_regle(regle: Any) -> Dict:
+    """
+    Verifie une regle lue dans un fichier et complete ses conditions absentes.
+    
+    Args:
+        regle: La regle decodee du JSON
+        
+    Returns:
+        La regle, avec les trois dictionnaires de conditions
+        
+    Raises:
+        ValueError: Si la regle n'a pas la forme attendue
+    """
+    if not isinstance(regle, dict):
+        raise ValueError("Une regle doit etre un objet JSON")
+    manquants = [champ for champ in CHAMPS_OBLIGATOIRES if champ not in regle]
+    if manquants:
+        raise ValueError(f"Regle '{regle.get('nom', '?')}' : champ(s) manquant(s) {', '.join(manquants)}")
+    for type_conditions in TYPES_CONDITIONS:
+        conditions = regle.setdefault(type_conditions, {})
+        if not isinstance(conditions, dict):
+            raise ValueError(f"Regle '{regle['nom']}' : {type_conditions} doit etre un objet JSON")
+    return regle
+
+
+def decoder_fichier_regles(contenu: bytes, chemin: str) -> List[Dict]:
+    """
+    Decode le contenu d'un fichier de regles JSON.
+    
+    Args:
+        contenu: Contenu brut du fichier (JSON encode en UTF-8)
+        chemin: Chemin du fichier (pour les messages d'erreur)
+        
+    Returns:
+        La liste des regles du fichier
+        
+    Raises:
+        ValueError: Si le contenu n'est pas un fichier de regles valide
+    """
+    contenu = json.loads(contenu.decode("utf-8"))
+    if isinstance(contenu, dict):
+        contenu = contenu.get("regles")
+    if not isinstance(contenu, list):
+        raise ValueError(f"{chemin} : liste de regles attendue")
+    try:
+        return [normaliser_regle(regle) for regle in contenu]
+    except ValueError as erreur:
+        raise ValueError(f"{chemin} : {erreur}") from erreur
+
+
+def lire_fichiers_regles(chemins: List[str]) -> List[Dict]:
+    """
+    Lit des fichiers de regles JSON, dans l'ordre donne.
+    
+    Chaque fichier contient une liste de regles, ou un objet {"regles": [...]}.
+    Les regles ont les memes champs que celles de _creer_regles_initiales.
+    
+    Args:
+        chemins: Chemins des fichiers de regles
+        
+    Returns:
+        La liste des regles de tous les fichiers
+        
+    Raises:
+        OSError: Si un fichier ne peut pas etre lu
+        ValueError: Si un fichier n'est pas un fichier de regles valide
+    """
+    regles = []
+    for chemin in chemins:
+        with open(chemin, "rb") as fichier:
+            regles.extend(decoder_fichier_regles(fichier.read(), chemin))
+    return regles
 
 
 class BaseRegles:
@@ -30,12 +155,37 @@ class BaseRegles:
     la gamme de prix d'un PC portable selon ses specifications.
     
     Attributes:
-        regles (List[Dict]): Liste des regles du systeme expert
+        regles (Tuple[Dict, ...]): Regles de la version courante (lecture
+                                   seule, voir la propriete regles)
+        version (int): Compteur incremente a chaque modification de la base
     """
     
-    def __init__(self):
-        """Initialise la base de regles avec les regles predefinies."""
-        self.regles: List[Dict] = self._creer_regles_initiales()
+    def __init__(self, fichiers: Optional[List[str]] = None, instantane: Optional[str] = None):
+        """
+        Initialise la base de regles.
+        
+        Args:
+            fichiers: Fichiers de regles JSON a charger (defaut: regles predefinies)
+            instantane: Instantane binaire des fichiers de regles (voir
+                        instantane_binaire.py) : recharge s'il est a jour,
+                        reconstruit sinon ; ignore sans fichiers de regles
+        """
+        # Regles compilees et index de la derniere version (voir obtenir_instantane)
+        self._instantane: Optional[InstantaneRegles] = None
+        # Serialise les modifications (et la compilation d'une version perimee)
+        self._verrou = threading.Lock()
+        self.version: int = 0
+        
+        if fichiers and instantane:
+            # Import local : instantane_binaire importe ce module
+            from instantane_binaire import charger_ou_construire
+            self._instantane, charge = charger_ou_construire(instantane, fichiers)
+            self._regles: Optional[Tuple[Dict, ...]] = None  # Relues au premier acces (_dictionnaires)
+            journal.info("Instantane %s : %s", "charge" if charge else "reconstruit", instantane)
+        elif fichiers:
+            self._regles = tuple(lire_fichiers_regles(fichiers))
+        else:
+            self._regles = tuple(self._creer_regles_initiales())
     
     def _creer_regles_initiales(self) -> List[Dict]:
         """
@@ -295,29 +445,165 @@ class BaseRegles:
             }
         ]
     
-    def obtenir_regles(self) -> List[Dict]:
+    @property
+    def regles(self) -> Tuple[Dict, ...]:
+        """
+        Regles de la version courante, en lecture seule.
+        
+        La base se modifie par ajouter_regle, supprimer_regle, transaction,
+        charger_fichiers ou installer_instantane, qui publient chacune une
+        nouvelle version : une liste modifiee directement ne serait jamais
+        vue par les moteurs, qui lisent l'instantane compile.
+        """
+        return self._dictionnaires()
+    
+    def obtenir_regles(self) -> Tuple[Dict, ...]:
+        """
+        Retourne toutes les regles.
+        
+        Returns:
+            Tuple des regles du systeme expert (lecture seule)
+        """
+        return self._dictionnaires()
+    
+    def _dictionnaires(self) -> Tuple[Dict, ...]:
+        """Retourne les regles, relues au premier acces pour une base chargee d'un instantane."""
+        regles = self._regles
+        if regles is None:
+            with self._verrou:
+                regles = self._dictionnaires_verrou_tenu()
+        return regles
+    
+    def _dictionnaires_verrou_tenu(self) -> Tuple[Dict, ...]:
+        """Comme _dictionnaires, verrou tenu par l'appelant."""
+        regles = self._regles
+        if regles is None:
+            # Seul l'instantane charge au demarrage laisse les regles a relire
+            instantane = self._instantane
+            regles = self._regles = tuple(instantane.binaire.dictionnaires() if instantane.binaire
+                                          else (regle.regle for regle in instantane.regles))
+        return regles
+    
+    def obtenir_instantane(self) -> InstantaneRegles:
         """
-        Retourne la liste de toutes les regles.
+        Retourne l'instantane immuable (regles compilees + index) de la base.
+        
+        La compilation est effectuee une seule fois puis reutilisee tant
+        que la base n'est pas modifiee (voir l'attribut version). Un
+        instantane n'est jamais modifie : il peut etre lu par plusieurs
+        threads sans verrou.
         
         Returns:
-            Liste des regles du systeme expert
+            L'instantane de la version courante
         """
-        return self.regles
+        instantane = self._instantane
+        # Un instantane publie peut etre en avance d'une version le temps
+        # que _publier incremente l'attribut version
+        if instantane is None or instantane.version < self.version:
+            with self._verrou:
+                instantane = self._instantane_a_jour()
+        return instantane
+    
+    def _instantane_a_jour(self) -> InstantaneRegles:
+        """Retourne l'instantane courant, compile si perime (verrou tenu)."""
+        instantane = self._instantane
+        # La version est lue avant les regles : elle ne peut pas etre plus recente qu'elles
+        version = self.version
+        if instantane is None or instantane.version < version:
+            instantane = InstantaneRegles(self._regles, version)
+            self._instantane = instantane
+        return instantane
+    
+    def _publier(self, instantane: InstantaneRegles, regles: Tuple[Dict, ...]) -> None:
+        """
+        Publie une nouvelle version de la base (verrou tenu).
+        
+        L'instantane, construit pour la version suivante (self.version + 1),
+        est installe avant les regles et le compteur de version : un lecteur
+        qui voit la nouvelle version trouve deja l'instantane correspondant.
+        """
+        if instantane.version != self.version + 1:
+            raise ValueError(f"Instantane de version {instantane.version} publie "
+                             f"apres la version {self.version}")
+        self._instantane = instantane
+        self._regles = tuple(regles)
+        self.version = instantane.version
+    
+    def installer_instantane(self, instantane: InstantaneRegles,
+                             regles: Optional[List[Dict]] = None) -> None:
+        """
+        Remplace les regles de la base par celles d'un instantane deja compile.
+        
+        Evite la recompilation, par exemple au chargement d'un instantane
+        binaire (voir instantane_binaire.py) ou au rechargement d'un fichier
+        de regles compile en arriere-plan. L'instantane installe est une
+        copie portant la nouvelle version de la base (memes regles compilees
+        et meme index) : l'instantane passe en argument n'est pas modifie.
+        
+        La publication est un simple echange de reference : les evaluations
+        en cours terminent sur l'ancien instantane, les suivantes lisent le
+        nouveau, sans verrou.
+        
+        Args:
+            instantane: Instantane a installer (sa version est ignoree)
+            regles: Liste des regles (dictionnaires) de l'instantane, si
+                    l'appelant l'a deja (defaut: reconstruite)
+        """
+        if regles is None:
+            regles = (instantane.binaire.dictionnaires() if instantane.binaire is not None
+                      else [regle_compilee.regle for regle_compilee in instantane.regles])
+        
+        with self._verrou:
+            self._publier(instantane.avec_version(self.version + 1), regles)
+    
+    def obtenir_regles_compilees(self) -> Tuple[RegleCompilee, ...]:
+        """
+        Retourne les regles sous forme compilee, dans le meme ordre.
+        
+        Returns:
+            Tuple des regles compilees (voir obtenir_instantane)
+        """
+        return self.obtenir_instantane().regles
+    
+    def obtenir_index(self) -> IndexRegles:
+        """
+        Retourne l'index inverse (caracteristique, valeur) -> regles.
+        
+        Returns:
+            L'index inverse des regles compilees (voir obtenir_instantane)
+        """
+        return self.obtenir_instantane().index
     
     def obtenir_regle_par_nom(self, nom: str) -> Optional[Dict]:
         """
         Recherche une regle par son nom.
         
+        Plusieurs regles peuvent porter le meme nom (meme gamme de prix) :
+        la recherche passe par l'index nom -> regles de l'instantane
+        (IndexRegles.par_nom) au lieu de parcourir la base.
+        
         Args:
             nom: Le nom de la gamme de prix recherchee
             
         Returns:
             La premiere regle correspondante ou None
         """
-        for regle in self.regles:
-            if regle["nom"] == nom:
-                return regle
-        return None
+        instantane = self.obtenir_instantane()
+        indices = instantane.index.par_nom.get(nom)
+        return instantane.regles[indices[0]].regle if indices else None
+    
+    def obtenir_regles_par_nom(self, nom: str) -> List[Dict]:
+        """
+        Retourne toutes les regles d'un nom, dans l'ordre de la base.
+        
+        Args:
+            nom: Le nom de la gamme de prix recherchee
+            
+        Returns:
+            Liste des regles correspondantes (vide si aucune)
+        """
+        instantane = self.obtenir_instantane()
+        return [instantane.regles[r].regle for r in instantane.index.par_nom.get(nom, ())]
     
     def ajouter_regle(self, nom: str, prix_min: int, prix_max: int,
                       description: str, conditions_requises: Dict,
@@ -327,6 +613,10 @@ class BaseRegles:
         """
         Ajoute une nouvelle regle a la base de regles.
         
+        Seule la nouvelle regle est compilee : l'instantane de la version
+        suivante reprend les regles compilees et l'index de la precedente
+        (voir InstantaneRegles.avec_regle).
+        
         Args:
             nom: Nom de la gamme de prix
             prix_min: Prix minimum de la fourchette
@@ -353,18 +643,13 @@ class BaseRegles:
             ...     confiance_base=0.85
             ... )
         """
-        nouvelle_regle = {
-            "nom": nom,
-            "prix_min": prix_min,
-            "prix_max": prix_max,
-            "description": description,
-            "conditions_requises": conditions_requises,
-            "conditions_optionnelles": conditions_optionnelles or {},
-            "conditions_excluantes": conditions_excluantes or {},
-            "confiance_base": confiance_base
-        }
-        
-        self.regles.append(nouvelle_regle)
+        nouvelle_regle = creer_regle(nom, prix_min, prix_max, description,
+                                     conditions_requises, conditions_optionnelles,
+                                     conditions_excluantes, confiance_base)
+        
+        with self._verrou:
+            instantane = self._instantane_a_jour().avec_regle(nouvelle_regle, self.version + 1)
+            self._publier(instantane, self._dictionnaires_verrou_tenu() + (nouvelle_regle,))
         print(f"[OK] Regle '{nom}' ajoutee avec succes!")
     
     def supprimer_regle(self, nom: str) -> bool:
@@ -377,15 +662,59 @@ class BaseRegles:
         Returns:
             True si la regle a ete supprimee, False sinon
         """
-        for i, regle in enumerate(self.regles):
-            if regle["nom"] == nom:
-                del self.regles[i]
+        with self._verrou:
+            instantane = self._instantane_a_jour()
+            indices = instantane.index.par_nom.get(nom)
+            if indices:
+                i = indices[0]
+                regles = self._dictionnaires_verrou_tenu()
+                self._publier(instantane.sans_regle(i, self.version + 1), regles[:i] + regles[i + 1:])
                 print(f"[OK] Regle '{nom}' supprimee avec succes!")
                 return True
         
         print(f"[!] Regle '{nom}' non trouvee.")
         return False
     
+    def transaction(self) -> "TransactionRegles":
+        """
+        Ouvre une transaction pour ajouter ou supprimer des regles en masse.
+        
+        S'utilise comme gestionnaire de contexte :
+            with base_regles.transaction() as transaction:
+                for regle in regles:
+                    transaction.ajouter(regle)
+                transaction.supprimer_regle("Entree de gamme")
+        
+        Returns:
+            La transaction (voir TransactionRegles)
+        """
+        return TransactionRegles(self)
+    
+    def charger_fichiers(self, chemins: List[str]) -> None:
+        """
+        Remplace les regles de la base par celles de fichiers JSON.
+        
+        Args:
+            chemins: Chemins des fichiers de regles
+            
+        Raises:
+            OSError, ValueError: Voir lire_fichiers_regles (la base est alors inchangee)
+        """
+        regles = lire_fichiers_regles(chemins)
+        self.installer_instantane(InstantaneRegles(regles, 0), regles)
+        print(f"[OK] {len(self.regles)} regle(s) chargee(s) depuis {', '.join(chemins)}")
+    
+    def exporter_json(self, chemin: str) -> None:
+        """
+        Ecrit les regles de la base dans un fichier JSON (format de charger_fichiers).
+        
+        Args:
+            chemin: Chemin du fichier a ecrire
+        """
+        with open(chemin, "w", encoding="utf-8") as fichier:
+            json.dump(self.regles, fichier, ensure_ascii=False, indent=2)
+        print(f"[OK] {len(self.regles)} regle(s) exportee(s) dans {chemin}")
+    
     def nombre_regles(self) -> int:
         """
         Retourne le nombre de regles dans la base.
@@ -413,3 +742,128 @@ class BaseRegles:
             print()
         
         print("=" * 60)
+
+
+class TransactionRegles:
+    """
+    Modifications groupees de la base de regles.
+    
+    Les ajouts et suppressions sont appliques a une copie de travail,
+    sans compilation ni affichage par regle. A la sortie du bloc with,
+    la base est compilee une seule fois (les regles conservees reprennent
+    leur forme compilee) puis publiee comme une nouvelle version ; un
+    bilan est ecrit dans le journal "base_regles". Si le bloc leve une
+    exception, la base n'est pas modifiee.
+    
+    Le verrou d'ecriture de la base est tenu pendant tout le bloc : les
+    lecteurs continuent sur la version courante, mais les methodes
+    ajouter_regle / supprimer_regle de la base ne doivent pas etre
+    appelees dans le bloc.
+    
+    Attributes:
+        base_regles (BaseRegles): Base modifiee
+        nb_ajouts (int): Nombre de regles ajoutees
+        nb_suppressions (int): Nombre de regles supprimees
+    """
+    
+    def __init__(self, base_regles: BaseRegles):
+        """
+        Initialise la transaction (la copie de travail est prise a l'entree du bloc).
+        
+        Args:
+            base_regles: Base de regles a modifier
+        """
+        self.base_regles = base_regles
+        self.nb_ajouts = 0
+        self.nb_suppressions = 0
+        # Copie de travail : (regle, forme compilee ou None si ajoutee)
+        self._regles: List[Tuple[Dict, Optional[RegleCompilee]]] = []
+        self._supprimees = set()
+        # Nom -> positions non supprimees dans la copie de travail
+        self._par_nom: Dict[str, Deque[int]] = {}
+    
+    def __enter__(self) -> "TransactionRegles":
+        self.base_regles._verrou.acquire()
+        try:
+            instantane = self.base_regles._instantane_a_jour()
+            self._regles = [(regle.regle, regle) for regle in instantane.regles]
+            self._par_nom = {nom: deque(indices) for nom, indices in instantane.index.par_nom.items()}
+        except BaseException:
+            self.base_regles._verrou.release()
+            raise
+        return self
+    
+    def __exit__(self, type_exception, exception, trace) -> None:
+        try:
+            if type_exception is None:
+                self._valider()
+            else:
+                journal.warning("Transaction annulee (%s) : base de regles inchangee",
+                                type_exception.__name__)
+        finally:
+            self.base_regles._verrou.release()
+    
+    def ajouter(self, regle: Dict) -> None:
+        """
+        Ajoute une regle (dictionnaire complet, voir creer_regle).
+        
+        Args:
+            regle: La regle a ajouter
+            
+        Raises:
+            ValueError: Si la regle n'a pas la forme attendue (voir normaliser_regle)
+        """
+        regle = normaliser_regle(regle)
+        self._par_nom.setdefault(regle["nom"], deque()).append(len(self._regles))
+        self._regles.append((regle, None))
+        self.nb_ajouts += 1
+        journal.debug("Regle '%s' ajoutee a la transaction", regle["nom"])
+    
+    def ajouter_regle(self, nom: str, prix_min: int, prix_max: int,
+                      description: str, conditions_requises: Dict,
+                      conditions_optionnelles: Dict = None,
+                      conditions_excluantes: Dict = None,
+                      confiance_base: float = 0.75) -> None:
+        """Ajoute une regle (memes arguments que BaseRegles.ajouter_regle)."""
+        self.ajouter(creer_regle(nom, prix_min, prix_max, description,
+                                 conditions_requises, conditions_optionnelles,
+                                 conditions_excluantes, confiance_base))
+    
+    def supprimer_regle(self, nom: str) -> bool:
+        """
+        Supprime la premiere regle d'un nom (comme BaseRegles.supprimer_regle).
+        
+        Args:
+            nom: Le nom de la regle a supprimer
+            
+        Returns:
+            True si une regle a ete supprimee, False sinon
+        """
+        positions = self._par_nom.get(nom)
+        if not positions:
+            journal.debug("Regle '%s' non trouvee dans la transaction", nom)
+            return False
+        self._supprimees.add(positions.popleft())
+        self.nb_suppressions += 1
+        return True
+    
+    def _valider(self) -> None:
+        """Compile la copie de travail et la publie (verrou tenu)."""
+        if not self.nb_ajouts and not self.nb_suppressions:
+            return
+        debut = time.perf_counter()
+        supprimees = self._supprimees
+        conservees = [(regle, compilee) for i, (regle, compilee) in enumerate(self._regles)
+                      if i not in supprimees]
+        regles_compilees = tuple(compilee or compiler_regle(regle) for regle, compilee in conservees)
+        instantane = InstantaneRegles.depuis_compilation(regles_compilees, IndexRegles(regles_compilees),
+                                                         self.base_regles.version + 1)
+        self.base_regles._publier(instantane, [regle for regle, _ in conservees])
+        
+        duree_ms = (time.perf_counter() - debut) * 1e3
+        journal.info("Transaction validee : %d ajout(s), %d suppression(s), %d regle(s), "
+                     "version %d, %.1f ms", self.nb_ajouts, self.nb_suppressions,
+                     len(regles_compilees), instantane.version, duree_ms,
+                     extra={"ajouts": self.nb_ajouts, "suppressions": self.nb_suppressions,
+                            "nb_regles": len(regles_compilees), "version": instantane.version,
+                            "duree_ms": duree_ms})
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark - Questionnaire adaptatif
+====================================
+
+Pour des configurations generees (generateur_charge.py), simule le
+questionnaire adaptatif (questionnaire_adaptatif.py) : chaque question
+choisie recoit la reponse de la configuration. Mesure :
+- le nombre de questions posees (moyenne et repartition, sur 17)
+- le temps de choix d'une question
+- l'exactitude : la gamme en tete avec les seules reponses donnees doit
+  etre celle du questionnaire complet, pour chaque configuration
+- a titre de comparaison, l'ordre fixe du questionnaire avec le meme arret
+
+Verification aleatoire : l'exactitude est aussi controlee sur des bases de
+regles generees (generer_regles, relues en JSON comme avec --regles) et des
+configurations completes uniformes, avec une graine tiree au hasard et
+affichee (--graine pour rejouer un tirage). Code de sortie 1 si une gamme
+en tete differe de celle du questionnaire complet.
+
+Usage:
+    $ python benchmarks/bench_adaptatif.py [nb_configurations] [--regles regles.json] [--graine N]
+"""
+
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import time
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from base_faits import BaseFaits
+from base_regles import BaseRegles, decoder_fichier_regles
+from compilation_regles import InstantaneRegles
+from generateur_charge import generer_configurations, generer_regles
+from moteur_inference import MoteurInference
+from questionnaire_adaptatif import QuestionsAdaptatives
+
+
+class QuestionsOrdreFixe(QuestionsAdaptatives):
+    """Meme arret que QuestionsAdaptatives, mais questions dans l'ordre du questionnaire."""
+
+    def _cout_question(self, *arguments):
+        _, decidee = super()._cout_question(*arguments)
+        return (0.0, 0.0), decidee
+
+
+def simuler(moteur: MoteurInference, configurations: list, strategie=QuestionsAdaptatives) -> dict:
+    """Pose le questionnaire a chaque configuration ; compte les questions et les ecarts."""
+    repartition, ecarts, total = {}, 0, 0
+    debut = time.perf_counter()
+    for configuration in configurations:
+        faits = {}
+        questions = strategie(moteur, faits)
+        for cle, _ in questions:
+            faits[cle] = configuration[cle]
+        total += questions.nb_posees
+        repartition[questions.nb_posees] = repartition.get(questions.nb_posees, 0) + 1
+
+        obtenue = moteur.evaluer(faits, 1)
+        attendue = moteur.evaluer(configuration, 1)
+        if (obtenue[0][0] if obtenue else None) != (attendue[0][0] if attendue else None):
+            ecarts += 1
+    duree = time.perf_counter() - debut
+    return {"moyenne": total / len(configurations), "repartition": sorted(repartition.items()),
+            "ecarts": ecarts, "duree_question": duree / max(1, total + len(configurations))}
+
+
+def verifier_aleatoire(base_faits: BaseFaits, graine: int, nb_bases: int = 3,
+                       nb_regles: int = 200, nb_configurations: int = 300) -> int:
+    """
+    Compare la gamme en tete adaptative et complete sur des regles generees.
+
+    Args:
+        base_faits: Base de faits
+        graine: Graine du tirage (bases de regles et configurations)
+        nb_bases: Nombre de bases de regles generees
+        nb_regles: Nombre de regles par base
+        nb_configurations: Nombre de configurations par base
+
+    Returns:
+        Le nombre total de gammes en tete differentes
+    """
+    ecarts = 0
+    for i in range(nb_bases):
+        contenu = json.dumps(generer_regles(base_faits, nb_regles, graine + i)).encode("utf-8")
+        regles = decoder_fichier_regles(contenu, f"regles generees (graine {graine + i})")
+        base_regles = BaseRegles()
+        base_regles.installer_instantane(InstantaneRegles(regles, 0), regles)
+        moteur = MoteurInference(base_faits, base_regles)
+        configurations = generer_configurations(base_faits, nb_configurations, graine + i,
+                                                exposant_options=0.0, taux_absents=0.0,
+                                                nb_distinctes=nb_configurations)
+        ecarts += simuler(moteur, configurations)["ecarts"]
+    return ecarts
+
+
+def main():
+    parseur = argparse.ArgumentParser(description="Questions posees par le questionnaire adaptatif")
+    parseur.add_argument("nb_configurations", type=int, nargs="?", default=2000)
+    parseur.add_argument("--regles", action="append", metavar="FICHIER",
+                         help="Fichier de regles JSON (defaut: regles predefinies)")
+    parseur.add_argument("--graine", type=int, default=None,
+                         help="Graine de la verification aleatoire (defaut: tiree au hasard)")
+    arguments = parseur.parse_args()
+
+    base_faits = BaseFaits()
+    with redirect_stdout(io.StringIO()):
+        moteur = MoteurInference(base_faits, BaseRegles(arguments.regles))
+    configurations = list(generer_configurations(base_faits, arguments.nb_configurations, 42,
+                                                 taux_absents=0.0))
+
+    for nom, strategie in (("adaptatif", QuestionsAdaptatives), ("ordre fixe", QuestionsOrdreFixe)):
+        bilan = simuler(moteur, configurations, strategie)
+        print(f"[OK] {nom:<10}: {bilan['moyenne']:.2f} questions sur 17 en moyenne, "
+              f"{bilan['duree_question'] * 1000:.2f} ms par choix, "
+              f"{bilan['ecarts']}/{len(configurations)} gammes en tete differentes")
+        print(f"     repartition : {', '.join(f'{n}q x{nb}' for n, nb in bilan['repartition'])}")
+
+    graine = arguments.graine if arguments.graine is not None else random.randrange(1_000_000)
+    ecarts = verifier_aleatoire(base_faits, graine)
+    if ecarts:
+        print(f"[!] verification aleatoire (graine {graine}) : {ecarts} gammes en tete differentes")
+        sys.exit(1)
+    print(f"[OK] verification aleatoire (graine {graine}) : memes gammes en tete que le questionnaire complet")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark - Demarrage a froid contre chargement d'un instantane binaire
+========================================================================
+
+Pour des bases de regles synthetiques de tailles croissantes (voir
+generateur_charge.py), ecrites dans un fichier JSON comme une base de
+regles externe, compare :
+- a froid : lecture du JSON, compilation, index inverse, tables bitmask et
+  premiere estimation de MoteurBitmask
+- instantane : empreinte du fichier JSON, projection de l'instantane
+  binaire et premiere estimation de MoteurBitmask (masques relus dans le
+  fichier, voir instantane_binaire.py)
+- ouverture : empreinte et projection seules ; les regles compilees et les
+  masques ne sont reconstruits qu'au premier acces
+
+Usage:
+    $ python benchmarks/bench_demarrage.py [nb_regles ...]
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from base_faits import BaseFaits
+from base_regles import BaseRegles
+from generateur_charge import generer_regles
+from instantane_binaire import charger_ou_construire
+from moteur_bitmask import MoteurBitmask
+
+
+def demarrer_a_froid(chemin_regles: str) -> BaseRegles:
+    """Charge et compile la base de regles depuis le fichier JSON."""
+    base_faits = BaseFaits()
+    base_regles = BaseRegles([chemin_regles])
+    MoteurBitmask(base_faits, base_regles).evaluer({})
+    return base_regles
+
+
+def demarrer_par_instantane(chemin_regles: str, chemin_instantane: str) -> BaseRegles:
+    """Charge la base de regles compilee depuis l'instantane binaire."""
+    base_faits = BaseFaits()
+    base_regles = BaseRegles([chemin_regles], chemin_instantane)
+    MoteurBitmask(base_faits, base_regles).evaluer({})
+    return base_regles
+
+
+def ouvrir_instantane(chemin_regles: str, chemin_instantane: str) -> BaseRegles:
+    """Ouvre l'instantane binaire sans rien reconstruire."""
+    return BaseRegles([chemin_regles], chemin_instantane)
+
+
+def chronometrer(fonction, *arguments, repetitions: int = 3) -> float:
+    """Retourne la meilleure duree (secondes) de plusieurs appels."""
+    meilleure = float("inf")
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        fonction(*arguments)
+        meilleure = min(meilleure, time.perf_counter() - debut)
+    return meilleure
+
+
+def main():
+    tailles = [int(t) for t in sys.argv[1:]] or [8, 1000, 10000, 50000]
+    base_faits = BaseFaits()
+
+    print(f"{'regles':>8}  {'a froid':>10}  {'instantane':>10}  {'gain':>6}  {'ouverture':>10}  {'fichier':>10}")
+    with tempfile.TemporaryDirectory() as dossier:
+        for nombre in tailles:
+            chemin_regles = os.path.join(dossier, f"regles_{nombre}.json")
+            chemin_instantane = os.path.join(dossier, f"regles_{nombre}.bin")
+            with open(chemin_regles, "w", encoding="utf-8") as fichier:
+                json.dump(generer_regles(base_faits, nombre), fichier)
+
+            # Premier passage : construction de l'instantane
+            if charger_ou_construire(chemin_instantane, [chemin_regles], base_faits)[1]:
+                raise RuntimeError("L'instantane n'aurait pas du exister")
+
+            froid = chronometrer(demarrer_a_froid, chemin_regles)
+            instantane = chronometrer(demarrer_par_instantane, chemin_regles, chemin_instantane)
+            ouverture = chronometrer(ouvrir_instantane, chemin_regles, chemin_instantane)
+            taille = os.path.getsize(chemin_instantane)
+            print(f"{nombre:8d}  {froid * 1000:8.1f} ms  {instantane * 1000:8.1f} ms  "
+                  f"x{froid / instantane:4.1f}  {ouverture * 1000:8.1f} ms  {taille / 1024:7.0f} Ko")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark - Demon sur socket Unix contre demarrage a froid
+===========================================================
+
+Mesure, pour une estimation, le temps vu par un script shell qui appelle
+un programme par PC portable :
+- a froid : `python main.py batch` sur un fichier d'une configuration
+  (interpreteur, imports, base de regles, moteur, estimation)
+- client leger : `python client_estimation.py cle=valeur ...`, le moteur
+  restant chaud dans le demon (`python main.py daemon`)
+- connexion gardee : une demande par aller-retour sur une connexion
+  ouverte (ClientEstimation), sans aucun demarrage de processus
+
+Usage:
+    $ python benchmarks/bench_demon.py [nb_appels] [--regles regles.json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RACINE)
+
+from base_faits import BaseFaits
+from client_estimation import ClientEstimation
+from generateur_charge import generer_configurations
+
+
+def arguments_client(faits) -> list:
+    """Convertit des faits en arguments cle=valeur du client leger."""
+    return [f"{cle}={('oui' if valeur else 'non') if isinstance(valeur, bool) else valeur}"
+            for cle, valeur in faits.items()]
+
+
+def lancer_demon(chemin_socket: str, regles) -> subprocess.Popen:
+    """Demarre main.py daemon et attend qu'il accepte les connexions."""
+    commande = [sys.executable, os.path.join(RACINE, "main.py")]
+    if regles:
+        commande += ["--regles", regles]
+    commande += ["daemon", "--socket", chemin_socket]
+    processus = subprocess.Popen(commande, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(200):
+        try:
+            ClientEstimation(chemin_socket).fermer()
+            return processus
+        except OSError:
+            time.sleep(0.05)
+    processus.kill()
+    raise RuntimeError("Le demon n'a pas demarre")
+
+
+def resumer(nom: str, durees: list, reference: float = None) -> float:
+    """Affiche la mediane et le 99e centile d'une serie de durees (secondes)."""
+    durees = sorted(durees)
+    mediane = statistics.median(durees)
+    p99 = durees[min(len(durees) - 1, int(len(durees) * 0.99))]
+    gain = f"{reference / mediane:8.0f}x" if reference else f"{'-':>9}"
+    print(f"{nom:<20} {len(durees):>6} {mediane * 1e3:10.3f} ms {p99 * 1e3:10.3f} ms {gain}")
+    return mediane
+
+
+def main():
+    parseur = argparse.ArgumentParser(description="Benchmark du demon d'estimation")
+    parseur.add_argument("nb_appels", type=int, nargs="?", default=30,
+                         help="Appels de processus par mode (defaut: 30)")
+    parseur.add_argument("--regles", default=None, help="Fichier de regles JSON (defaut: regles predefinies)")
+    parseur.add_argument("-k", type=int, default=3)
+    arguments = parseur.parse_args()
+
+    configurations = generer_configurations(BaseFaits(), max(arguments.nb_appels, 2000))
+    options_regles = ["--regles", arguments.regles] if arguments.regles else []
+
+    with tempfile.TemporaryDirectory() as dossier:
+        # A froid : un processus complet par configuration
+        entree, sortie = os.path.join(dossier, "config.jsonl"), os.path.join(dossier, "sortie.jsonl")
+        froid = []
+        for faits in configurations[:arguments.nb_appels]:
+            with open(entree, "w", encoding="utf-8") as fichier:
+                fichier.write(json.dumps(faits) + "\n")
+            debut = time.perf_counter()
+            subprocess.run([sys.executable, os.path.join(RACINE, "main.py")] + options_regles +
+                           ["batch", entree, "-o", sortie, "-j", "1", "-k", str(arguments.k)],
+                           check=True, stdout=subprocess.DEVNULL)
+            froid.append(time.perf_counter() - debut)
+
+        chemin_socket = os.path.join(dossier, "demon.sock")
+        demon = lancer_demon(chemin_socket, arguments.regles)
+        try:
+            # Client leger : un petit processus par configuration
+            leger = []
+            for faits in configurations[:arguments.nb_appels]:
+                debut = time.perf_counter()
+                subprocess.run([sys.executable, os.path.join(RACINE, "client_estimation.py"),
+                                "--socket", chemin_socket, "-k", str(arguments.k)] + arguments_client(faits),
+                               stdout=subprocess.DEVNULL)
+                leger.append(time.perf_counter() - debut)
+
+            # Connexion gardee : aller-retour seul
+            garde = []
+            with ClientEstimation(chemin_socket) as client:
+                for faits in configurations:
+                    debut = time.perf_counter()
+                    client.estimer(faits, arguments.k)
+                    garde.append(time.perf_counter() - debut)
+        finally:
+            demon.terminate()
+            demon.wait()
+
+    print(f"\n{'mode':<20} {'appels':>6} {'mediane':>13} {'p99':>13} {'gain':>9}")
+    reference = resumer("a froid (main.py)", froid)
+    resumer("client leger", leger, reference)
+    resumer("connexion gardee", garde, reference)
+
+
+if __name__ == "__main__":
+    main()
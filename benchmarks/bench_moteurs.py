@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark - Comparaison des moteurs d'inference
+================================================
+
+Mesure le temps moyen d'un appel a inferer() pour chaque moteur de
+main.MOTEURS sur les memes faits aleatoires, verifie que les resultats
+sont identiques et affiche l'acceleration par rapport au moteur standard.
+
+Usage:
+    $ python benchmarks/bench_moteurs.py [nb_configurations] [repetitions]
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from base_faits import BaseFaits
+from base_regles import BaseRegles
+from main import MOTEURS
+
+
+def generer_configurations(base_faits: BaseFaits, nombre: int, graine: int = 42):
+    """Genere des dictionnaires de faits aleatoires sur les options de la base de faits."""
+    rng = random.Random(graine)
+    return [
+        {cle: rng.choice(base_faits.obtenir_options(cle)) for cle in base_faits.obtenir_attributs()}
+        for _ in range(nombre)
+    ]
+
+
+def mesurer(moteur, configurations, repetitions: int):
+    """Retourne (temps moyen par inferer() en microsecondes, resultats)."""
+    resultats = []
+    for faits in configurations:
+        moteur.base_faits.faits = faits
+        resultats.append(moteur.inferer())
+
+    debut = time.perf_counter()
+    for _ in range(repetitions):
+        for faits in configurations:
+            moteur.base_faits.faits = faits
+            moteur.inferer()
+    duree = time.perf_counter() - debut
+    return duree / (repetitions * len(configurations)) * 1e6, resultats
+
+
+def main():
+    nombre = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    repetitions = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    base_regles = BaseRegles()
+    configurations = generer_configurations(BaseFaits(), nombre)
+
+    print(f"{nombre} configurations x {repetitions} repetitions, "
+          f"{base_regles.nombre_regles()} regles\n")
+
+    reference = None
+    for nom, classe in MOTEURS.items():
+        moteur = classe(BaseFaits(), base_regles)
+        temps, resultats = mesurer(moteur, configurations, repetitions)
+        if reference is None:
+            reference = (temps, resultats)
+        elif resultats != reference[1]:
+            print(f"[!] Le moteur '{nom}' ne donne pas les memes resultats !")
+        print(f"  {nom:<10} {temps:8.2f} us/appel   acceleration x{reference[0] / temps:.2f}")
+
+
+if __name__ == "__main__":
+    main()
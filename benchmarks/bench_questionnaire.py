@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark - Sessions de questionnaire simultanees dans un processus
+====================================================================
+
+Fait avancer des milliers de sessions de questionnaire (questionnaire.py)
+dans une seule boucle asyncio, chacune terminee par une estimation via
+ServiceEstimation. Les reponses viennent de configurations generees
+(generateur_charge.py) ; une reponse sur vingt est d'abord invalide, pour
+exercer la validation. Mesure :
+- memoire : toutes les sessions sont arretees au milieu du questionnaire,
+  puis la memoire allouee (tracemalloc) est divisee par leur nombre
+- debit : sessions et questions traitees par seconde, sessions vivantes
+  au maximum, avec des reponses sans attente (SourceScriptee)
+- reseau : memes mesures a travers des connexions TCP locales (SourceFlux,
+  servir_questionnaire), clients dans le meme processus
+
+Usage:
+    $ python benchmarks/bench_questionnaire.py [nb_sessions] [--tcp 1000]
+"""
+
+import argparse
+import asyncio
+import io
+import os
+import random
+import socket
+import sys
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from base_faits import BaseFaits
+from base_regles import BaseRegles
+from generateur_charge import generer_configurations
+from moteur_inference import MoteurInference
+from questionnaire import SourceScriptee, questionner, reponses_pour, servir_questionnaire
+from service_estimation import ServiceEstimation
+
+
+class SourceEnAttente(SourceScriptee):
+    """Source scriptee qui s'arrete apres quelques reponses, jusqu'a un evenement."""
+
+    __slots__ = ("_arret", "_apres", "_arrivees")
+
+    def __init__(self, reponses, arret: asyncio.Event, apres: int, arrivees: list):
+        super().__init__(reponses)
+        self._arret = arret
+        self._apres = apres
+        self._arrivees = arrivees
+
+    async def poser(self, question, options, repetition=False):
+        if self.nb_questions == self._apres:
+            self._arrivees[0] += 1
+            await self._arret.wait()
+        return await super().poser(question, options, repetition)
+
+
+def preparer_reponses(base_faits: BaseFaits, nombre: int, graine: int = 42) -> list:
+    """Reponses brutes de nombre sessions (quelques reponses invalides intercalees)."""
+    rng = random.Random(graine)
+    sessions = []
+    for faits in generer_configurations(base_faits, nombre, graine, taux_absents=0.0):
+        reponses = []
+        for reponse in reponses_pour(base_faits, faits):
+            if rng.random() < 0.05:
+                reponses.append("peut-etre")
+            reponses.append(reponse)
+        sessions.append(reponses)
+    return sessions
+
+
+async def mesurer_memoire(base_faits: BaseFaits, sessions: list) -> float:
+    """Retourne les octets alloues par session vivante (arretee a mi-parcours)."""
+    arret, arrivees = asyncio.Event(), [0]
+    tracemalloc.start()
+    avant = tracemalloc.get_traced_memory()[0]
+    sources = [SourceEnAttente(reponses, arret, 8, arrivees) for reponses in sessions]
+    taches = [asyncio.ensure_future(questionner(source, base_faits)) for source in sources]
+    while arrivees[0] < len(taches):
+        await asyncio.sleep(0.01)
+    pendant = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    arret.set()
+    await asyncio.gather(*taches)
+    return (pendant - avant) / len(taches)
+
+
+async def mesurer_debit(base_faits: BaseFaits, service: ServiceEstimation, sessions: list) -> dict:
+    """Fait avancer toutes les sessions ensemble, jusqu'a l'estimation."""
+    vivantes, bilan = [0], {"max_vivantes": 0, "questions": 0}
+
+    async def session(reponses):
+        vivantes[0] += 1
+        bilan["max_vivantes"] = max(bilan["max_vivantes"], vivantes[0])
+        source = SourceScriptee(reponses)
+        faits = await questionner(source, base_faits)
+        await service.estimer(faits, 3)
+        bilan["questions"] += source.nb_questions
+        vivantes[0] -= 1
+
+    debut = time.perf_counter()
+    await asyncio.gather(*(session(reponses) for reponses in sessions))
+    bilan["duree"] = time.perf_counter() - debut
+    return bilan
+
+
+async def mesurer_tcp(service: ServiceEstimation, sessions: list) -> dict:
+    """Sessions a travers des connexions TCP locales (serveur et clients dans ce processus)."""
+    with socket.socket() as essai:
+        essai.bind(("127.0.0.1", 0))
+        port = essai.getsockname()[1]
+    with redirect_stdout(io.StringIO()):
+        serveur = asyncio.ensure_future(servir_questionnaire(service, "127.0.0.1", port))
+        await asyncio.sleep(0.2)
+
+    async def client(reponses):
+        lecteur, ecrivain = await asyncio.open_connection("127.0.0.1", port)
+        for reponse in reponses:
+            await lecteur.readuntil(b" : ")
+            ecrivain.write(reponse.encode("utf-8") + b"\r\n")
+        resultat = await lecteur.read()
+        ecrivain.close()
+        return b"ESTIMATION" in resultat
+
+    debut = time.perf_counter()
+    terminees = await asyncio.gather(*(client(reponses) for reponses in sessions))
+    duree = time.perf_counter() - debut
+    serveur.cancel()
+    try:
+        await serveur
+    except asyncio.CancelledError:
+        pass
+    return {"duree": duree, "terminees": sum(terminees)}
+
+
+async def executer(arguments) -> None:
+    base_faits = BaseFaits()
+    with redirect_stdout(io.StringIO()):
+        moteur = MoteurInference(base_faits, BaseRegles())
+    service = ServiceEstimation(moteur, fenetre_ms=0.0)
+    service.demarrer()
+    sessions = preparer_reponses(base_faits, arguments.nb_sessions)
+
+    octets = await mesurer_memoire(base_faits, sessions)
+    print(f"[OK] Memoire : {octets:.0f} octets par session vivante "
+          f"({arguments.nb_sessions} sessions arretees a la 9e question, "
+          f"soit {2 ** 30 / octets:.0f} sessions par Go)")
+
+    bilan = await mesurer_debit(base_faits, service, sessions)
+    print(f"[OK] Debit : {arguments.nb_sessions} sessions en {bilan['duree']:.2f} s, "
+          f"{arguments.nb_sessions / bilan['duree']:.0f} sessions/s, "
+          f"{bilan['questions'] / bilan['duree']:.0f} questions/s, "
+          f"{bilan['max_vivantes']} sessions vivantes au maximum, "
+          f"lots d'estimation de {service.statistiques()['taille_moyenne_lot']:.1f} en moyenne")
+    await service.arreter()
+
+    if arguments.tcp:
+        resultat = await mesurer_tcp(service, sessions[:arguments.tcp])
+        print(f"[OK] TCP : {resultat['terminees']}/{arguments.tcp} sessions en {resultat['duree']:.2f} s, "
+              f"{arguments.tcp / resultat['duree']:.0f} sessions/s")
+
+
+def main():
+    parseur = argparse.ArgumentParser(description="Charge de sessions de questionnaire simultanees")
+    parseur.add_argument("nb_sessions", type=int, nargs="?", default=10000)
+    parseur.add_argument("--tcp", type=int, default=0,
+                         help="Sessions a travers des connexions TCP locales (defaut: 0, aucune)")
+    asyncio.run(executer(parseur.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
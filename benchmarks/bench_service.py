@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark - Service HTTP avec et sans regroupement des requetes
+================================================================
+
+Lance `main.py serve` dans un processus separe (un coeur) puis envoie des
+requetes POST /estimer depuis des clients asyncio concurrents (connexions
+keep-alive), avec des configurations a popularite de Zipf (voir
+generateur_charge.py). Compare :
+- sans regroupement : lots d'une requete (un evaluer() par requete)
+- micro-lots : requetes regroupees (fenetre et taille maximale reglables)
+
+Affiche les requetes par seconde, la latence cote client (mediane, p99)
+et la taille moyenne des lots rapportee par /statistiques.
+
+Usage:
+    $ python benchmarks/bench_service.py [nb_requetes] [clients] [--regles regles.json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RACINE)
+
+from base_faits import BaseFaits
+from generateur_charge import generer_configurations
+
+
+async def requete(lecteur, ecrivain, methode: str, chemin: str, corps: bytes = b""):
+    """Envoie une requete HTTP sur une connexion ouverte et retourne (statut, objet JSON)."""
+    ecrivain.write(f"{methode} {chemin} HTTP/1.1\r\nHost: localhost\r\n"
+                   f"Content-Length: {len(corps)}\r\n\r\n".encode("latin-1") + corps)
+    statut = int((await lecteur.readline()).split()[1])
+    longueur = 0
+    while True:
+        ligne = await lecteur.readline()
+        if ligne == b"\r\n":
+            break
+        if ligne.lower().startswith(b"content-length:"):
+            longueur = int(ligne.split(b":")[1])
+    return statut, json.loads(await lecteur.readexactly(longueur))
+
+
+async def charger(port: int, corps, nb_clients: int):
+    """Envoie toutes les requetes avec nb_clients connexions ; retourne (duree, latences)."""
+    latences = []
+    suivant = iter(corps)
+
+    async def client():
+        lecteur, ecrivain = await asyncio.open_connection("127.0.0.1", port)
+        for donnees in suivant:
+            debut = time.perf_counter()
+            statut, _ = await requete(lecteur, ecrivain, "POST", "/estimer", donnees)
+            latences.append(time.perf_counter() - debut)
+            if statut != 200:
+                raise RuntimeError(f"Statut HTTP {statut}")
+        ecrivain.close()
+
+    debut = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(nb_clients)))
+    return time.perf_counter() - debut, latences
+
+
+async def statistiques(port: int):
+    """Retourne /statistiques du service."""
+    lecteur, ecrivain = await asyncio.open_connection("127.0.0.1", port)
+    _, resultat = await requete(lecteur, ecrivain, "GET", "/statistiques")
+    ecrivain.close()
+    return resultat
+
+
+def lancer_service(port: int, options, regles):
+    """Demarre main.py serve et attend qu'il accepte les connexions."""
+    commande = [sys.executable, os.path.join(RACINE, "main.py")]
+    if regles:
+        commande += ["--regles", regles]
+    commande += ["serve", "--port", str(port)] + options
+    processus = subprocess.Popen(commande, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(100):
+        try:
+            asyncio.run(statistiques(port))
+            return processus
+        except OSError:
+            time.sleep(0.05)
+    processus.kill()
+    raise RuntimeError("Le service n'a pas demarre")
+
+
+def main():
+    parseur = argparse.ArgumentParser(description="Benchmark du service d'estimation")
+    parseur.add_argument("nb_requetes", type=int, nargs="?", default=20000)
+    parseur.add_argument("clients", type=int, nargs="?", default=64)
+    parseur.add_argument("--regles", default=None, help="Fichier de regles JSON (defaut: regles predefinies)")
+    parseur.add_argument("--port", type=int, default=18080)
+    parseur.add_argument("-k", type=int, default=3)
+    arguments = parseur.parse_args()
+
+    configurations = generer_configurations(BaseFaits(), arguments.nb_requetes)
+    corps = [json.dumps({"faits": faits, "k": arguments.k}).encode("utf-8") for faits in configurations]
+
+    scenarios = [
+        ("sans regroupement", ["--lot-max", "1", "--fenetre-ms", "0"]),
+        ("micro-lots 0 ms", ["--lot-max", "64", "--fenetre-ms", "0"]),
+        ("micro-lots 2 ms", ["--lot-max", "64", "--fenetre-ms", "2"]),
+    ]
+    print(f"{arguments.nb_requetes} requetes, {arguments.clients} clients\n")
+    print(f"{'scenario':<20} {'req/s':>8} {'mediane':>10} {'p99':>10} {'lot moyen':>10}")
+    for nom, options in scenarios:
+        processus = lancer_service(arguments.port, options, arguments.regles)
+        try:
+            duree, latences = asyncio.run(charger(arguments.port, corps, arguments.clients))
+            taille_lot = asyncio.run(statistiques(arguments.port))["taille_moyenne_lot"]
+        finally:
+            processus.terminate()
+            processus.wait()
+        latences.sort()
+        print(f"{nom:<20} {len(latences) / duree:8.0f} "
+              f"{latences[len(latences) // 2] * 1e3:7.2f} ms {latences[int(len(latences) * 0.99)] * 1e3:7.2f} ms "
+              f"{taille_lot:10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark - Memoire des sessions et gestionnaire de sessions
+=============================================================
+
+Mesure la memoire allouee (tracemalloc) par session remplie, pour trois
+representations des faits d'une session :
+- une BaseFaits par session (faits dans un dictionnaire, schema partage)
+- un dictionnaire de faits seul
+- une Session du GestionnaireSessions (FaitsCompacts, un octet par caracteristique)
+
+Puis simule un serveur : des sessions s'ouvrent, repondent et se ferment
+(une sur quatre est abandonnee) sous un budget memoire, et affiche les
+statistiques du gestionnaire (evictions, reutilisations) et le debit.
+
+Usage:
+    $ python benchmarks/bench_sessions.py [nb_sessions] [--budget-ko 256]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from base_faits import BaseFaits
+from gestion_sessions import GestionnaireSessions
+from generateur_charge import generer_configurations
+
+
+def mesurer(creer, configurations: list) -> float:
+    """Retourne les octets alloues par session creee par creer(faits)."""
+    tracemalloc.start()
+    avant = tracemalloc.get_traced_memory()[0]
+    sessions = [creer(faits) for faits in configurations]
+    pendant = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del sessions
+    return (pendant - avant) / len(configurations)
+
+
+def creer_base_faits(faits: dict) -> BaseFaits:
+    base = BaseFaits()
+    for cle, valeur in faits.items():
+        base.ajouter_fait(cle, valeur)
+    return base
+
+
+def creer_dictionnaire(faits: dict) -> dict:
+    return {cle: valeur for cle, valeur in faits.items()}
+
+
+def simuler(configurations: list, budget_octets: int, graine: int = 42) -> dict:
+    """Ouvre les sessions par vagues ; chaque session repond puis se ferme, ou est abandonnee."""
+    rng = random.Random(graine)
+    gestionnaire = GestionnaireSessions(budget_octets)
+    en_cours = []
+    debut = time.perf_counter()
+    for faits in configurations:
+        session = gestionnaire.ouvrir()
+        en_cours.append((session.identifiant, faits))
+        if len(en_cours) >= 64:
+            for identifiant, faits_session in en_cours:
+                try:
+                    session = gestionnaire.obtenir(identifiant)
+                except KeyError:  # evincee
+                    continue
+                session.faits.update(faits_session)
+                if rng.random() < 0.75:
+                    gestionnaire.fermer(identifiant)
+            en_cours = []
+    duree = time.perf_counter() - debut
+    stats = gestionnaire.statistiques()
+    stats["duree"] = duree
+    return stats
+
+
+def main():
+    parseur = argparse.ArgumentParser(description="Memoire des sessions et gestionnaire de sessions")
+    parseur.add_argument("nb_sessions", type=int, nargs="?", default=20000)
+    parseur.add_argument("--budget-ko", type=float, default=256.0,
+                         help="Budget memoire du gestionnaire simule, en Ko (defaut: 256)")
+    arguments = parseur.parse_args()
+
+    configurations = list(generer_configurations(BaseFaits(), arguments.nb_sessions, 42, taux_absents=0.0))
+
+    gestionnaire = GestionnaireSessions()
+
+    def creer_session(faits: dict):
+        session = gestionnaire.ouvrir()
+        session.faits.update(faits)
+        return session
+
+    for nom, creer in (("BaseFaits", creer_base_faits), ("dictionnaire", creer_dictionnaire),
+                       ("Session compacte", creer_session)):
+        octets = mesurer(creer, configurations)
+        print(f"[OK] {nom:<17}: {octets:7.0f} octets par session remplie "
+              f"({2 ** 30 / octets:9.0f} sessions par Go)")
+    print(f"     (estimation du gestionnaire : {gestionnaire.octets_par_session} octets par session)")
+
+    stats = simuler(configurations, int(arguments.budget_ko * 1024))
+    print(f"[OK] Simulation : {stats['ouvertes']} sessions en {stats['duree'] * 1000:.0f} ms "
+          f"({stats['ouvertes'] / stats['duree']:.0f} sessions/s), budget {stats['budget_octets']} octets")
+    print(f"     vivantes {stats['sessions_vivantes']} ({stats['octets_utilises']} octets), "
+          f"fermees {stats['fermees']}, evincees {stats['evictions']}, "
+          f"reutilisees {stats['reutilisations']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark - Suite latence / debit / memoire selon la taille de la base
+=======================================================================
+
+Pour chaque moteur d'inference, chaque taille de base de regles et chaque
+distribution de configurations (voir generateur_charge.py), mesure :
+- la latence d'un appel a inferer(k) : mediane et 99e centile (us)
+- le debit d'un coeur (estimations par seconde, un seul processus)
+- la preparation (premier appel : compilation, index, tables...)
+- le pic de RSS du processus (Mo) et, avec tracemalloc, le pic de memoire
+  allouee pendant un appel et la memoire conservee apres l'appel (octets)
+- pour le moteur a diagramme, la part compilee : part moyenne des regles
+  traitees sans test a l'estimation (voir DiagrammeDecision.part_compilee)
+
+Chaque cas est execute dans un processus neuf, pour que le pic de RSS et
+les caches ne dependent pas des cas precedents. Les resultats sont ecrits
+en JSON ; avec --reference, ils sont compares a une execution precedente
+et le script se termine avec le code 1 si une mesure se degrade de plus
+de --seuil-regression (20% par defaut).
+
+Usage:
+    $ python benchmarks/bench_suite.py -o resultats.json
+    $ python benchmarks/bench_suite.py --tailles 100 10000 --moteurs standard bitmask \\
+          --reference resultats.json
+    $ python benchmarks/bench_suite.py --tailles 1000 10000 --moteurs standard diagramme
+"""
+
+import argparse
+import importlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from generateur_charge import generer_configurations, generer_regles
+
+
+# Moteurs mesurables : nom -> (module, classe), importes dans le processus du cas
+MOTEURS_SUITE = {
+    "standard": ("moteur_inference", "MoteurInference"),
+    "bitmask": ("moteur_bitmask", "MoteurBitmask"),
+    "incremental": ("moteur_incremental", "MoteurIncremental"),
+    "diagramme": ("diagramme_decision", "MoteurDiagramme"),
+    "vectoriel": ("moteur_vectoriel", "MoteurVectoriel"),
+}
+
+# Distributions des configurations (arguments de generer_configurations)
+DISTRIBUTIONS = {
+    "zipf": {"exposant_options": 1.1, "exposant_configurations": 1.0},
+    "uniforme": {"exposant_options": 0.0, "exposant_configurations": 0.0},
+}
+
+# Mesures comparees a la reference : nom -> True si une valeur plus grande est meilleure
+MESURES_COMPAREES = {
+    "latence_mediane_us": False,
+    "latence_p99_us": False,
+    "estimations_par_seconde": True,
+    "octets_pic_par_appel": False,
+}
+
+
+def rss_pic_mo() -> Optional[float]:
+    """Retourne le pic de RSS du processus en Mo (None si indisponible)."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    pic = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kio sous Linux, octets sous macOS
+    return pic / (1024 * 1024) if sys.platform == "darwin" else pic / 1024
+
+
+def mesurer_cas(moteur: str, nb_regles: int, distribution: str, nb_configurations: int,
+                k: int, echantillon_memoire: int, graine: int) -> Dict[str, Any]:
+    """
+    Mesure un moteur sur une base et une charge generees (dans le processus courant).
+
+    Returns:
+        Dictionnaire des mesures du cas
+    """
+    from base_faits import BaseFaits
+    from base_regles import BaseRegles, decoder_fichier_regles
+    from compilation_regles import InstantaneRegles
+
+    module, classe = MOTEURS_SUITE[moteur]
+    classe_moteur = getattr(importlib.import_module(module), classe)
+
+    base_faits = BaseFaits()
+    base_regles = BaseRegles()
+    # Aller-retour JSON : les regles mesurees sont celles que lirait --regles
+    contenu = json.dumps(generer_regles(base_faits, nb_regles, graine)).encode("utf-8")
+    regles = decoder_fichier_regles(contenu, f"regles generees ({nb_regles})")
+    base_regles.installer_instantane(InstantaneRegles(regles, 0), regles)
+    configurations = generer_configurations(base_faits, nb_configurations, graine,
+                                            **DISTRIBUTIONS[distribution])
+
+    with redirect_stdout(io.StringIO()):
+        moteur_inference = classe_moteur(base_faits, base_regles)
+        debut = time.perf_counter()
+        base_faits.faits = configurations[0]
+        moteur_inference.inferer(k)
+        # MoteurDiagramme construit son diagramme en arriere-plan : la
+        # preparation comprend cette construction, hors des mesures de latence
+        attendre = getattr(moteur_inference, "attendre_diagramme", None)
+        if attendre is not None:
+            attendre()
+        preparation = time.perf_counter() - debut
+
+        latences = []
+        horloge = time.perf_counter_ns
+        for faits in configurations:
+            base_faits.faits = faits
+            debut_ns = horloge()
+            moteur_inference.inferer(k)
+            latences.append(horloge() - debut_ns)
+
+        # Memoire allouee par appel, sur un echantillon (tracemalloc ralentit les appels)
+        pics, conservees = [], []
+        tracemalloc.start()
+        for faits in configurations[:echantillon_memoire]:
+            base_faits.faits = faits
+            if hasattr(tracemalloc, "reset_peak"):
+                tracemalloc.reset_peak()
+            else:
+                tracemalloc.clear_traces()
+            avant = tracemalloc.get_traced_memory()[0]
+            moteur_inference.inferer(k)
+            apres, pic = tracemalloc.get_traced_memory()
+            pics.append(pic - avant)
+            conservees.append(apres - avant)
+        tracemalloc.stop()
+
+        diagramme = getattr(moteur_inference, "diagramme", None)
+        part_compilee = (statistics.mean(diagramme.part_compilee(faits) for faits in configurations)
+                         if diagramme is not None else None)
+
+    centiles = statistics.quantiles(latences, n=100) if len(latences) > 1 else latences * 99
+    return {
+        "moteur": moteur,
+        "nb_regles": nb_regles,
+        "distribution": distribution,
+        "preparation_ms": round(preparation * 1e3, 3),
+        "latence_mediane_us": round(statistics.median(latences) / 1e3, 3),
+        "latence_p99_us": round(centiles[98] / 1e3, 3),
+        "estimations_par_seconde": round(len(latences) / (sum(latences) / 1e9), 1),
+        "rss_pic_mo": rss_pic_mo(),
+        "octets_pic_par_appel": int(statistics.median(pics)) if pics else None,
+        "octets_conserves_par_appel": round(statistics.mean(conservees), 1) if conservees else None,
+        "part_compilee": round(part_compilee, 3) if part_compilee is not None else None,
+    }
+
+
+def executer_cas(contexte, *arguments) -> Dict[str, Any]:
+    """Execute mesurer_cas dans un processus neuf."""
+    with contexte.Pool(1) as pool:
+        return pool.apply(mesurer_cas, arguments)
+
+
+def cle_cas(resultat: Dict[str, Any]) -> str:
+    """Identifiant d'un cas, pour la comparaison avec une reference."""
+    return f"{resultat['moteur']}/{resultat['nb_regles']}/{resultat['distribution']}"
+
+
+def comparer(resultats: List[Dict[str, Any]], reference: List[Dict[str, Any]],
+             seuil: float) -> List[str]:
+    """
+    Compare des resultats a une reference.
+
+    Args:
+        resultats: Mesures de l'execution courante
+        reference: Mesures d'une execution precedente
+        seuil: Degradation relative toleree (0.2 = 20%)
+
+    Returns:
+        Description des regressions (liste vide si aucune)
+    """
+    precedents = {cle_cas(resultat): resultat for resultat in reference}
+    regressions = []
+    for resultat in resultats:
+        precedent = precedents.get(cle_cas(resultat))
+        if precedent is None:
+            continue
+        for mesure, plus_grand_meilleur in MESURES_COMPAREES.items():
+            avant, apres = precedent.get(mesure), resultat.get(mesure)
+            if not avant or apres is None:
+                continue
+            ecart = (avant - apres) / avant if plus_grand_meilleur else (apres - avant) / avant
+            if ecart > seuil:
+                regressions.append(f"{cle_cas(resultat)} {mesure} : {avant} -> {apres} "
+                                   f"(degradation de {ecart * 100:.0f}%)")
+    return regressions
+
+
+def main():
+    parseur = argparse.ArgumentParser(description="Suite de benchmarks des moteurs d'inference")
+    parseur.add_argument("--tailles", type=int, nargs="+", default=[10, 100, 1000, 10000],
+                         help="Nombres de regles (defaut: 10 100 1000 10000)")
+    parseur.add_argument("--moteurs", nargs="+", choices=list(MOTEURS_SUITE),
+                         default=["standard", "bitmask", "incremental", "diagramme"],
+                         help="Moteurs mesures (defaut: standard bitmask incremental diagramme)")
+    parseur.add_argument("--distributions", nargs="+", choices=list(DISTRIBUTIONS),
+                         default=list(DISTRIBUTIONS), help="Distributions des configurations")
+    parseur.add_argument("-n", "--configurations", type=int, default=2000,
+                         help="Appels a inferer() mesures par cas (defaut: 2000)")
+    parseur.add_argument("-k", type=int, default=3, help="Argument k de inferer() (defaut: 3)")
+    parseur.add_argument("--echantillon-memoire", type=int, default=200,
+                         help="Appels mesures avec tracemalloc (defaut: 200)")
+    parseur.add_argument("--graine", type=int, default=42)
+    parseur.add_argument("-o", "--sortie", default=None, help="Fichier JSON des resultats")
+    parseur.add_argument("--reference", default=None, help="Fichier JSON d'une execution precedente")
+    parseur.add_argument("--seuil-regression", type=float, default=0.2,
+                         help="Degradation relative toleree par rapport a la reference (defaut: 0.2)")
+    arguments = parseur.parse_args()
+
+    contexte = multiprocessing.get_context("spawn")
+    print(f"Python {platform.python_version()}, {platform.machine()}, "
+          f"{arguments.configurations} appels par cas\n")
+    print(f"{'moteur':<12} {'regles':>7} {'charge':<9} {'prepa':>9} {'mediane':>9} {'p99':>9} "
+          f"{'estim/s':>9} {'RSS':>7} {'pic/appel':>10} {'compile':>8}")
+
+    resultats = []
+    for nb_regles in arguments.tailles:
+        for distribution in arguments.distributions:
+            for moteur in arguments.moteurs:
+                try:
+                    resultat = executer_cas(contexte, moteur, nb_regles, distribution,
+                                            arguments.configurations, arguments.k,
+                                            arguments.echantillon_memoire, arguments.graine)
+                except ImportError as erreur:  # moteur vectoriel sans NumPy
+                    print(f"{moteur:<12} {nb_regles:>7} {distribution:<9} [!] {erreur}")
+                    continue
+                resultats.append(resultat)
+                rss = f"{resultat['rss_pic_mo']:.0f} Mo" if resultat["rss_pic_mo"] is not None else "-"
+                part = (f"{resultat['part_compilee'] * 100:.1f}%"
+                        if resultat["part_compilee"] is not None else "-")
+                print(f"{moteur:<12} {nb_regles:>7} {distribution:<9} "
+                      f"{resultat['preparation_ms']:>6.1f} ms {resultat['latence_mediane_us']:>6.1f} us "
+                      f"{resultat['latence_p99_us']:>6.1f} us {resultat['estimations_par_seconde']:>9.0f} "
+                      f"{rss:>7} {resultat['octets_pic_par_appel']:>8} o {part:>8}")
+
+    if arguments.sortie:
+        with open(arguments.sortie, "w", encoding="utf-8") as fichier:
+            json.dump({
+                "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": platform.python_version(),
+                "plateforme": platform.platform(),
+                "parametres": {"configurations": arguments.configurations, "k": arguments.k,
+                               "echantillon_memoire": arguments.echantillon_memoire,
+                               "graine": arguments.graine},
+                "resultats": resultats,
+            }, fichier, indent=2)
+        print(f"\n[OK] Resultats ecrits dans {arguments.sortie}")
+
+    if arguments.reference:
+        with open(arguments.reference, "r", encoding="utf-8") as fichier:
+            reference = json.load(fichier)["resultats"]
+        regressions = comparer(resultats, reference, arguments.seuil_regression)
+        if regressions:
+            print(f"\n[!] {len(regressions)} regression(s) au-dela de "
+                  f"{arguments.seuil_regression * 100:.0f}% :")
+            for regression in regressions:
+                print(f"    {regression}")
+            sys.exit(1)
+        print(f"\n[OK] Aucune regression au-dela de {arguments.seuil_regression * 100:.0f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark - Debit de evaluer() sur un pool de threads
+======================================================
+
+Un seul moteur (et un seul instantane de la base de regles) est partage
+par tous les threads, qui appellent evaluer(faits) sur leur part des
+configurations. Le script verifie que les resultats sont identiques a
+une execution sequentielle et affiche le debit pour 1, 2, 4... threads.
+
+Sur un CPython standard, le GIL limite le gain ; sur un CPython sans GIL
+(build free-threaded 3.13+, lance avec PYTHON_GIL=0), le debit doit
+augmenter avec le nombre de coeurs.
+
+Usage:
+    $ python benchmarks/bench_threads.py [nb_configurations] [threads_max]
+"""
+
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from base_faits import BaseFaits
+from base_regles import BaseRegles
+from main import MOTEURS
+from bench_moteurs import generer_configurations
+
+
+def gil_actif() -> bool:
+    """Indique si le GIL est actif (toujours vrai avant Python 3.13)."""
+    est_actif = getattr(sys, "_is_gil_enabled", None)
+    return True if est_actif is None else est_actif()
+
+
+def mesurer(moteur, parts, nb_threads: int):
+    """Retourne (duree en secondes, resultats dans l'ordre des parts)."""
+    def evaluer_part(configurations):
+        return [moteur.evaluer(faits, 3) for faits in configurations]
+
+    with ThreadPoolExecutor(max_workers=nb_threads) as pool:
+        debut = time.perf_counter()
+        resultats = list(pool.map(evaluer_part, parts))
+        duree = time.perf_counter() - debut
+    return duree, [estimations for part in resultats for estimations in part]
+
+
+def main():
+    nombre = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    threads_max = int(sys.argv[2]) if len(sys.argv) > 2 else max(4, os.cpu_count() or 1)
+
+    base_regles = BaseRegles()
+    configurations = generer_configurations(BaseFaits(), nombre)
+
+    print(f"Python {sys.version.split()[0]}, GIL {'actif' if gil_actif() else 'desactive'}, "
+          f"{os.cpu_count()} coeur(s), {nombre} configurations\n")
+
+    for nom, classe in MOTEURS.items():
+        moteur = classe(BaseFaits(), base_regles)
+        attendu = [moteur.evaluer(faits, 3) for faits in configurations]
+
+        nb_threads = 1
+        reference = None
+        while nb_threads <= threads_max:
+            taille = -(-nombre // nb_threads)
+            parts = [configurations[i:i + taille] for i in range(0, nombre, taille)]
+            duree, resultats = mesurer(moteur, parts, nb_threads)
+            if resultats != attendu:
+                print(f"[!] Resultats differents avec {nb_threads} threads (moteur '{nom}') !")
+            reference = reference or duree
+            print(f"  {nom:<10} {nb_threads:3d} thread(s)  {nombre / duree:10.0f} evaluations/s"
+                  f"   acceleration x{reference / duree:.2f}")
+            nb_threads *= 2
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Generateur de Charge - Bases de regles et configurations synthetiques
+======================================================================
+
+La base livree ne compte que 8 regles : elle ne montre aucun probleme de
+passage a l'echelle. Ce module genere, sur le vocabulaire reel de BaseFaits
+(tuples options_*), des bases de 10 a 100 000 regles et des charges de
+configurations pour les benchmarks :
+
+- generer_regles : chaque regle reprend le nom et la fourchette de prix
+  d'une regle predefinie ; la densite de chaque type de condition (part
+  moyenne des caracteristiques concernees) et la part de conditions
+  booleennes (clavier_rgb, thunderbolt...) sont reglables. Une condition
+  sur une caracteristique ordonnee (ram, stockage...) accepte une plage
+  contigue d'options, comme les regles predefinies.
+- generer_configurations : les configurations suivent une loi de Zipf, a
+  deux niveaux : dans chaque caracteristique, quelques options sont bien
+  plus frequentes que les autres, et dans la charge quelques
+  configurations reviennent tres souvent (ce qui sollicite le cache).
+
+Toutes les fonctions sont deterministes pour une graine donnee.
+
+Usage (ecrit un fichier de regles JSON pour --regles et un fichier JSONL
+de configurations pour la sous-commande batch) :
+    $ python benchmarks/generateur_charge.py 10000 -n 100000 -o charge/
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+from bisect import bisect
+from itertools import accumulate
+from typing import Any, Dict, List, Optional, Sequence
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from base_faits import BaseFaits
+from base_regles import BaseRegles
+
+
+def poids_zipf(nombre: int, exposant: float) -> List[float]:
+    """Retourne les poids cumules d'une loi de Zipf sur nombre elements (rang 1 = le plus frequent)."""
+    return list(accumulate(1.0 / rang ** exposant for rang in range(1, nombre + 1)))
+
+
+def tirer(rng: random.Random, elements: Sequence[Any], poids_cumules: List[float]) -> Any:
+    """Tire un element selon des poids cumules (equivalent a rng.choices, sans liste)."""
+    return elements[bisect(poids_cumules, rng.random() * poids_cumules[-1])]
+
+
+# ============================================================
+# BASES DE REGLES
+# ============================================================
+
+def generer_regles(base_faits: BaseFaits, nombre: int, graine: int = 42,
+                   densite_requises: float = 0.2,
+                   densite_optionnelles: float = 0.25,
+                   densite_excluantes: float = 0.05,
+                   part_booleennes: Optional[float] = None) -> List[Dict]:
+    """
+    Genere une base de regles synthetique.
+
+    Args:
+        base_faits: Base de faits (vocabulaire des conditions)
+        nombre: Nombre de regles
+        graine: Graine du generateur aleatoire
+        densite_requises: Part moyenne des caracteristiques ayant une condition requise
+        densite_optionnelles: Idem pour les conditions optionnelles
+        densite_excluantes: Idem pour les conditions excluantes (une caracteristique
+                            n'a qu'une condition : requises, puis optionnelles,
+                            puis excluantes sont tirees parmi les caracteristiques
+                            restantes, la densite n'est atteinte que s'il en reste)
+        part_booleennes: Part des conditions portant sur une option booleenne
+                         (defaut: proportion des options booleennes dans la base de faits)
+
+    Returns:
+        Liste de regles au format de BaseRegles (utilisable avec --regles)
+    """
+    rng = random.Random(graine)
+    modeles = BaseRegles().obtenir_regles()
+    booleennes = list(base_faits.options_booleennes)
+    a_choix = [cle for cle in base_faits.obtenir_attributs() if cle not in booleennes]
+    nb_attributs = len(a_choix) + len(booleennes)
+    if part_booleennes is None:
+        part_booleennes = len(booleennes) / nb_attributs
+
+    def conditions(densite: float, deja_prises: set) -> Dict[str, Any]:
+        resultat = {}
+        # Nombre de conditions : loi binomiale de moyenne densite * nb_attributs,
+        # borne par le nombre de caracteristiques encore libres
+        libres = ([cle for cle in booleennes if cle not in deja_prises],
+                  [cle for cle in a_choix if cle not in deja_prises])
+        nombre_conditions = sum(rng.random() < densite for _ in range(nb_attributs))
+        nombre_conditions = min(nombre_conditions, len(libres[0]) + len(libres[1]))
+        # Tirage sans remise : booleenne avec la probabilite part_booleennes,
+        # tant qu'il en reste
+        nb_booleennes = sum(rng.random() < part_booleennes for _ in range(nombre_conditions))
+        nb_booleennes = max(nombre_conditions - len(libres[1]), min(nb_booleennes, len(libres[0])))
+        cles = rng.sample(libres[0], nb_booleennes) + rng.sample(libres[1], nombre_conditions - nb_booleennes)
+        for cle in cles:
+            deja_prises.add(cle)
+            if cle in base_faits.options_booleennes:
+                resultat[cle] = rng.random() < 0.8
+            else:
+                # Plage contigue d'options (les tuples options_* sont ordonnes).
+                # Une liste, comme dans un fichier JSON : un tuple serait
+                # compare par egalite (voir compiler_valeurs)
+                options = base_faits.obtenir_options(cle)
+                largeur = rng.randint(1, max(1, len(options) // 2))
+                debut = rng.randrange(len(options) - largeur + 1)
+                resultat[cle] = list(options[debut:debut + largeur])
+        return resultat
+
+    regles = []
+    for i in range(nombre):
+        modele = rng.choice(modeles)
+        prises: set = set()
+        requises = conditions(densite_requises, prises)
+        optionnelles = conditions(densite_optionnelles, prises)
+        excluantes = conditions(densite_excluantes, prises)
+        regles.append({
+            "nom": modele["nom"],
+            "prix_min": modele["prix_min"],
+            "prix_max": modele["prix_max"],
+            "description": f"Regle generee {i}",
+            "conditions_requises": requises,
+            "conditions_optionnelles": optionnelles,
+            "conditions_excluantes": excluantes,
+            "confiance_base": round(min(0.95, max(0.5, modele["confiance_base"] + rng.uniform(-0.1, 0.1))), 2),
+        })
+    return regles
+
+
+# ============================================================
+# CHARGES DE CONFIGURATIONS
+# ============================================================
+
+def generer_configurations(base_faits: BaseFaits, nombre: int, graine: int = 42,
+                           exposant_options: float = 1.1,
+                           exposant_configurations: float = 1.0,
+                           nb_distinctes: Optional[int] = None,
+                           taux_absents: float = 0.05) -> List[Dict[str, Any]]:
+    """
+    Genere une charge de configurations a popularite asymetrique (Zipf).
+
+    Args:
+        base_faits: Base de faits (vocabulaire des faits)
+        nombre: Nombre de configurations de la charge
+        graine: Graine du generateur aleatoire
+        exposant_options: Exposant de Zipf de la popularite des options de
+                          chaque caracteristique (0 = uniforme)
+        exposant_configurations: Exposant de Zipf de la frequence des
+                                 configurations distinctes (0 = uniforme)
+        nb_distinctes: Nombre de configurations distinctes (defaut: nombre // 10)
+        taux_absents: Probabilite qu'un fait ne soit pas renseigne
+
+    Returns:
+        Liste de dictionnaires de faits (les configurations populaires sont
+        les memes objets, repetes)
+    """
+    rng = random.Random(graine)
+    nb_distinctes = max(1, nb_distinctes if nb_distinctes is not None else nombre // 10)
+
+    # Popularite des options : un ordre aleatoire par caracteristique
+    popularite = {}
+    for cle in base_faits.obtenir_attributs():
+        options = list(base_faits.obtenir_options(cle))
+        rng.shuffle(options)
+        popularite[cle] = (options, poids_zipf(len(options), exposant_options))
+
+    distinctes = []
+    for _ in range(nb_distinctes):
+        faits = {}
+        for cle, (options, poids) in popularite.items():
+            if rng.random() >= taux_absents:
+                faits[cle] = tirer(rng, options, poids)
+        distinctes.append(faits)
+
+    poids = poids_zipf(nb_distinctes, exposant_configurations)
+    return [tirer(rng, distinctes, poids) for _ in range(nombre)]
+
+
+def verifier_aller_retour_json(base_faits: BaseFaits, regles: List[Dict],
+                               configurations: List[Dict[str, Any]]) -> int:
+    """
+    Compare les estimations des regles generees et de leur copie relue en JSON.
+
+    Les regles generees doivent donner les memes resultats en memoire et
+    une fois ecrites dans un fichier de regles (--regles).
+
+    Args:
+        base_faits: Base de faits
+        regles: Regles generees
+        configurations: Configurations evaluees
+
+    Returns:
+        Le nombre de configurations dont les estimations different
+    """
+    from compilation_regles import InstantaneRegles
+    from moteur_inference import MoteurInference
+
+    moteurs = []
+    for version in (regles, json.loads(json.dumps(regles))):
+        base_regles = BaseRegles()
+        base_regles.installer_instantane(InstantaneRegles(version, 0), version)
+        moteurs.append(MoteurInference(base_faits, base_regles, 0.0))
+    return sum(moteurs[0].evaluer(faits) != moteurs[1].evaluer(faits) for faits in configurations)
+
+
+def main():
+    parseur = argparse.ArgumentParser(description="Genere une base de regles et une charge synthetiques")
+    parseur.add_argument("nb_regles", type=int, help="Nombre de regles")
+    parseur.add_argument("-n", "--configurations", type=int, default=10000,
+                         help="Nombre de configurations (defaut: 10000)")
+    parseur.add_argument("-o", "--dossier", default=".", help="Dossier de sortie (defaut: .)")
+    parseur.add_argument("--graine", type=int, default=42)
+    parseur.add_argument("--densite-requises", type=float, default=0.2)
+    parseur.add_argument("--densite-optionnelles", type=float, default=0.25)
+    parseur.add_argument("--densite-excluantes", type=float, default=0.05)
+    parseur.add_argument("--part-booleennes", type=float, default=None)
+    parseur.add_argument("--zipf-options", type=float, default=1.1)
+    parseur.add_argument("--zipf-configurations", type=float, default=1.0)
+    arguments = parseur.parse_args()
+
+    base_faits = BaseFaits()
+    regles = generer_regles(base_faits, arguments.nb_regles, arguments.graine,
+                            arguments.densite_requises, arguments.densite_optionnelles,
+                            arguments.densite_excluantes, arguments.part_booleennes)
+    configurations = generer_configurations(base_faits, arguments.configurations, arguments.graine,
+                                            arguments.zipf_options, arguments.zipf_configurations)
+
+    differences = verifier_aller_retour_json(base_faits, regles, configurations[:200])
+    if differences:
+        print(f"[!] {differences} configuration(s) estimee(s) differemment apres relecture JSON")
+        sys.exit(1)
+
+    os.makedirs(arguments.dossier, exist_ok=True)
+    chemin_regles = os.path.join(arguments.dossier, f"regles_{arguments.nb_regles}.json")
+    chemin_configurations = os.path.join(arguments.dossier, f"configurations_{arguments.configurations}.jsonl")
+    with open(chemin_regles, "w", encoding="utf-8") as fichier:
+        json.dump(regles, fichier, ensure_ascii=False)
+    with open(chemin_configurations, "w", encoding="utf-8") as fichier:
+        for faits in configurations:
+            fichier.write(json.dumps(faits, ensure_ascii=False) + "\n")
+
+    print(f"[OK] {len(regles)} regle(s) ecrite(s) dans {chemin_regles}")
+    print(f"[OK] {len(configurations)} configuration(s) ecrite(s) dans {chemin_configurations}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Client Leger du Demon d'Estimation - Systeme Expert Prix PC Portable
+=====================================================================
+
+Client du demon d'estimation (voir demon_estimation.py). Il n'importe que
+la bibliotheque standard, et aucun module du systeme expert : son
+demarrage ne coute que celui de l'interpreteur, le moteur et la base de
+regles restant "chauds" dans le demon.
+
+Usage:
+    Une configuration (cle=valeur, oui/non pour une option booleenne) :
+    $ python client_estimation.py usage=Gaming ram="16 Go" clavier_rgb=oui
+
+    Un fichier JSONL (un objet de faits par ligne) -> JSONL des estimations :
+    $ python client_estimation.py -k 1 < configurations.jsonl > estimations.jsonl
+
+    Administration :
+    $ python client_estimation.py --commande statistiques
+    $ python client_estimation.py --commande recharger
+
+Code de sortie : 0 si toutes les demandes ont abouti, 1 si au moins une
+a ete refusee, 2 si le demon est injoignable.
+"""
+
+import argparse
+import json
+import os
+import socket
+import sys
+from typing import Any, Dict, Iterable, Iterator, List
+
+
+# Socket par defaut du demon (variable d'environnement SYSTEME_EXPERT_SOCKET)
+CHEMIN_SOCKET_DEFAUT = os.environ.get("SYSTEME_EXPERT_SOCKET") or os.path.join(
+    os.environ.get("TMPDIR", "/tmp"), f"systeme_expert_{os.getuid() if hasattr(os, 'getuid') else 0}.sock")
+
+# Demandes envoyees sans attendre leur reponse
+DEMANDES_EN_VOL = 64
+
+# Valeurs acceptees pour une option booleenne en ligne de commande
+BOOLEENS = {"oui": True, "true": True, "vrai": True, "non": False, "false": False, "faux": False}
+
+
+class ClientEstimation:
+    """
+    Connexion au demon d'estimation.
+
+    S'utilise comme gestionnaire de contexte :
+        with ClientEstimation() as client:
+            client.estimer({"usage": "Gaming"})
+
+    Attributes:
+        chemin_socket (str): Fichier de la socket Unix du demon
+    """
+
+    def __init__(self, chemin_socket: str = CHEMIN_SOCKET_DEFAUT):
+        """
+        Se connecte au demon.
+
+        Args:
+            chemin_socket: Fichier de la socket Unix du demon
+
+        Raises:
+            OSError: Demon injoignable
+        """
+        self.chemin_socket = chemin_socket
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self._socket.connect(chemin_socket)
+        except OSError:
+            self._socket.close()
+            raise
+        self._fichier = self._socket.makefile("rwb")
+
+    def demander(self, demande: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Envoie une demande et attend sa reponse.
+
+        Args:
+            demande: Objet JSON de la demande (voir demon_estimation.py)
+
+        Returns:
+            Objet JSON de la reponse
+        """
+        return next(self.demander_flux([demande]))
+
+    def demander_flux(self, demandes: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """
+        Envoie des demandes a la suite, sans attendre chaque reponse
+        (au plus DEMANDES_EN_VOL en attente), et retourne les reponses dans l'ordre.
+
+        Args:
+            demandes: Objets JSON des demandes
+
+        Yields:
+            Objet JSON de chaque reponse
+
+        Raises:
+            ConnectionError: Connexion fermee par le demon
+        """
+        en_vol = 0
+        for demande in demandes:
+            self._fichier.write(json.dumps(demande, ensure_ascii=False).encode("utf-8") + b"\n")
+            en_vol += 1
+            if en_vol >= DEMANDES_EN_VOL:
+                self._fichier.flush()
+                yield self._lire_reponse()
+                en_vol -= 1
+        self._fichier.flush()
+        for _ in range(en_vol):
+            yield self._lire_reponse()
+
+    def _lire_reponse(self) -> Dict[str, Any]:
+        """Lit une ligne de reponse."""
+        ligne = self._fichier.readline()
+        if not ligne:
+            raise ConnectionError("Connexion fermee par le demon")
+        return json.loads(ligne)
+
+    def estimer(self, faits: Dict[str, Any], k: int = 3) -> List[Dict[str, Any]]:
+        """
+        Estime une configuration.
+
+        Args:
+            faits: Dictionnaire des faits
+            k: Nombre d'estimations voulues
+
+        Returns:
+            Liste des estimations {nom, confiance, prix_min, prix_max}
+
+        Raises:
+            ValueError: Demande refusee par le demon
+        """
+        reponse = self.demander({"faits": faits, "k": k})
+        if "estimations" not in reponse:
+            raise ValueError(reponse.get("erreurs") or reponse.get("erreur"))
+        return reponse["estimations"]
+
+    def fermer(self) -> None:
+        """Ferme la connexion."""
+        self._fichier.close()
+        self._socket.close()
+
+    def __enter__(self) -> "ClientEstimation":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.fermer()
+
+
+def lire_faits(arguments: List[str]) -> Dict[str, Any]:
+    """
+    Convertit des arguments cle=valeur en dictionnaire de faits.
+
+    Args:
+        arguments: Arguments "cle=valeur" (oui/non pour une option booleenne)
+
+    Returns:
+        Dictionnaire des faits
+
+    Raises:
+        ValueError: Argument sans "="
+    """
+    faits = {}
+    for argument in arguments:
+        cle, egal, valeur = argument.partition("=")
+        if not egal:
+            raise ValueError(f"Argument cle=valeur attendu : {argument!r}")
+        faits[cle.strip()] = BOOLEENS.get(valeur.strip().lower(), valeur.strip())
+    return faits
+
+
+def lire_ligne(ligne: str) -> Any:
+    """Decode une ligne JSONL ; une ligne illisible est transmise telle quelle (refusee par le demon)."""
+    try:
+        return json.loads(ligne)
+    except ValueError:
+        return ligne.strip()
+
+
+def afficher_estimations(reponse: Dict[str, Any]) -> None:
+    """Affiche les estimations d'une reponse (ou ses erreurs)."""
+    if "estimations" not in reponse:
+        for erreur in reponse.get("erreurs") or [reponse.get("erreur")]:
+            print(f"[!] {erreur}")
+        return
+    if not reponse["estimations"]:
+        print("[!] Aucune estimation au-dessus du seuil de confiance")
+    for rang, estimation in enumerate(reponse["estimations"], 1):
+        if estimation["prix_max"] >= 10000:
+            prix = f"> {estimation['prix_min']} euros"
+        else:
+            prix = f"{estimation['prix_min']} - {estimation['prix_max']} euros"
+        print(f"{rang}. {estimation['nom']} ({prix}) - Confiance: {estimation['confiance'] * 100:.0f}%")
+
+
+def main(arguments=None) -> int:
+    parseur = argparse.ArgumentParser(description="Client du demon d'estimation (python main.py daemon)")
+    parseur.add_argument("faits", nargs="*", metavar="cle=valeur",
+                         help="Faits de la configuration (sans argument : JSONL lu sur l'entree standard)")
+    parseur.add_argument("-k", type=int, default=3, help="Nombre d'estimations (defaut: 3)")
+    parseur.add_argument("--socket", default=CHEMIN_SOCKET_DEFAUT,
+                         help=f"Socket du demon (defaut: {CHEMIN_SOCKET_DEFAUT})")
+    parseur.add_argument("--commande", choices=["sante", "statistiques", "recharger"],
+                         help="Commande d'administration du demon")
+    arguments = parseur.parse_args(arguments)
+
+    try:
+        client = ClientEstimation(arguments.socket)
+    except OSError as erreur:
+        print(f"[!] Demon injoignable sur {arguments.socket} ({erreur.strerror or erreur}) : "
+              f"lancez python main.py daemon", file=sys.stderr)
+        return 2
+
+    with client:
+        if arguments.commande:
+            reponse = client.demander({"commande": arguments.commande})
+            print(json.dumps(reponse, ensure_ascii=False, indent=2))
+            return 0 if "statut" not in reponse else 1
+
+        if arguments.faits:
+            try:
+                faits = lire_faits(arguments.faits)
+            except ValueError as erreur:
+                parseur.error(str(erreur))
+            reponse = client.demander({"faits": faits, "k": arguments.k})
+            afficher_estimations(reponse)
+            return 0 if "estimations" in reponse else 1
+
+        # Flux JSONL : une reponse par ligne non vide, dans l'ordre
+        demandes = ({"faits": lire_ligne(ligne), "k": arguments.k}
+                    for ligne in sys.stdin if ligne.strip())
+        code = 0
+        try:
+            for reponse in client.demander_flux(demandes):
+                sys.stdout.write(json.dumps(reponse, ensure_ascii=False) + "\n")
+                if "estimations" not in reponse:
+                    code = 1
+        except ConnectionError as erreur:
+            print(f"[!] Connexion au demon interrompue : {erreur}", file=sys.stderr)
+            return 2
+        return code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,772 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Compilation des Regles - Systeme Expert Prix PC Portable
+=========================================================
+
+Ce module contient la classe RegleCompilee et la fonction compiler_regle qui
+transforment une regle (dictionnaire) en une forme precalculee :
+- chaque condition devient un couple (cle, frozenset des valeurs acceptees)
+- les conditions booleennes deviennent un frozenset a un element
+- les nombres de conditions sont calcules une seule fois
+
+L'evaluation d'une regle compilee produit exactement le meme resultat
+(correspondance, confiance) que MoteurInference.evaluer_regle sur la regle
+d'origine, mais sans recherche lineaire dans des listes ni dispatch
+isinstance a chaque appel.
+
+La classe ExplicationRegle detaille, a la demande, l'evaluation d'une
+regle (conditions satisfaites ou non, calcul du score) ; elle n'est jamais
+construite par le chemin normal d'evaluation.
+
+Il contient aussi la classe IndexRegles, un index inverse
+(caracteristique, valeur) -> regles utilise pour n'evaluer que les
+regles candidates, et la classe InstantaneRegles qui regroupe les
+regles compilees et leur index en un instantane immuable, partageable
+entre plusieurs threads.
+"""
+
+import threading
+from typing import Any, Callable, Dict, FrozenSet, List, Mapping, Optional, Tuple
+
+
+# Une condition compilee : (cle du fait, ensemble des valeurs acceptees)
+ConditionCompilee = Tuple[str, FrozenSet[Any]]
+
+
+def compiler_valeurs(valeurs_acceptees: Any) -> FrozenSet[Any]:
+    """
+    Transforme les valeurs acceptees d'une condition en frozenset.
+
+    Semantique d'une condition (la meme que celle de
+    MoteurInference.verifier_condition) : seule une liste est testee par
+    appartenance ; toute autre valeur, booleen ou tuple compris, est
+    comparee par egalite (un tuple de valeurs n'accepte donc que ce tuple
+    lui-meme). None n'est jamais retenu car un fait absent ne satisfait
+    aucune condition.
+
+    Args:
+        valeurs_acceptees: Liste de valeurs acceptees ou valeur unique
+
+    Returns:
+        Ensemble fige des valeurs qui satisfont la condition
+    """
+    if isinstance(valeurs_acceptees, list):
+        return frozenset(v for v in valeurs_acceptees if v is not None)
+    if valeurs_acceptees is None:
+        return frozenset()
+    return frozenset((valeurs_acceptees,))
+
+
+def retirer_non_hachables(faits: Mapping[str, Any]) -> Mapping[str, Any]:
+    """
+    Retire des faits les valeurs non hashables (listes, dictionnaires...).
+
+    Une telle valeur n'est dans aucun frozenset de valeurs acceptees : comme
+    un fait absent, elle ne satisfait aucune condition.
+
+    Args:
+        faits: Dictionnaire des faits
+
+    Returns:
+        Les faits eux-memes s'ils sont tous hashables, sinon une copie filtree
+    """
+    hachables = {}
+    for cle, valeur in faits.items():
+        try:
+            hash(valeur)
+        except TypeError:
+            continue
+        hachables[cle] = valeur
+    return faits if len(hachables) == len(faits) else hachables
+
+
+def compiler_conditions(conditions: Dict[str, Any]) -> Tuple[ConditionCompilee, ...]:
+    """
+    Compile un dictionnaire de conditions en tuple de conditions compilees.
+
+    Args:
+        conditions: Dictionnaire {cle: valeurs acceptees}
+
+    Returns:
+        Tuple de couples (cle, frozenset) dans l'ordre du dictionnaire
+    """
+    return tuple((cle, compiler_valeurs(valeurs)) for cle, valeurs in conditions.items())
+
+
+class RegleCompilee:
+    """
+    Forme precalculee d'une regle de la base de regles.
+
+    Attributes:
+        regle (Dict): La regle d'origine (nom, description, prix...)
+        nom (str): Nom de la gamme de prix
+        confiance_base (float): Niveau de confiance de base
+        requises (Tuple): Conditions requises compilees
+        optionnelles (Tuple): Conditions optionnelles compilees
+        excluantes (Tuple): Conditions excluantes compilees
+        confiance_max (float): Confiance maximale atteignable (toutes les
+                               conditions requises et optionnelles satisfaites)
+    """
+
+    __slots__ = ("regle", "nom", "confiance_base", "requises", "optionnelles",
+                 "excluantes", "nb_requises", "nb_optionnelles", "confiance_max")
+
+    def __init__(self, regle: Dict):
+        """
+        Compile une regle.
+
+        Args:
+            regle: La regle (dictionnaire) a compiler
+        """
+        self._initialiser(regle,
+                          compiler_conditions(regle.get("conditions_requises", {})),
+                          compiler_conditions(regle.get("conditions_optionnelles", {})),
+                          compiler_conditions(regle.get("conditions_excluantes", {})))
+
+    @classmethod
+    def depuis_conditions(cls, regle: Dict, requises: Tuple[ConditionCompilee, ...],
+                          optionnelles: Tuple[ConditionCompilee, ...],
+                          excluantes: Tuple[ConditionCompilee, ...]) -> "RegleCompilee":
+        """
+        Construit une regle compilee a partir de conditions deja compilees.
+
+        Sert au chargement d'un instantane binaire (voir instantane_binaire.py),
+        ou les conditions identiques de plusieurs regles sont partagees.
+
+        Args:
+            regle: La regle d'origine
+            requises: Conditions requises compilees
+            optionnelles: Conditions optionnelles compilees
+            excluantes: Conditions excluantes compilees
+
+        Returns:
+            La regle compilee
+        """
+        regle_compilee = cls.__new__(cls)
+        regle_compilee._initialiser(regle, requises, optionnelles, excluantes)
+        return regle_compilee
+
+    def _initialiser(self, regle: Dict, requises, optionnelles, excluantes) -> None:
+        """Renseigne les attributs a partir des conditions compilees."""
+        self.regle = regle
+        self.nom = regle["nom"]
+        self.confiance_base = regle["confiance_base"]
+        self.requises = requises
+        self.optionnelles = optionnelles
+        self.excluantes = excluantes
+        self.nb_requises = len(self.requises)
+        self.nb_optionnelles = len(self.optionnelles)
+        # Le score est croissant avec les nombres de conditions satisfaites
+        self.confiance_max = self.calculer_confiance(self.nb_requises, self.nb_optionnelles)
+
+    def evaluer(self, faits: Mapping[str, Any]) -> Tuple[bool, float]:
+        """
+        Evalue la regle compilee par rapport a un dictionnaire de faits.
+
+        Args:
+            faits: Dictionnaire des faits (cle -> valeur)
+
+        Returns:
+            Tuple (correspondance, score_confiance), identique a
+            MoteurInference.evaluer_regle sur la regle d'origine
+        """
+        get = faits.get
+
+        # Etape 1 : Conditions excluantes
+        for cle, valeurs in self.excluantes:
+            if get(cle) in valeurs:
+                return (False, 0.0)
+
+        # Etape 2 : Ratio de conditions requises
+        if self.nb_requises:
+            nb_satisfaites = 0
+            for cle, valeurs in self.requises:
+                if get(cle) in valeurs:
+                    nb_satisfaites += 1
+            ratio_requis = nb_satisfaites / self.nb_requises
+        else:
+            ratio_requis = 1.0
+
+        if ratio_requis < 0.5:
+            return (False, 0.0)
+
+        # Etape 3 : Score de confiance
+        confiance = self.confiance_base * (0.7 + 0.3 * ratio_requis)
+
+        # Etape 4 : Bonus optionnels (maximum 15%)
+        if self.nb_optionnelles:
+            nb_satisfaites = 0
+            for cle, valeurs in self.optionnelles:
+                if get(cle) in valeurs:
+                    nb_satisfaites += 1
+            bonus = (nb_satisfaites / self.nb_optionnelles) * 0.15
+        else:
+            bonus = 0.0
+
+        return (True, min(1.0, confiance + bonus))
+
+    def calculer_confiance(self, nb_requises_satisfaites: int,
+                           nb_optionnelles_satisfaites: int) -> Optional[float]:
+        """
+        Calcule la confiance a partir des nombres de conditions satisfaites.
+
+        Sert aux moteurs qui maintiennent ces compteurs eux-memes ; les
+        conditions excluantes doivent avoir ete verifiees au prealable.
+
+        Args:
+            nb_requises_satisfaites: Nombre de conditions requises satisfaites
+            nb_optionnelles_satisfaites: Nombre de conditions optionnelles satisfaites
+
+        Returns:
+            Le score de confiance, ou None si moins de 50% des conditions
+            requises sont satisfaites
+        """
+        if self.nb_requises:
+            ratio_requis = nb_requises_satisfaites / self.nb_requises
+            if ratio_requis < 0.5:
+                return None
+        else:
+            ratio_requis = 1.0
+
+        confiance = self.confiance_base * (0.7 + 0.3 * ratio_requis)
+
+        if self.nb_optionnelles:
+            bonus = (nb_optionnelles_satisfaites / self.nb_optionnelles) * 0.15
+        else:
+            bonus = 0.0
+
+        return min(1.0, confiance + bonus)
+
+    def expliquer(self, faits: Mapping[str, Any]) -> "ExplicationRegle":
+        """
+        Evalue la regle en gardant le detail de chaque condition.
+
+        Plus lent que evaluer() : reserve aux explications demandees par
+        l'utilisateur (voir MoteurInference.expliquer).
+
+        Args:
+            faits: Dictionnaire des faits (cle -> valeur)
+
+        Returns:
+            L'explication, dont la confiance est celle de evaluer()
+        """
+        get = faits.get
+        explication = ExplicationRegle(self)
+
+        # Etape 1 : Conditions excluantes (la premiere declenchee rejette la regle)
+        for cle, valeurs in self.excluantes:
+            if get(cle) in valeurs:
+                explication.exclusion = (cle, get(cle))
+                return explication
+
+        # Etape 2 : Conditions requises
+        for cle, valeurs in self.requises:
+            if get(cle) in valeurs:
+                explication.requises_satisfaites.append((cle, get(cle)))
+            else:
+                explication.requises_manquees.append((cle, get(cle)))
+        if self.nb_requises:
+            explication.ratio_requis = len(explication.requises_satisfaites) / self.nb_requises
+        if explication.ratio_requis < 0.5:
+            return explication
+
+        # Etapes 3 et 4 : Score de confiance et bonus optionnels
+        for cle, valeurs in self.optionnelles:
+            if get(cle) in valeurs:
+                explication.optionnelles_satisfaites.append((cle, get(cle)))
+            else:
+                explication.optionnelles_manquees.append((cle, get(cle)))
+        explication.correspond = True
+        explication.confiance = self.calculer_confiance(len(explication.requises_satisfaites),
+                                                        len(explication.optionnelles_satisfaites))
+        return explication
+
+
+class ExplicationRegle:
+    """
+    Detail de l'evaluation d'une regle pour des faits donnes.
+
+    Les conditions sont des couples (cle, valeur du fait), la valeur
+    valant None pour un fait non renseigne.
+
+    Attributes:
+        regle (RegleCompilee): La regle expliquee
+        exclusion (Optional[Tuple[str, Any]]): Condition excluante declenchee
+        requises_satisfaites / requises_manquees (List[Tuple[str, Any]]): Conditions requises
+        optionnelles_satisfaites / optionnelles_manquees (List[Tuple[str, Any]]): Conditions
+            optionnelles (vides si la regle est rejetee avant le bonus)
+        ratio_requis (float): Part des conditions requises satisfaites
+        correspond (bool): True si la regle s'applique
+        confiance (float): Score de confiance (0 si la regle ne s'applique pas)
+    """
+
+    __slots__ = ("regle", "exclusion", "requises_satisfaites", "requises_manquees",
+                 "optionnelles_satisfaites", "optionnelles_manquees", "ratio_requis",
+                 "correspond", "confiance")
+
+    def __init__(self, regle: RegleCompilee):
+        """
+        Initialise une explication vide (regle non evaluee).
+
+        Args:
+            regle: La regle expliquee
+        """
+        self.regle = regle
+        self.exclusion: Optional[Tuple[str, Any]] = None
+        self.requises_satisfaites: List[Tuple[str, Any]] = []
+        self.requises_manquees: List[Tuple[str, Any]] = []
+        self.optionnelles_satisfaites: List[Tuple[str, Any]] = []
+        self.optionnelles_manquees: List[Tuple[str, Any]] = []
+        self.ratio_requis = 1.0
+        self.correspond = False
+        self.confiance = 0.0
+
+    def calcul(self) -> str:
+        """
+        Retourne le calcul du score, par exemple
+        "0.75 x (0.7 + 0.3 x 2/3) + 0.15 x 1/2 = 0.78".
+
+        Returns:
+            Le detail du calcul, ou la raison du rejet
+        """
+        if self.exclusion is not None:
+            cle, valeur = self.exclusion
+            return f"rejetee : condition excluante {cle} = {valeur}"
+        nb_requises = self.regle.nb_requises
+        nb_satisfaites = len(self.requises_satisfaites)
+        if not self.correspond:
+            return (f"rejetee : {nb_satisfaites}/{nb_requises} conditions requises "
+                    f"satisfaites (minimum 50%)")
+
+        requises = f"{nb_satisfaites}/{nb_requises}" if nb_requises else "1"
+        calcul = f"{self.regle.confiance_base:g} x (0.7 + 0.3 x {requises})"
+        if self.regle.nb_optionnelles:
+            calcul += f" + 0.15 x {len(self.optionnelles_satisfaites)}/{self.regle.nb_optionnelles}"
+        plafond = " (plafonne a 1)" if self.confiance == 1.0 else ""
+        return f"{calcul} = {self.confiance:.2f}{plafond}"
+
+    def formater(self, seuil_confiance: Optional[float] = None) -> List[str]:
+        """
+        Formate l'explication en lignes de texte.
+
+        Args:
+            seuil_confiance: Seuil du moteur, pour indiquer si la regle est retenue
+
+        Returns:
+            Les lignes de l'explication
+        """
+        regle = self.regle.regle
+        if not self.correspond:
+            verdict = "NON APPLICABLE"
+        elif seuil_confiance is not None and self.confiance <= seuil_confiance:
+            verdict = f"SOUS LE SEUIL ({seuil_confiance * 100:.0f}%)"
+        else:
+            verdict = f"APPLICABLE ({self.confiance * 100:.0f}%)"
+        lignes = [f"{regle['nom']} - {regle['description']} : {verdict}",
+                  f"   Calcul : {self.calcul()}"]
+
+        def conditions(titre, couples, symbole):
+            for cle, valeur in couples:
+                lignes.append(f"   {symbole} {titre} {cle} = {'non renseigne' if valeur is None else valeur}")
+
+        if self.exclusion is None:
+            conditions("requise", self.requises_satisfaites, "[+]")
+            conditions("requise", self.requises_manquees, "[-]")
+            conditions("optionnelle", self.optionnelles_satisfaites, "[+]")
+            conditions("optionnelle", self.optionnelles_manquees, "[-]")
+        return lignes
+
+
+def compiler_regle(regle: Dict) -> RegleCompilee:
+    """
+    Compile une regle de la base de regles.
+
+    Args:
+        regle: La regle a compiler
+
+    Returns:
+        La regle compilee
+    """
+    return RegleCompilee(regle)
+
+
+class IndexRegles:
+    """
+    Index inverse (caracteristique, valeur) -> regles de la base.
+
+    Pour chaque type de condition, index[cle][valeur] donne le tuple des
+    indices des regles dont la condition sur cle accepte cette valeur :
+    les regles que la valeur exclut, celles dont elle satisfait une
+    condition requise et celles auxquelles elle apporte un bonus.
+
+    Attributes:
+        excluantes (Dict[str, Dict[Any, Tuple[int, ...]]]): Regles exclues par une valeur
+        requises (Dict[str, Dict[Any, Tuple[int, ...]]]): Regles dont une condition requise est satisfaite
+        optionnelles (Dict[str, Dict[Any, Tuple[int, ...]]]): Regles dont une condition optionnelle est satisfaite
+        nb_requises (Tuple[int, ...]): Nombre de conditions requises de chaque regle
+        sans_requises (Tuple[int, ...]): Regles sans condition requise (toujours candidates)
+        cles (FrozenSet[str]): Caracteristiques citees par au moins une regle
+        par_nom (Dict[str, Tuple[int, ...]]): Regles de chaque gamme, dans l'ordre de la base
+        par_borne (Tuple[Tuple[float, int], ...]): Couples (confiance_max, indice)
+            par confiance maximale decroissante puis indice croissant
+    """
+
+    def __init__(self, regles_compilees, index_conditions: Optional[Tuple[Dict, Dict, Dict]] = None):
+        """
+        Construit l'index a partir des regles compilees.
+
+        Args:
+            regles_compilees: Liste de RegleCompilee, dans l'ordre de la base
+            index_conditions: Index (excluantes, requises, optionnelles) deja
+                              calcules, par exemple lus dans un instantane binaire
+        """
+        if index_conditions is None:
+            index_conditions = (self._indexer(regles_compilees, "excluantes"),
+                                self._indexer(regles_compilees, "requises"),
+                                self._indexer(regles_compilees, "optionnelles"))
+        self.excluantes, self.requises, self.optionnelles = index_conditions
+        self.nb_requises = tuple(regle.nb_requises for regle in regles_compilees)
+        self.sans_requises = tuple(r for r, n in enumerate(self.nb_requises) if n == 0)
+        self.cles = frozenset(self.excluantes) | frozenset(self.requises) | frozenset(self.optionnelles)
+
+        par_nom: Dict[str, List[int]] = {}
+        for r, regle in enumerate(regles_compilees):
+            par_nom.setdefault(regle.nom, []).append(r)
+        self.par_nom = {nom: tuple(regles) for nom, regles in par_nom.items()}
+        self.par_borne = tuple(sorted(((regle.confiance_max, r) for r, regle in enumerate(regles_compilees)),
+                                      key=lambda borne: (-borne[0], borne[1])))
+
+    @staticmethod
+    def _indexer(regles_compilees, type_condition: str) -> Dict[str, Dict[Any, Tuple[int, ...]]]:
+        """Construit l'index d'un type de condition."""
+        index: Dict[str, Dict[Any, list]] = {}
+        for r, regle in enumerate(regles_compilees):
+            for cle, valeurs in getattr(regle, type_condition):
+                par_valeur = index.setdefault(cle, {})
+                for valeur in valeurs:
+                    par_valeur.setdefault(valeur, []).append(r)
+        return {cle: {valeur: tuple(regles) for valeur, regles in par_valeur.items()}
+                for cle, par_valeur in index.items()}
+
+    def avec_regle(self, regle: RegleCompilee) -> "IndexRegles":
+        """
+        Retourne un nouvel index avec une regle ajoutee en fin de base.
+
+        L'index courant n'est pas modifie : seules les entrees des
+        caracteristiques citees par la regle sont recopiees, les autres
+        sont partagees avec le nouvel index.
+
+        Args:
+            regle: La regle compilee ajoutee (indice len(nb_requises))
+
+        Returns:
+            L'index de la nouvelle version de la base
+        """
+        r = len(self.nb_requises)
+        index = IndexRegles.__new__(IndexRegles)
+        index.excluantes = self._indexer_regle(self.excluantes, regle.excluantes, r)
+        index.requises = self._indexer_regle(self.requises, regle.requises, r)
+        index.optionnelles = self._indexer_regle(self.optionnelles, regle.optionnelles, r)
+        index.nb_requises = self.nb_requises + (regle.nb_requises,)
+        index.sans_requises = self.sans_requises + ((r,) if regle.nb_requises == 0 else ())
+        index.cles = self.cles | frozenset(cle for conditions in (regle.excluantes, regle.requises,
+                                                                  regle.optionnelles)
+                                           for cle, _ in conditions)
+
+        index.par_nom = dict(self.par_nom)
+        index.par_nom[regle.nom] = self.par_nom.get(regle.nom, ()) + (r,)
+
+        # Position apres toutes les regles de borne superieure ou egale
+        par_borne = self.par_borne
+        debut, fin = 0, len(par_borne)
+        while debut < fin:
+            milieu = (debut + fin) // 2
+            if par_borne[milieu][0] >= regle.confiance_max:
+                debut = milieu + 1
+            else:
+                fin = milieu
+        index.par_borne = par_borne[:debut] + ((regle.confiance_max, r),) + par_borne[debut:]
+        return index
+
+    def sans_regle(self, r: int) -> "IndexRegles":
+        """
+        Retourne un nouvel index sans la regle d'indice r.
+
+        Les regles suivantes sont decalees d'un indice ; les listes qui ne
+        contiennent que des regles anterieures sont partagees telles quelles.
+
+        Args:
+            r: Indice de la regle retiree
+
+        Returns:
+            L'index de la nouvelle version de la base
+        """
+        def decaler(regles: Tuple[int, ...]) -> Tuple[int, ...]:
+            if not regles or regles[-1] < r:
+                return regles
+            return tuple(x - (x > r) for x in regles if x != r)
+
+        def decaler_index(index_type: Dict[str, Dict[Any, Tuple[int, ...]]]) -> Dict:
+            resultat = {}
+            for cle, par_valeur in index_type.items():
+                par_valeur = {valeur: decaler(regles) for valeur, regles in par_valeur.items()}
+                par_valeur = {valeur: regles for valeur, regles in par_valeur.items() if regles}
+                if par_valeur:
+                    resultat[cle] = par_valeur
+            return resultat
+
+        index = IndexRegles.__new__(IndexRegles)
+        index.excluantes = decaler_index(self.excluantes)
+        index.requises = decaler_index(self.requises)
+        index.optionnelles = decaler_index(self.optionnelles)
+        index.nb_requises = self.nb_requises[:r] + self.nb_requises[r + 1:]
+        index.sans_requises = decaler(self.sans_requises)
+        index.cles = frozenset(index.excluantes) | frozenset(index.requises) | frozenset(index.optionnelles)
+        index.par_nom = {nom: decaler(regles) for nom, regles in self.par_nom.items()}
+        index.par_nom = {nom: regles for nom, regles in index.par_nom.items() if regles}
+        index.par_borne = tuple((borne, x - (x > r)) for borne, x in self.par_borne if x != r)
+        return index
+
+    @staticmethod
+    def _indexer_regle(index_type: Dict[str, Dict[Any, Tuple[int, ...]]], conditions,
+                       r: int) -> Dict[str, Dict[Any, Tuple[int, ...]]]:
+        """Copie un index de type de condition en y ajoutant la regle r."""
+        if not conditions:
+            return index_type
+        resultat = dict(index_type)
+        for cle, valeurs in conditions:
+            par_valeur = dict(resultat.get(cle, {}))
+            for valeur in valeurs:
+                par_valeur[valeur] = par_valeur.get(valeur, ()) + (r,)
+            resultat[cle] = par_valeur
+        return resultat
+
+    def candidats(self, faits: Mapping[str, Any], trier: bool = True) -> List[int]:
+        """
+        Retourne les regles qui peuvent correspondre aux faits.
+
+        Une regle est candidate si aucune de ses conditions excluantes n'est
+        satisfaite et si au moins la moitie de ses conditions requises le
+        sont. Les autres regles seraient rejetees par evaluer_regle.
+
+        Args:
+            faits: Dictionnaire des faits
+            trier: Si False, l'ordre des indices n'est pas garanti
+
+        Returns:
+            Indices des regles candidates, dans l'ordre de la base
+        """
+        get = faits.get
+
+        exclues = set()
+        for cle, par_valeur in self.excluantes.items():
+            regles = par_valeur.get(get(cle))
+            if regles:
+                exclues.update(regles)
+
+        satisfaites: Dict[int, int] = {}
+        for cle, par_valeur in self.requises.items():
+            regles = par_valeur.get(get(cle))
+            if regles:
+                for r in regles:
+                    satisfaites[r] = satisfaites.get(r, 0) + 1
+
+        nb_requises = self.nb_requises
+        candidats = [r for r, n in satisfaites.items()
+                     if 2 * n >= nb_requises[r] and r not in exclues]
+        candidats.extend(r for r in self.sans_requises if r not in exclues)
+        if trier:
+            candidats.sort()
+        return candidats
+
+
+class InstantaneRegles:
+    """
+    Instantane immuable de la base de regles compilee.
+
+    Les regles compilees et l'index sont construits ensemble pour une
+    version de la base et ne sont plus modifies ensuite : un lecteur qui a
+    obtenu l'instantane voit toujours un couple (regles, index) coherent,
+    meme si la base est modifiee pendant son evaluation.
+
+    Un instantane charge d'un fichier binaire (instantane_binaire.py) ne
+    reconstruit ses regles compilees et son index qu'au premier acces :
+    les moteurs qui lisent directement les sections du fichier (masques,
+    tables de conditions) n'en ont pas besoin.
+
+    Attributes:
+        version (int): Version de la base de regles a la construction
+        regles (Tuple[RegleCompilee, ...]): Regles compilees, dans l'ordre de la base
+        index (IndexRegles): Index inverse des regles compilees
+        tables_bitmask: Tables de MoteurBitmask chargees d'un instantane
+                        binaire, ou None (elles sont alors calculees a la demande)
+        binaire: InstantaneBinaire dont les regles sont lues (fichier projete
+                 en memoire, garde ouvert tant que l'instantane est utilise), ou None
+    """
+
+    __slots__ = ("version", "_compilation", "_compiler", "tables_bitmask", "binaire", "_par_regle")
+
+    # Serialise les compilations differees (rares : une par instantane charge)
+    _verrou_compilation = threading.Lock()
+
+    def __init__(self, regles: List[Dict], version: int):
+        """
+        Compile les regles et construit leur index.
+
+        Args:
+            regles: Liste des regles (dictionnaires) de la base
+            version: Version de la base de regles
+        """
+        self.version = version
+        regles_compilees = tuple(compiler_regle(regle) for regle in regles)
+        self._compilation = (regles_compilees, IndexRegles(regles_compilees))
+        self._compiler = None
+        self.tables_bitmask = None
+        self.binaire = None
+        self._par_regle = None
+
+    @classmethod
+    def depuis_compilation(cls, regles_compilees: Tuple[RegleCompilee, ...], index: IndexRegles,
+                           version: int, tables_bitmask=None) -> "InstantaneRegles":
+        """
+        Assemble un instantane a partir de regles deja compilees et indexees.
+
+        Args:
+            regles_compilees: Regles compilees, dans l'ordre de la base
+            index: Index inverse de ces regles
+            version: Version de la base de regles
+            tables_bitmask: Tables de MoteurBitmask deja calculees (ou None)
+
+        Returns:
+            L'instantane
+        """
+        instantane = cls.__new__(cls)
+        instantane.version = version
+        instantane._compilation = (tuple(regles_compilees), index)
+        instantane._compiler = None
+        instantane.tables_bitmask = tables_bitmask
+        instantane.binaire = None
+        instantane._par_regle = None
+        return instantane
+
+    @classmethod
+    def differe(cls, compiler: Callable[[], Tuple[Tuple[RegleCompilee, ...], IndexRegles]],
+                version: int, tables_bitmask=None, binaire=None) -> "InstantaneRegles":
+        """
+        Assemble un instantane dont les regles compilees et l'index sont construits au premier acces.
+
+        Args:
+            compiler: Fonction sans argument retournant (regles compilees, index)
+            version: Version de la base de regles
+            tables_bitmask: Tables de MoteurBitmask deja calculees (ou None)
+            binaire: InstantaneBinaire source (ou None)
+
+        Returns:
+            L'instantane
+        """
+        instantane = cls.__new__(cls)
+        instantane.version = version
+        instantane._compilation = None
+        instantane._compiler = compiler
+        instantane.tables_bitmask = tables_bitmask
+        instantane.binaire = binaire
+        instantane._par_regle = None
+        return instantane
+
+    def _compilation_differee(self) -> Tuple[Tuple[RegleCompilee, ...], IndexRegles]:
+        """Construit les regles compilees et l'index d'un instantane differe."""
+        with self._verrou_compilation:
+            compilation = self._compilation
+            if compilation is None:
+                regles_compilees, index = self._compiler()
+                compilation = self._compilation = (tuple(regles_compilees), index)
+                self._compiler = None
+            return compilation
+
+    @property
+    def regles(self) -> Tuple[RegleCompilee, ...]:
+        """Regles compilees, dans l'ordre de la base."""
+        compilation = self._compilation
+        return (compilation or self._compilation_differee())[0]
+
+    @property
+    def index(self) -> IndexRegles:
+        """Index inverse des regles compilees."""
+        compilation = self._compilation
+        return (compilation or self._compilation_differee())[1]
+
+    def compilee(self, regle: Dict) -> Optional[RegleCompilee]:
+        """
+        Retourne la forme compilee d'une regle (dictionnaire) de l'instantane.
+
+        La table regle -> regle compilee est construite au premier appel.
+
+        Args:
+            regle: Une regle de la base (le dictionnaire lui-meme, pas une copie)
+
+        Returns:
+            La regle compilee, ou None si la regle n'est pas dans l'instantane
+        """
+        par_regle = self._par_regle
+        if par_regle is None:
+            par_regle = self._par_regle = {id(compilee.regle): compilee for compilee in self.regles}
+        compilee = par_regle.get(id(regle))
+        return compilee if compilee is not None and compilee.regle is regle else None
+
+    def avec_version(self, version: int) -> "InstantaneRegles":
+        """
+        Retourne un instantane identique pour une autre version de la base.
+
+        Les regles compilees, l'index et les tables sont partages ;
+        l'instantane courant n'est pas modifie.
+
+        Args:
+            version: Version de la base de regles
+
+        Returns:
+            L'instantane (self s'il porte deja cette version)
+        """
+        if version == self.version:
+            return self
+        compilation = self._compilation
+        if compilation is None:
+            # Encore differe : la compilation se fera au premier acces de l'un ou l'autre
+            return InstantaneRegles.differe(self._compilation_differee, version,
+                                            self.tables_bitmask, self.binaire)
+        instantane = InstantaneRegles.depuis_compilation(*compilation, version, self.tables_bitmask)
+        instantane.binaire = self.binaire
+        return instantane
+
+    def avec_regle(self, regle: Dict, version: int) -> "InstantaneRegles":
+        """
+        Retourne l'instantane de la version suivante, avec une regle en plus.
+
+        Seule la nouvelle regle est compilee ; l'index est mis a jour de
+        facon incrementale (IndexRegles.avec_regle). L'instantane courant
+        n'est pas modifie.
+
+        Args:
+            regle: La regle (dictionnaire) ajoutee en fin de base
+            version: Version de la base apres l'ajout
+
+        Returns:
+            Le nouvel instantane
+        """
+        regle_compilee = compiler_regle(regle)
+        return InstantaneRegles.depuis_compilation(self.regles + (regle_compilee,),
+                                                   self.index.avec_regle(regle_compilee), version)
+
+    def sans_regle(self, r: int, version: int) -> "InstantaneRegles":
+        """
+        Retourne l'instantane de la version suivante, sans la regle d'indice r.
+
+        Args:
+            r: Indice de la regle retiree
+            version: Version de la base apres la suppression
+
+        Returns:
+            Le nouvel instantane
+        """
+        return InstantaneRegles.depuis_compilation(self.regles[:r] + self.regles[r + 1:],
+                                                   self.index.sans_regle(r), version)
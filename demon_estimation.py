@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Demon d'Estimation - Systeme Expert Prix PC Portable
+=====================================================
+
+Ce module garde un moteur d'inference "chaud" dans un processus resident
+qui ecoute sur une socket Unix locale. Un script shell ou une tache cron
+n'a plus a payer, a chaque PC estime, le demarrage de l'interpreteur,
+l'import des modules et la construction de la base de regles : il passe
+par le client leger (client_estimation.py, bibliotheque standard seule).
+
+Protocole : un objet JSON par ligne dans chaque sens, les reponses dans
+l'ordre des demandes (plusieurs demandes peuvent etre envoyees sans
+attendre les reponses) :
+
+    {"faits": {"usage": "Gaming", ...}, "k": 3, "id": 7}
+ -> {"id": 7, "estimations": [{"nom": ..., "confiance": ...,
+                              "prix_min": ..., "prix_max": ...}]}
+    {"commande": "sante" | "statistiques" | "recharger"}
+ -> {"etat": "ok", "version_regles": 3}, ...
+
+"id" est facultatif et simplement recopie. Une demande invalide recoit
+{"erreur": ...} ou {"erreurs": [...]} avec son "statut" (400, 503...).
+
+Les estimations passent par la file et les micro-lots de
+ServiceEstimation. Rechargement sans interruption : avec des fichiers de
+regles, un SurveillantRegles recharge la base quand ils changent, et
+SIGHUP ou la commande "recharger" forcent une relecture ; la compilation
+se fait hors de la boucle asyncio et la nouvelle base est publiee par un
+echange de reference, les lots en cours terminant sur l'ancienne.
+SIGTERM ou SIGINT arretent le demon apres les reponses en cours et
+suppriment le fichier de la socket.
+
+Usage:
+    $ python main.py --regles regles.json daemon &
+    $ python client_estimation.py usage=Gaming ram="16 Go"
+"""
+
+import asyncio
+import json
+import os
+import signal
+import socket
+from typing import Any, Dict, Optional, Set
+
+from client_estimation import CHEMIN_SOCKET_DEFAUT
+from rechargement_regles import SurveillantRegles
+from service_estimation import ErreurRequete, ServiceEstimation, verifier_demande
+from traitement_lot import convertir_estimations
+
+
+# Demandes d'une connexion en cours de traitement au-dela desquelles la lecture attend
+DEMANDES_EN_COURS_MAX = 256
+
+# Longueur maximale d'une ligne de demande (octets)
+TAILLE_LIGNE_MAX = 1 << 20
+
+
+class DemonEstimation:
+    """
+    Demon d'estimation sur socket Unix (JSON par ligne).
+
+    Attributes:
+        service (ServiceEstimation): File et micro-lots des estimations
+        chemin_socket (str): Fichier de la socket Unix
+        surveillant (SurveillantRegles): Rechargement des fichiers de regles (ou None)
+    """
+
+    def __init__(self, service: ServiceEstimation, chemin_socket: str = CHEMIN_SOCKET_DEFAUT,
+                 surveillant: Optional[SurveillantRegles] = None):
+        """
+        Initialise le demon (sans ouvrir la socket).
+
+        Args:
+            service: Service d'estimation (moteur et regroupement des requetes)
+            chemin_socket: Fichier de la socket Unix
+            surveillant: Surveillant des fichiers de regles, pour "recharger" et SIGHUP
+        """
+        self.service = service
+        self.chemin_socket = chemin_socket
+        self.surveillant = surveillant
+        self._arret: Optional[asyncio.Event] = None
+        self._lectures: Set[asyncio.Task] = set()
+        self._connexions: Set[asyncio.Task] = set()
+
+    # ------------------------------------------------------------
+    # Demandes
+    # ------------------------------------------------------------
+
+    async def traiter_ligne(self, ligne: bytes) -> Dict[str, Any]:
+        """
+        Traite une ligne de demande.
+
+        Args:
+            ligne: Objet JSON de la demande
+
+        Returns:
+            Objet JSON de la reponse
+        """
+        identifiant = None
+        try:
+            try:
+                demande = json.loads(ligne)
+            except ValueError as erreur:
+                raise ErreurRequete(400, f"JSON invalide : {erreur}") from None
+            if isinstance(demande, dict):
+                identifiant = demande.get("id")
+            if isinstance(demande, dict) and "commande" in demande:
+                reponse = await self.executer_commande(demande["commande"])
+            else:
+                faits, k = verifier_demande(demande)
+                estimations = await self.service.estimer(faits, k)
+                reponse = {"estimations": convertir_estimations(estimations)}
+        except ErreurRequete as erreur:
+            cle = "erreurs" if isinstance(erreur.message, list) else "erreur"
+            reponse = {cle: erreur.message, "statut": erreur.statut}
+        except Exception as erreur:  # le demon survit a une erreur du moteur
+            reponse = {"erreur": f"Erreur interne : {erreur}", "statut": 500}
+        if identifiant is not None:
+            reponse = {"id": identifiant, **reponse}
+        return reponse
+
+    async def executer_commande(self, commande: Any) -> Dict[str, Any]:
+        """
+        Execute une commande d'administration.
+
+        Args:
+            commande: "sante", "statistiques" ou "recharger"
+
+        Returns:
+            Objet JSON de la reponse
+
+        Raises:
+            ErreurRequete: Commande inconnue (404) ou rechargement impossible (409)
+        """
+        base_regles = self.service.moteur.base_regles
+        if commande == "sante":
+            return {"etat": "ok", "version_regles": base_regles.version, "pid": os.getpid()}
+        if commande == "statistiques":
+            return self.service.statistiques()
+        if commande == "recharger":
+            if self.surveillant is None:
+                raise ErreurRequete(409, "Aucun fichier de regles a recharger (option --regles)")
+            # Lecture et compilation dans un thread : les estimations continuent
+            recharge = await asyncio.get_running_loop().run_in_executor(None, self.surveillant.recharger)
+            if not recharge:
+                raise ErreurRequete(409, "Fichier de regles invalide, ancienne base conservee")
+            return {"etat": "recharge", "version_regles": base_regles.version}
+        raise ErreurRequete(404, f"Commande inconnue : {commande!r}")
+
+    async def _lire_demandes(self, lecteur: asyncio.StreamReader, en_cours: asyncio.Queue) -> None:
+        """Lit les demandes d'une connexion et lance leur traitement, jusqu'a la fin du flux."""
+        while True:
+            try:
+                ligne = await lecteur.readline()
+            except (ValueError, ConnectionError):  # ligne trop longue ou client deconnecte
+                ligne = b""
+            if not ligne:
+                break
+            if ligne.strip():
+                await en_cours.put(asyncio.ensure_future(self.traiter_ligne(ligne)))
+
+    async def _servir_connexion(self, lecteur: asyncio.StreamReader,
+                                ecrivain: asyncio.StreamWriter) -> None:
+        """
+        Sert une connexion : les demandes sont traitees en parallele (elles
+        rejoignent les memes micro-lots) et les reponses ecrites dans l'ordre.
+        A l'arret du demon, la lecture s'interrompt mais les demandes deja
+        lues recoivent leur reponse.
+        """
+        en_cours: asyncio.Queue = asyncio.Queue(DEMANDES_EN_COURS_MAX)
+        lecture = asyncio.ensure_future(self._lire_demandes(lecteur, en_cours))
+        self._lectures.add(lecture)
+        self._connexions.add(asyncio.current_task())
+        try:
+            while True:
+                if en_cours.empty() and not lecture.done():
+                    attente = asyncio.ensure_future(en_cours.get())
+                    await asyncio.wait([attente, lecture], return_when=asyncio.FIRST_COMPLETED)
+                    if not attente.done():
+                        attente.cancel()
+                        continue
+                    tache = attente.result()
+                elif en_cours.empty():  # plus rien a lire ni a repondre
+                    break
+                else:
+                    tache = en_cours.get_nowait()
+                reponse = await tache
+                ecrivain.write(json.dumps(reponse, ensure_ascii=False).encode("utf-8") + b"\n")
+                if en_cours.empty():
+                    await ecrivain.drain()
+        except ConnectionError:
+            pass
+        finally:
+            lecture.cancel()
+            self._lectures.discard(lecture)
+            self._connexions.discard(asyncio.current_task())
+            ecrivain.close()
+
+    # ------------------------------------------------------------
+    # Cycle de vie
+    # ------------------------------------------------------------
+
+    def _liberer_socket(self) -> None:
+        """
+        Supprime un fichier de socket laisse par un demon arrete brutalement.
+
+        Raises:
+            OSError: Un demon repond deja sur cette socket
+        """
+        if not os.path.exists(self.chemin_socket):
+            return
+        essai = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            essai.connect(self.chemin_socket)
+        except OSError:
+            os.unlink(self.chemin_socket)
+        else:
+            raise OSError(f"Un demon ecoute deja sur {self.chemin_socket}")
+        finally:
+            essai.close()
+
+    def arreter(self) -> None:
+        """Demande l'arret du demon (a appeler depuis la boucle asyncio)."""
+        if self._arret is not None:
+            self._arret.set()
+
+    def _sur_sighup(self) -> None:
+        """SIGHUP : relit les fichiers de regles sans interrompre les estimations."""
+        if self.surveillant is not None:
+            asyncio.get_running_loop().run_in_executor(None, self.surveillant.recharger)
+
+    async def servir(self) -> None:
+        """
+        Ouvre la socket Unix et sert les demandes jusqu'a SIGTERM, SIGINT ou arreter().
+
+        Raises:
+            OSError: Socket deja utilisee par un autre demon
+        """
+        self._liberer_socket()
+        self._arret = asyncio.Event()
+        boucle = asyncio.get_running_loop()
+        boucle.add_signal_handler(signal.SIGTERM, self.arreter)
+        boucle.add_signal_handler(signal.SIGINT, self.arreter)
+        boucle.add_signal_handler(signal.SIGHUP, self._sur_sighup)
+
+        self.service.demarrer()
+        serveur = await asyncio.start_unix_server(self._servir_connexion, self.chemin_socket,
+                                                  limit=TAILLE_LIGNE_MAX)
+        os.chmod(self.chemin_socket, 0o600)  # socket reservee a l'utilisateur
+        print(f"[OK] Demon d'estimation sur {self.chemin_socket} (pid {os.getpid()})", flush=True)
+        try:
+            await self._arret.wait()
+        finally:
+            # Plus de nouvelles connexions ni demandes ; les reponses en cours partent
+            serveur.close()
+            for lecture in list(self._lectures):
+                lecture.cancel()
+            await asyncio.gather(*self._connexions, return_exceptions=True)
+            await serveur.wait_closed()
+            await self.service.arreter()
+            for signal_arret in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+                boucle.remove_signal_handler(signal_arret)
+            if os.path.exists(self.chemin_socket):
+                os.unlink(self.chemin_socket)
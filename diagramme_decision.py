@@ -0,0 +1,917 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Diagramme de Decision - Systeme Expert Prix PC Portable
+========================================================
+
+Ce module compile la base de regles et la semantique de score du moteur
+d'inference en diagrammes de decision multi-values, reduits et partages,
+un par gamme de prix :
+- chaque noeud teste une caracteristique citee par les regles de la gamme
+- ses branches correspondent aux classes de valeurs qui ont le meme effet
+  sur ces regles (les valeurs jamais citees vont dans la branche par defaut)
+- chaque feuille contient l'estimation finale de la gamme (ou aucune) et le
+  rang de sa premiere regle retenue, qui departage les ex aequo
+
+Une estimation se fait alors par un parcours racine -> feuille par gamme,
+d'au plus une etape par caracteristique, suivi du tri des gammes retenues.
+
+La construction explore les etats partiels des regles d'une gamme
+(compteurs de conditions requises et optionnelles satisfaites) avec
+memoisation. Une regle dont toutes les conditions ont ete parcourues est
+cumulee dans le resultat de la gamme (premiere regle retenue, meilleure
+confiance), et une regle qui ne peut plus ni depasser cette confiance ni
+preceder cette premiere regle est oubliee : les etats equivalents sont
+fusionnes. Les noeuds identiques sont partages et un noeud dont toutes les
+branches menent au meme fils est supprime.
+
+EXPERIMENTAL : le nombre d'etats croit exponentiellement avec le nombre de
+regles d'une gamme. Seules les petites gammes (regles ecrites a la main)
+sont compilees ainsi, dans une limite d'etats. Les regles des autres
+gammes sont triees par un arbre commun (ArbreConditions), borne en
+profondeur, en feuilles et en temps (1 s par defaut) : ses feuilles
+gardent les regles encore possibles, les faits restants les filtrent par
+masques de bits et les survivantes sont evaluees directement.
+
+MoteurDiagramme ne construit jamais le diagramme pendant une estimation :
+tant qu'il est absent ou perime (ajouter_regle, rechargement, changement
+de seuil), les estimations passent par le moteur normal et le diagramme
+est reconstruit dans un thread d'arriere-plan, puis publie d'un bloc.
+"""
+
+import heapq
+import threading
+import time
+from itertools import compress
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from moteur_inference import MoteurInference
+
+# Marque d'un etat absent du cache de construction (None est une feuille)
+_ABSENT = object()
+
+
+class DiagrammeTropGrand(Exception):
+    """Levee quand la construction d'une gamme depasse l'echeance."""
+
+
+# Nombre d'etats explores entre deux lectures de l'horloge
+_PERIODE_HORLOGE = 256
+
+# int.bit_count n'existe qu'a partir de Python 3.10
+_popcount = getattr(int, "bit_count", None) or (lambda x: bin(x).count("1"))
+
+# Chiffres binaires '0'/'1' -> octets 0/1 (voir ArbreConditions.survivantes)
+_OCTETS_BITS = bytes.maketrans(b"01", b"\x00\x01")
+
+
+class Noeud:
+    """
+    Noeud interne du diagramme.
+
+    Attributes:
+        cle (str): Caracteristique testee
+        enfants (Dict[Any, Any]): Valeur -> noeud fils (ou feuille)
+        defaut: Fils suivi pour toute autre valeur (ou fait absent)
+    """
+
+    __slots__ = ("cle", "enfants", "defaut")
+
+    def __init__(self, cle: str, enfants: Dict[Any, Any], defaut):
+        self.cle = cle
+        self.enfants = enfants
+        self.defaut = defaut
+
+
+def cumuler(resultat: Optional[Tuple[int, int, float]], rang: int,
+            confiance: float) -> Tuple[int, int, float]:
+    """
+    Ajoute une regle retenue au resultat d'une gamme.
+
+    Reproduit MoteurInference._construire_estimations quel que soit l'ordre
+    des ajouts : la gamme prend la place de sa premiere regle retenue et
+    garde la meilleure confiance (la premiere regle en cas d'egalite).
+
+    Args:
+        resultat: (rang de la premiere regle, rang de la meilleure regle,
+                  meilleure confiance), ou None si aucune regle retenue
+        rang: Rang de la regle dans la base
+        confiance: Confiance de la regle (au-dessus du seuil)
+
+    Returns:
+        Le nouveau resultat
+    """
+    if resultat is None:
+        return (rang, rang, confiance)
+    premier, meilleur, meilleure = resultat
+    if confiance > meilleure or (confiance == meilleure and rang < meilleur):
+        meilleur, meilleure = rang, confiance
+    return (min(premier, rang), meilleur, meilleure)
+
+
+class DiagrammeGamme:
+    """
+    Diagramme de decision des regles d'une gamme.
+
+    Attributes:
+        nom (str): Nom de la gamme
+        racine: Noeud racine, ou feuille si le resultat ne depend d'aucun fait
+        attributs (List[str]): Ordre des caracteristiques testees
+        nb_noeuds (int): Nombre de noeuds internes
+        nb_feuilles (int): Nombre de feuilles distinctes
+        nb_etats (int): Nombre d'etats explores
+    """
+
+    def __init__(self, regles_compilees, rangs: List[int], seuil_confiance: float,
+                 echeance: float, max_etats: Optional[int] = None):
+        """
+        Construit le diagramme de la gamme.
+
+        Args:
+            regles_compilees: RegleCompilee de la gamme, dans l'ordre de la base
+            rangs: Rang de chaque regle dans la base
+            seuil_confiance: Seuil minimum de confiance des estimations
+            echeance: Date limite de construction (time.perf_counter)
+            max_etats: Nombre maximal d'etats explores (defaut: illimite)
+
+        Raises:
+            DiagrammeTropGrand: Si l'echeance ou le nombre d'etats est depasse
+        """
+        self.nom = regles_compilees[0].nom
+        self._regles = regles_compilees
+        self._rangs = rangs
+        self._seuil = seuil_confiance
+        self._echeance = echeance
+        self._max_etats = max_etats
+
+        self._preparer()
+
+        self._memo: Dict[Tuple, Any] = {}
+        self._noeuds: Dict[Tuple, Noeud] = {}
+        self._feuilles: Dict[Tuple, Tuple] = {}
+        try:
+            etat_initial = self._canoniser(0, None, tuple((0, 0) for _ in self._regles))
+            self.racine = self._construire(0, etat_initial)
+        finally:
+            self.nb_etats = len(self._memo)
+            self.nb_noeuds = len(self._noeuds)
+            self.nb_feuilles = len(self._feuilles)
+            # Les tables de construction ne servent plus au parcours
+            del self._memo, self._noeuds, self._feuilles
+
+    # ------------------------------------------------------------
+    # Preparation : ordre des caracteristiques et classes de valeurs
+    # ------------------------------------------------------------
+
+    def _preparer(self) -> None:
+        """Calcule l'ordre des caracteristiques, leurs classes de valeurs et les restes."""
+        conditions: Dict[str, List[Tuple[int, str, frozenset]]] = {}
+        for r, regle in enumerate(self._regles):
+            for type_condition, liste in (("excluantes", regle.excluantes),
+                                          ("requises", regle.requises),
+                                          ("optionnelles", regle.optionnelles)):
+                for cle, valeurs in liste:
+                    conditions.setdefault(cle, []).append((r, type_condition, valeurs))
+
+        # Les caracteristiques les plus citees par des conditions requises en
+        # premier : les regles sont ainsi rejetees ou terminees plus tot
+        def priorite(cle):
+            nb_requises = sum(1 for _, type_condition, _ in conditions[cle]
+                              if type_condition == "requises")
+            return (-nb_requises, -len(conditions[cle]), cle)
+        self.attributs = sorted(conditions, key=priorite)
+
+        # Pour chaque caracteristique : classes de valeurs de meme effet.
+        # Une classe = (valeurs, effets) avec effets = ((r, exclue, requise, optionnelle), ...)
+        self._classes: List[List[Tuple[List[Any], Tuple]]] = []
+        self._regles_attribut: List[Tuple[int, ...]] = []
+        for cle in self.attributs:
+            liste = conditions[cle]
+            valeurs = set()
+            for _, _, acceptees in liste:
+                valeurs |= acceptees
+
+            par_signature: Dict[Tuple, List[Any]] = {}
+            for valeur in valeurs:
+                effets = {}
+                for r, type_condition, acceptees in liste:
+                    if valeur in acceptees:
+                        effet = effets.setdefault(r, [False, False, False])
+                        effet[("excluantes", "requises", "optionnelles").index(type_condition)] = True
+                signature = tuple(sorted((r, *effet) for r, effet in effets.items()))
+                par_signature.setdefault(signature, []).append(valeur)
+
+            # La classe sans effet est la branche par defaut, toujours en dernier
+            classes = [(vals, sig) for sig, vals in par_signature.items() if sig]
+            classes.append(([], ()))
+            self._classes.append(classes)
+            self._regles_attribut.append(tuple(sorted({r for r, _, _ in liste})))
+
+        # Conditions restantes de chaque regle a partir de la profondeur i
+        nb_attributs = len(self.attributs)
+        position = {cle: i for i, cle in enumerate(self.attributs)}
+        self._restes: List[List[Tuple[int, int, int]]] = []
+        for regle in self._regles:
+            restes = [[0, 0, 0] for _ in range(nb_attributs + 1)]
+            for j, liste in enumerate((regle.excluantes, regle.requises, regle.optionnelles)):
+                for cle, _ in liste:
+                    for i in range(position[cle] + 1):
+                        restes[i][j] += 1
+            self._restes.append([tuple(reste) for reste in restes])
+
+    # ------------------------------------------------------------
+    # Etats partiels
+    # ------------------------------------------------------------
+
+    def _canoniser(self, i: int, resultat: Optional[Tuple[int, int, float]], elements: Tuple,
+                   regles=None) -> Tuple:
+        """
+        Simplifie un etat a la profondeur i.
+
+        Un etat est (resultat de la gamme, elements) ; chaque element vaut
+        None (regle rejetee, cumulee ou sans effet possible) ou (requises,
+        optionnelles) satisfaites (regle en cours). Seules les regles
+        indiquees (toutes par defaut) peuvent etre terminees.
+        """
+        elements = list(elements)
+        for r in range(len(elements)) if regles is None else regles:
+            element = elements[r]
+            if element is not None:
+                regle = self._regles[r]
+                nb_requises, nb_optionnelles = element
+                excluantes_restantes, requises_restantes, optionnelles_restantes = self._restes[r][i]
+                if 2 * (nb_requises + requises_restantes) < regle.nb_requises:
+                    elements[r] = None  # Ratio de 50% devenu inatteignable
+                elif not (excluantes_restantes or requises_restantes or optionnelles_restantes):
+                    elements[r] = None
+                    confiance = regle.calculer_confiance(nb_requises, nb_optionnelles)
+                    if confiance is not None and confiance > self._seuil:
+                        resultat = cumuler(resultat, self._rangs[r], confiance)
+
+        # Une regle en cours sans effet possible sur le resultat est oubliee
+        for r, element in enumerate(elements):
+            if element is not None:
+                _, requises_restantes, optionnelles_restantes = self._restes[r][i]
+                confiance_max = self._regles[r].calculer_confiance(element[0] + requises_restantes,
+                                                                   element[1] + optionnelles_restantes)
+                if confiance_max is None or confiance_max <= self._seuil:
+                    elements[r] = None
+                elif resultat is not None and self._rangs[r] > resultat[0]:
+                    rang = self._rangs[r]
+                    if confiance_max < resultat[2] or (confiance_max == resultat[2] and rang > resultat[1]):
+                        elements[r] = None
+        return (resultat, tuple(elements))
+
+    def _transition(self, i: int, etat: Tuple, effets: Tuple) -> Tuple:
+        """Applique les effets d'une classe de valeurs de la caracteristique i."""
+        resultat, elements = etat
+        if effets:
+            elements = list(elements)
+            for r, exclue, requise, optionnelle in effets:
+                element = elements[r]
+                if element is not None:
+                    if exclue:
+                        elements[r] = None
+                    else:
+                        elements[r] = (element[0] + requise, element[1] + optionnelle)
+        # Les restes ne changent que pour les regles qui citent cette caracteristique
+        return self._canoniser(i + 1, resultat, elements, self._regles_attribut[i])
+
+    # ------------------------------------------------------------
+    # Construction recursive avec partage
+    # ------------------------------------------------------------
+
+    def _feuille(self, resultat: Optional[Tuple[int, int, float]]):
+        """Retourne la feuille (partagee) : None ou (rang de la premiere regle, estimation)."""
+        if resultat is None:
+            return None
+        premier, meilleur, confiance = resultat
+        regle = self._regles[self._rangs.index(meilleur)].regle
+        feuille = (premier, (regle["nom"], confiance, regle["description"],
+                             regle["prix_min"], regle["prix_max"]))
+        return self._feuilles.setdefault(feuille, feuille)
+
+    def _construire(self, i: int, etat: Tuple):
+        """Construit (ou retrouve) le sous-diagramme d'un etat a la profondeur i."""
+        resultat, elements = etat
+        if i == len(self.attributs) or not any(elements):
+            # Plus aucune regle en cours : le resultat de la gamme est connu
+            return self._feuille(resultat)
+
+        cle_memo = (i, etat)
+        noeud = self._memo.get(cle_memo, _ABSENT)
+        if noeud is not _ABSENT:
+            return noeud
+        if len(self._memo) % _PERIODE_HORLOGE == 0:
+            if time.perf_counter() > self._echeance:
+                raise DiagrammeTropGrand(f"{self.nom} : echeance depassee apres {len(self._memo)} etats")
+            if self._max_etats is not None and len(self._memo) >= self._max_etats:
+                raise DiagrammeTropGrand(f"{self.nom} : plus de {self._max_etats} etats")
+
+        if not any(elements[r] is not None for r in self._regles_attribut[i]):
+            # Aucune regle en cours ne depend de cette caracteristique
+            noeud = self._construire(i + 1, self._transition(i, etat, ()))
+        else:
+            classes = self._classes[i]
+            enfants = [self._construire(i + 1, self._transition(i, etat, effets))
+                       for _, effets in classes]
+            defaut = enfants[-1]
+            if all(enfant is defaut for enfant in enfants):
+                noeud = defaut
+            else:
+                cle_noeud = (i, tuple(id(enfant) for enfant in enfants))
+                noeud = self._noeuds.get(cle_noeud)
+                if noeud is None:
+                    branches = {}
+                    for (valeurs, _), enfant in zip(classes, enfants):
+                        if enfant is not defaut:
+                            for valeur in valeurs:
+                                branches[valeur] = enfant
+                    noeud = Noeud(self.attributs[i], branches, defaut)
+                    self._noeuds[cle_noeud] = noeud
+
+        self._memo[cle_memo] = noeud
+        return noeud
+
+
+class _Feuille:
+    """Feuille en cours de construction de ArbreConditions."""
+
+    __slots__ = ("vivantes", "echecs", "testees", "probabilite", "parent", "valeurs")
+
+    def __init__(self, vivantes: int, echecs: Tuple[int, ...], testees: frozenset,
+                 probabilite: float, parent: Optional[Noeud], valeurs: Optional[List[Any]]):
+        self.vivantes = vivantes
+        # echecs[k] : masque des regles dont au moins k + 1 conditions requises ont echoue
+        self.echecs = echecs
+        self.testees = testees
+        self.probabilite = probabilite
+        # Place dans le parent : valeurs de la branche (None = branche par defaut)
+        self.parent = parent
+        self.valeurs = valeurs
+
+
+class ArbreConditions:
+    """
+    Arbre de tri des regles sur des caracteristiques communes a toutes les gammes.
+
+    Les ensembles de regles sont des masques d'entiers (bit i = i-ieme regle
+    triee), comme dans moteur_bitmask.py, et les conditions requises
+    echouees sont comptees par tranches de bits. Une regle est ecartee
+    quand une valeur l'exclut, ou quand trop de ses conditions requises ont
+    echoue pour qu'elle atteigne 50% ou depasse le seuil (meme avec toutes
+    ses conditions optionnelles).
+
+    Chaque noeud interne teste une caracteristique (voir Noeud). Chaque
+    feuille garde l'etat atteint par son chemin : regles encore possibles,
+    tranches d'echecs et tables des caracteristiques non testees. Une
+    estimation parcourt l'arbre, applique a la feuille les faits restants
+    (quelques operations sur des masques par caracteristique) et rend les
+    regles survivantes, qui sont ensuite evaluees entierement : l'arbre ne
+    fait que les trier, comme IndexRegles.candidats.
+
+    La construction developpe d'abord la feuille de plus grand cout attendu
+    (regles encore possibles x probabilite d'y arriver, valeurs
+    equiprobables), sur la caracteristique qui y laisse le moins de regles
+    en moyenne. Elle s'arrete a l'echeance, a max_feuilles feuilles ou a
+    max_octets de masques dans les feuilles, et teste au plus
+    PROFONDEUR_MAX caracteristiques par chemin : l'arbre est valide a chaque
+    etape, et sans aucun noeud il trie deja les regles.
+
+    Attributes:
+        racine: Noeud racine, ou feuille si aucune caracteristique n'est testee
+        nb_regles (int): Nombre de regles triees
+        nb_noeuds (int): Nombre de noeuds internes
+        nb_feuilles (int): Nombre de feuilles
+        profondeur (int): Nombre maximal de caracteristiques testees sur un chemin
+    """
+
+    PROFONDEUR_MAX = 17
+
+    def __init__(self, regles_compilees, rangs: List[int], seuil_confiance: float,
+                 echeance: float, nb_valeurs: Optional[Mapping[str, int]] = None,
+                 max_feuilles: int = 4096, max_octets: int = 1 << 24):
+        """
+        Construit l'arbre des regles indiquees.
+
+        Args:
+            regles_compilees: Liste de RegleCompilee, dans l'ordre de la base
+            rangs: Rangs des regles a trier, dans l'ordre de la base
+            seuil_confiance: Seuil minimum de confiance des estimations
+            echeance: Date limite de construction (time.perf_counter)
+            nb_valeurs: Nombre d'options de chaque caracteristique (defaut:
+                        nombre de valeurs citees par les regles)
+            max_feuilles: Nombre maximal de feuilles
+            max_octets: Taille maximale des masques des feuilles
+        """
+        self._rangs = rangs
+        self.nb_regles = len(rangs)
+
+        # Pour chaque caracteristique : regles qui y ont une condition requise
+        # et, par valeur citee, regles dont elle satisfait la condition
+        # requise ou qu'elle exclut
+        vivantes = 0
+        tolerances: List[int] = []
+        requises: Dict[str, int] = {}
+        satisfaites: Dict[str, Dict[Any, int]] = {}
+        exclues: Dict[str, Dict[Any, int]] = {}
+        for i, r in enumerate(rangs):
+            regle = regles_compilees[r]
+            bit = 1 << i
+            # Nombre d'echecs requis toleres, toutes les optionnelles satisfaites
+            tolerance = -1
+            for echecs in range(regle.nb_requises + 1):
+                confiance = regle.calculer_confiance(regle.nb_requises - echecs, regle.nb_optionnelles)
+                if confiance is None or confiance <= seuil_confiance:
+                    break
+                tolerance = echecs
+            if tolerance < 0:
+                continue  # Jamais retenue
+            vivantes |= bit
+            while len(tolerances) <= tolerance:
+                tolerances.append(0)
+            tolerances[tolerance] |= bit
+            for cle, valeurs in regle.requises:
+                requises[cle] = requises.get(cle, 0) | bit
+                par_valeur = satisfaites.setdefault(cle, {})
+                for valeur in valeurs:
+                    par_valeur[valeur] = par_valeur.get(valeur, 0) | bit
+            for cle, valeurs in regle.excluantes:
+                par_valeur = exclues.setdefault(cle, {})
+                for valeur in valeurs:
+                    par_valeur[valeur] = par_valeur.get(valeur, 0) | bit
+        # tolerances[k] : regles ecartees des k + 1 echecs
+        self._tolerances = tuple(tolerances)
+        self._tables = {cle: (cle, requises.get(cle, 0), satisfaites.get(cle, {}), exclues.get(cle, {}))
+                        for cle in sorted(set(requises) | set(exclues))}
+
+        # Valeurs possibles de chaque caracteristique, fait absent compris
+        nb_valeurs = nb_valeurs or {}
+        self._valeurs: Dict[str, List[Any]] = {}
+        self._nb_valeurs: Dict[str, int] = {}
+        for cle, (_, _, par_valeur, exclues_cle) in self._tables.items():
+            citees = set(par_valeur) | set(exclues_cle)
+            self._valeurs[cle] = list(citees)
+            self._nb_valeurs[cle] = max(nb_valeurs.get(cle, 0), len(citees)) + 1
+
+        racine = _Feuille(vivantes, (0,) * len(tolerances), frozenset(), 1.0, None, None)
+        self.racine = racine
+        self.nb_noeuds = 0
+        self.profondeur = 0
+        nb_feuilles = 1
+        octets_feuille = (len(tolerances) + 1) * (len(rangs) // 8 + 32)
+
+        # File des feuilles a developper, par cout attendu decroissant
+        file = [(-_popcount(vivantes), 0, racine)]
+        compteur = 1
+        while file and time.perf_counter() < echeance:
+            feuille = heapq.heappop(file)[2]
+            separation = self._meilleure_separation(feuille)
+            if separation is None:
+                continue
+            noeud, enfants = separation
+            nb_feuilles += len(enfants) - 1
+            if nb_feuilles > max_feuilles or nb_feuilles * octets_feuille > max_octets:
+                nb_feuilles -= len(enfants) - 1
+                break
+            self.nb_noeuds += 1
+            self.profondeur = max(self.profondeur, len(feuille.testees) + 1)
+            self._remplacer(feuille, noeud)
+            for enfant in enfants:
+                nb_regles = _popcount(enfant.vivantes)
+                if nb_regles > 1 and len(enfant.testees) < self.PROFONDEUR_MAX:
+                    heapq.heappush(file, (-nb_regles * enfant.probabilite, compteur, enfant))
+                    compteur += 1
+
+        self.nb_feuilles = nb_feuilles
+        self.racine = self._figer(self.racine, {}, {})
+        # Les tables de construction ne servent plus au parcours
+        del self._tables, self._valeurs, self._nb_valeurs
+
+    def _feuille(self, faits: Mapping[str, Any]) -> Tuple[int, Tuple[int, ...], Tuple]:
+        """Parcourt l'arbre jusqu'a la feuille des faits."""
+        get = faits.get
+        noeud = self.racine
+        while type(noeud) is Noeud:
+            noeud = noeud.enfants.get(get(noeud.cle), noeud.defaut)
+        return noeud
+
+    def nb_possibles(self, faits: Mapping[str, Any]) -> int:
+        """
+        Compte les regles encore possibles a la feuille des faits.
+
+        Args:
+            faits: Dictionnaire des faits
+
+        Returns:
+            Nombre de regles que l'arbre n'a pas ecartees
+        """
+        return _popcount(self._feuille(faits)[0])
+
+    def survivantes(self, faits: Mapping[str, Any]) -> List[int]:
+        """
+        Retourne les regles qui peuvent etre retenues pour des faits.
+
+        Args:
+            faits: Dictionnaire des faits
+
+        Returns:
+            Rangs des regles a evaluer, dans l'ordre de la base
+        """
+        get = faits.get
+        vivantes, echecs, restantes = self._feuille(faits)
+        echecs = list(echecs)
+        for cle, requises, satisfaites, exclues in restantes:
+            valeur = get(cle)
+            exclues_valeur = exclues.get(valeur)
+            if exclues_valeur:
+                vivantes &= ~exclues_valeur
+            echouees = requises & ~satisfaites.get(valeur, 0) & vivantes
+            if echouees:
+                for k in range(len(echecs) - 1, 0, -1):
+                    echecs[k] |= echecs[k - 1] & echouees
+                echecs[0] |= echouees
+        for tranche, tolerance in zip(echecs, self._tolerances):
+            vivantes &= ~(tranche & tolerance)
+        # Bits du masque en octets 0/1, du bit 0 au bit de poids fort
+        return list(compress(self._rangs, bin(vivantes)[:1:-1].encode().translate(_OCTETS_BITS)))
+
+    # ------------------------------------------------------------
+    # Construction
+    # ------------------------------------------------------------
+
+    def _transition(self, feuille: _Feuille, exclues: int,
+                    echouees: int) -> Tuple[int, Tuple[int, ...]]:
+        """Retire les regles exclues, compte un echec aux regles echouees et retire les regles ecartees."""
+        vivantes = feuille.vivantes & ~exclues
+        echouees &= vivantes
+        echecs = list(feuille.echecs)
+        # Addition par tranches : au moins k + 1 echecs = deja k + 1, ou k et un de plus
+        for k in range(len(echecs) - 1, 0, -1):
+            echecs[k] |= echecs[k - 1] & echouees
+        if echecs:
+            echecs[0] |= echouees
+        for tranche, tolerance in zip(echecs, self._tolerances):
+            vivantes &= ~(tranche & tolerance)
+        return vivantes, tuple(tranche & vivantes for tranche in echecs)
+
+    def _meilleure_separation(self, feuille: _Feuille) -> Optional[Tuple[Noeud, List[_Feuille]]]:
+        """
+        Choisit la caracteristique qui laisse le moins de regles en moyenne.
+
+        Returns:
+            Le noeud et ses fils, ou None si aucune caracteristique ne retire de regle
+        """
+        meilleure = None
+        nb_regles = _popcount(feuille.vivantes)
+        for cle, valeurs in self._valeurs.items():
+            if cle in feuille.testees:
+                continue
+            _, requises, satisfaites, exclues = self._tables[cle]
+            # Branche par defaut : valeur jamais citee ou fait absent
+            defaut = self._transition(feuille, 0, requises)
+            classes: Dict[Tuple, List[Any]] = {}
+            for valeur in valeurs:
+                etat = self._transition(feuille, exclues.get(valeur, 0),
+                                        requises & ~satisfaites.get(valeur, 0))
+                if etat != defaut:
+                    classes.setdefault(etat, []).append(valeur)
+            nb_valeurs = self._nb_valeurs[cle]
+            nb_defaut = nb_valeurs - sum(len(membres) for membres in classes.values())
+            restantes = nb_defaut * _popcount(defaut[0])
+            restantes += sum(len(membres) * _popcount(etat[0]) for etat, membres in classes.items())
+            restantes /= nb_valeurs
+            if restantes < nb_regles and (meilleure is None or restantes < meilleure[0]):
+                meilleure = (restantes, cle, defaut, nb_defaut, classes)
+        if meilleure is None:
+            return None
+
+        _, cle, defaut, nb_defaut, classes = meilleure
+        nb_valeurs = self._nb_valeurs[cle]
+        testees = feuille.testees | {cle}
+        noeud = Noeud(cle, {}, None)
+        enfants = []
+        for (vivantes, echecs), membres in classes.items():
+            enfant = _Feuille(vivantes, echecs, testees,
+                              feuille.probabilite * len(membres) / nb_valeurs, noeud, membres)
+            for valeur in membres:
+                noeud.enfants[valeur] = enfant
+            enfants.append(enfant)
+        noeud.defaut = _Feuille(defaut[0], defaut[1], testees,
+                                feuille.probabilite * nb_defaut / nb_valeurs, noeud, None)
+        enfants.append(noeud.defaut)
+        return noeud, enfants
+
+    def _remplacer(self, feuille: _Feuille, noeud: Noeud) -> None:
+        """Met un noeud a la place d'une feuille."""
+        if feuille.parent is None:
+            self.racine = noeud
+        elif feuille.valeurs is None:
+            feuille.parent.defaut = noeud
+        else:
+            for valeur in feuille.valeurs:
+                feuille.parent.enfants[valeur] = noeud
+        feuille.parent = None
+
+    def _figer(self, noeud, vus: Dict[int, Any], restantes: Dict[frozenset, Tuple]):
+        """Remplace les feuilles en construction par (vivantes, echecs, tables non testees)."""
+        fige = vus.get(id(noeud))
+        if fige is not None:
+            return fige
+        if type(noeud) is _Feuille:
+            tables = restantes.get(noeud.testees)
+            if tables is None:
+                tables = restantes[noeud.testees] = tuple(
+                    table for cle, table in self._tables.items() if cle not in noeud.testees)
+            fige = (noeud.vivantes, noeud.echecs, tables)
+        else:
+            for valeur, enfant in noeud.enfants.items():
+                noeud.enfants[valeur] = self._figer(enfant, vus, restantes)
+            noeud.defaut = self._figer(noeud.defaut, vus, restantes)
+            fige = noeud
+        vus[id(noeud)] = fige
+        return fige
+
+
+class DiagrammeDecision:
+    """
+    Diagrammes de decision des gammes, compiles a partir des regles et du seuil.
+
+    Les gammes d'au plus max_regles_gamme regles sont compilees exactement,
+    de la plus petite a la plus grande, chacune dans la limite de
+    max_etats_gamme etats ; des qu'une gamme depasse cette limite, les
+    suivantes (plus grandes) ne sont pas tentees. Les regles des gammes non
+    compilees sont triees par un ArbreConditions commun, construit avec le
+    reste du budget de temps, et seules les survivantes sont evaluees a
+    chaque estimation.
+
+    Attributes:
+        gammes (List[DiagrammeGamme]): Diagrammes des gammes compilees
+        gammes_directes (List[str]): Gammes non compilees (triees par l'arbre)
+        nb_regles_directes (int): Nombre de regles triees par l'arbre
+        arbre (Optional[ArbreConditions]): Arbre des regles directes (None si aucune)
+        nb_noeuds (int): Nombre de noeuds internes (arbre compris)
+        nb_feuilles (int): Nombre de feuilles distinctes (arbre compris)
+        duree_construction (float): Duree de construction en secondes
+    """
+
+    # Au-dela, une gamme n'est pas compilee exactement (voir DiagrammeGamme)
+    max_regles_gamme = 16
+    max_etats_gamme = 2048
+
+    def __init__(self, regles_compilees, seuil_confiance: float, budget: float = 1.0,
+                 nb_valeurs: Optional[Mapping[str, int]] = None):
+        """
+        Construit les diagrammes des gammes et l'arbre des autres regles.
+
+        Args:
+            regles_compilees: Liste de RegleCompilee, dans l'ordre de la base
+            seuil_confiance: Seuil minimum de confiance des estimations
+            budget: Duree maximale de construction en secondes, toutes
+                    gammes confondues (defaut: 1.0 ; 0 = aucune gamme
+                    compilee, arbre sans noeud)
+            nb_valeurs: Nombre d'options de chaque caracteristique (voir ArbreConditions)
+        """
+        debut = time.perf_counter()
+        echeance = debut + budget
+        self._seuil = seuil_confiance
+        self._regles = regles_compilees
+        rangs_gammes: Dict[str, List[int]] = {}
+        for r, regle in enumerate(regles_compilees):
+            rangs_gammes.setdefault(regle.nom, []).append(r)
+
+        self.gammes: List[DiagrammeGamme] = []
+        self.gammes_directes: List[str] = []
+        directes: List[int] = []
+        self._racines: List[Any] = []
+        self._constantes: List[Tuple[int, Tuple]] = []
+        exacte = True
+        for nom, rangs in sorted(rangs_gammes.items(), key=lambda gamme: len(gamme[1])):
+            regles = [regles_compilees[r] for r in rangs]
+            try:
+                if not exacte or len(rangs) > self.max_regles_gamme or time.perf_counter() >= echeance:
+                    raise DiagrammeTropGrand(f"{nom} : gamme non compilee")
+                gamme = DiagrammeGamme(regles, rangs, seuil_confiance, echeance, self.max_etats_gamme)
+            except DiagrammeTropGrand:
+                # Les gammes suivantes, plus grandes, ne sont pas tentees
+                exacte = False
+                self.gammes_directes.append(nom)
+                directes.extend(rangs)
+                continue
+            self.gammes.append(gamme)
+            if type(gamme.racine) is Noeud:
+                self._racines.append(gamme.racine)
+            elif gamme.racine is not None:
+                self._constantes.append(gamme.racine)
+
+        directes.sort()
+        self.nb_regles_directes = len(directes)
+        self.arbre = (ArbreConditions(regles_compilees, directes, seuil_confiance, echeance, nb_valeurs)
+                      if directes else None)
+        self.nb_noeuds = sum(gamme.nb_noeuds for gamme in self.gammes)
+        self.nb_feuilles = sum(gamme.nb_feuilles for gamme in self.gammes)
+        if self.arbre is not None:
+            self.nb_noeuds += self.arbre.nb_noeuds
+            self.nb_feuilles += self.arbre.nb_feuilles
+        self.duree_construction = time.perf_counter() - debut
+
+    def part_compilee(self, faits: Mapping[str, Any]) -> float:
+        """
+        Calcule la part des regles traitees sans test a l'estimation.
+
+        Ce sont les regles des gammes compilees et celles que le chemin de
+        l'arbre a deja ecartees ; les autres passent par les caracteristiques
+        non testees de la feuille.
+
+        Args:
+            faits: Dictionnaire des faits
+
+        Returns:
+            Part des regles de la base (entre 0 et 1)
+        """
+        nb_regles = len(self._regles)
+        if not nb_regles:
+            return 1.0
+        testees = nb_regles - self.nb_regles_directes
+        if self.arbre is not None:
+            testees += self.arbre.nb_regles - self.arbre.nb_possibles(faits)
+        return testees / nb_regles
+
+    def estimer(self, faits: Mapping[str, Any]) -> List[Tuple[str, float, str, int, int]]:
+        """
+        Parcourt le diagramme de chaque gamme et l'arbre des autres regles.
+
+        Args:
+            faits: Dictionnaire des faits
+
+        Returns:
+            Liste de tuples (nom_gamme, score_confiance, description, prix_min, prix_max)
+        """
+        get = faits.get
+        retenues = list(self._constantes)
+        for noeud in self._racines:
+            while type(noeud) is Noeud:
+                noeud = noeud.enfants.get(get(noeud.cle), noeud.defaut)
+            if noeud is not None:
+                retenues.append(noeud)
+
+        if self.arbre is not None:
+            regles = self._regles
+            resultats: Dict[str, Tuple[int, int, float]] = {}
+            for rang in self.arbre.survivantes(faits):
+                regle = regles[rang]
+                correspond, confiance = regle.evaluer(faits)
+                if correspond and confiance > self._seuil:
+                    resultats[regle.nom] = cumuler(resultats.get(regle.nom), rang, confiance)
+            for premier, meilleur, confiance in resultats.values():
+                regle = regles[meilleur].regle
+                retenues.append((premier, (regle["nom"], confiance, regle["description"],
+                                           regle["prix_min"], regle["prix_max"])))
+
+        # Ordre d'apparition des gammes, puis confiance decroissante (tri stable)
+        retenues.sort(key=lambda feuille: feuille[0])
+        estimations = [estimation for _, estimation in retenues]
+        estimations.sort(key=lambda x: x[1], reverse=True)
+        return estimations
+
+
+class MoteurDiagramme(MoteurInference):
+    """
+    Moteur d'inference utilisant des diagrammes de decision compiles (experimental).
+
+    Tant que le diagramme est absent ou perime (modification de la base
+    de regles ou du seuil), les estimations passent par le moteur normal
+    et la premiere d'entre elles lance la construction dans un thread
+    d'arriere-plan ; construire_diagramme() construit sans attendre une
+    estimation. Quand aucune gamme n'est compilee, inferer(k) applique la
+    separation et evaluation du moteur normal aux seules regles survivantes
+    de l'arbre, a la place des regles candidates de l'index.
+
+    Attributes:
+        budget (float): Duree maximale de construction en secondes (voir DiagrammeDecision)
+    """
+
+    budget = 1.0
+
+    def __init__(self, base_faits, base_regles, seuil_confiance: float = 0.4,
+                 taille_cache: int = 0):
+        """
+        Initialise le moteur a diagramme (sans construire le diagramme).
+
+        Args:
+            base_faits: Instance de BaseFaits contenant les specifications
+            base_regles: Instance de BaseRegles contenant les regles
+            seuil_confiance: Seuil minimum de confiance (defaut: 0.4)
+            taille_cache: Nombre maximal de resultats en cache LRU (defaut: 0)
+        """
+        super().__init__(base_faits, base_regles, seuil_confiance, taille_cache)
+        # Couple (version de la base et du seuil, diagramme), remplace d'un seul bloc
+        self._diagramme: Optional[Tuple[Tuple[int, int], DiagrammeDecision]] = None
+        # Serialise les constructions (pris sans attente par _lancer_reconstruction)
+        self._verrou_diagramme = threading.Lock()
+        self._thread_reconstruction: Optional[threading.Thread] = None
+
+    @property
+    def diagramme(self) -> Optional[DiagrammeDecision]:
+        """Dernier diagramme construit (eventuellement perime), ou None."""
+        diagramme = self._diagramme
+        return diagramme[1] if diagramme is not None else None
+
+    def construire_diagramme(self, budget: Optional[float] = None) -> DiagrammeDecision:
+        """
+        Construit le diagramme pour la base de regles et le seuil courants.
+
+        Args:
+            budget: Duree maximale de construction en secondes (defaut: self.budget)
+
+        Returns:
+            Le diagramme construit
+        """
+        diagramme = self._reconstruire(self.budget if budget is None else budget, forcer=True)
+        print(f"[OK] Diagramme construit : {diagramme.nb_noeuds} noeuds, "
+              f"{diagramme.nb_feuilles} feuilles en {diagramme.duree_construction * 1000:.1f} ms")
+        if diagramme.arbre is not None:
+            arbre = diagramme.arbre
+            print(f"[OK] {diagramme.nb_regles_directes} regle(s) de {len(diagramme.gammes_directes)} "
+                  f"gamme(s) triee(s) par un arbre de {arbre.nb_noeuds} noeuds "
+                  f"(profondeur {arbre.profondeur}), puis evaluee(s) directement")
+        return diagramme
+
+    def _reconstruire(self, budget: float, forcer: bool = False) -> DiagrammeDecision:
+        """Construit le diagramme de la version courante (s'il est perime) et le publie."""
+        with self._verrou_diagramme:
+            instantane = self.base_regles.obtenir_instantane()
+            version = (instantane.version, self.version_seuil)
+            diagramme = self._diagramme
+            if forcer or diagramme is None or diagramme[0] != version:
+                nb_valeurs = {cle: len(self.base_faits.obtenir_options(cle))
+                              for cle in self.base_faits.obtenir_attributs()}
+                construit = DiagrammeDecision(instantane.regles, self.seuil_confiance,
+                                              budget, nb_valeurs)
+                diagramme = (version, construit)
+                # Echange de reference : les estimations suivantes utilisent le nouveau diagramme
+                self._diagramme = diagramme
+            return diagramme[1]
+
+    def _lancer_reconstruction(self) -> None:
+        """Lance la construction du diagramme en arriere-plan (sauf si elle est en cours)."""
+        if not self._verrou_diagramme.acquire(blocking=False):
+            return  # Construction en cours
+        try:
+            thread = self._thread_reconstruction
+            if thread is not None and thread.is_alive():
+                return
+            self._thread_reconstruction = threading.Thread(
+                target=self._reconstruire, args=(self.budget,), name="diagramme", daemon=True)
+            self._thread_reconstruction.start()
+        finally:
+            self._verrou_diagramme.release()
+
+    def attendre_diagramme(self, delai: Optional[float] = None) -> bool:
+        """
+        Attend la fin de la construction en arriere-plan.
+
+        Args:
+            delai: Attente maximale en secondes (defaut: illimitee)
+
+        Returns:
+            True si le diagramme est a jour
+        """
+        thread = self._thread_reconstruction
+        if thread is not None:
+            thread.join(delai)
+        return self.diagramme_a_jour()
+
+    def diagramme_a_jour(self) -> bool:
+        """
+        Indique si le diagramme correspond a la base de regles et au seuil courants.
+
+        Returns:
+            True si le diagramme peut etre utilise
+        """
+        diagramme = self._diagramme
+        return diagramme is not None and diagramme[0] == (self.base_regles.version, self.version_seuil)
+
+    def _evaluer_regles(self, faits: Mapping[str, Any],
+                        k: Optional[int] = None) -> List[Tuple[str, float, str, int, int]]:
+        """
+        Evalue les faits par le diagramme, ou par le moteur normal s'il est perime.
+
+        Args:
+            faits: Dictionnaire des faits
+            k: Nombre d'estimations voulues (defaut: toutes)
+
+        Returns:
+            Liste de tuples (nom_gamme, score_confiance, description, prix_min, prix_max)
+        """
+        diagramme = self._diagramme
+        if diagramme is None or diagramme[0] != (self.base_regles.version, self.version_seuil):
+            # Pas de construction pendant une estimation : moteur normal en attendant
+            self._lancer_reconstruction()
+            return super()._evaluer_regles(faits, k)
+        diagramme = diagramme[1]
+        if k is not None and not diagramme.gammes and diagramme.arbre is not None:
+            # Toutes les regles dans l'arbre : separation et evaluation sur les survivantes
+            return self._evaluer_meilleures(faits, k, diagramme.arbre.survivantes(faits))
+        estimations = diagramme.estimer(faits)
+        return estimations if k is None else estimations[:max(0, k)]
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Gestion des Sessions - Systeme Expert Prix PC Portable
+=======================================================
+
+Ce module contient le GestionnaireSessions d'une interface multi-utilisateur
+(questionnaire en reseau, discussion web...) :
+- le schema des options (BaseFaits.options_*, tuples immuables) est partage
+  par toutes les sessions ; chaque session ne garde que ses faits, sous
+  forme compacte (FaitsCompacts : un octet par caracteristique, le code de
+  l'option choisie dans le schema)
+- les sessions fermees ou evincees retournent dans une reserve et sont
+  reutilisees par les suivantes, sans nouvelle allocation
+- un budget memoire borne le nombre de sessions vivantes : au-dela, les
+  sessions inactives depuis le plus longtemps sont evincees
+
+Les sessions sont designees par un identifiant entier. Une session
+evincee est recyclee aussitot : son proprietaire doit repasser par
+obtenir() (qui leve KeyError) avant de modifier ses faits, ce que fait
+SourceSuivie (questionnaire.py) avant chaque reponse.
+
+Le gestionnaire s'utilise depuis un seul thread (la boucle asyncio d'un
+serveur, ou l'interface graphique).
+"""
+
+import sys
+import time
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from itertools import count
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from base_faits import BaseFaits
+
+
+# ============================================================
+# SCHEMA PARTAGE
+# ============================================================
+
+_SCHEMA = BaseFaits()
+
+# Caracteristiques, dans l'ordre de BaseFaits.obtenir_attributs()
+ATTRIBUTS = tuple(_SCHEMA.obtenir_attributs())
+
+# Position de chaque caracteristique dans FaitsCompacts
+POSITIONS = {cle: position for position, cle in enumerate(ATTRIBUTS)}
+
+# Options de chaque caracteristique (le code d'une option est son rang)
+OPTIONS = tuple(tuple(_SCHEMA.obtenir_options(cle)) for cle in ATTRIBUTS)
+
+# Code de chaque option, par caracteristique
+CODES = tuple({option: code for code, option in enumerate(options)} for options in OPTIONS)
+
+# Caracteristiques booleennes (valeur True/False exigee, comme BaseFaits.valider)
+BOOLEENNES = frozenset(POSITIONS[cle] for cle in _SCHEMA.options_booleennes)
+
+# Code d'un fait non renseigne
+ABSENT = 255
+
+_VIDE = bytes([ABSENT]) * len(ATTRIBUTS)
+
+
+class FaitsCompacts(MutableMapping):
+    """
+    Faits d'une session, un octet par caracteristique (code de l'option).
+
+    Se lit et s'ecrit comme le dictionnaire BaseFaits.faits ; une valeur
+    hors du schema est refusee a l'ecriture (ValueError), None efface le fait.
+    """
+
+    __slots__ = ("codes",)
+
+    def __init__(self, faits: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            faits: Faits initiaux (defaut: aucun)
+        """
+        self.codes = bytearray(_VIDE)
+        if faits:
+            self.update(faits)
+
+    def __getitem__(self, cle: str) -> Any:
+        position = POSITIONS[cle]
+        code = self.codes[position]
+        if code == ABSENT:
+            raise KeyError(cle)
+        return OPTIONS[position][code]
+
+    def get(self, cle: str, defaut: Any = None) -> Any:
+        position = POSITIONS.get(cle)
+        if position is None:
+            return defaut
+        code = self.codes[position]
+        return defaut if code == ABSENT else OPTIONS[position][code]
+
+    def __setitem__(self, cle: str, valeur: Any) -> None:
+        position = POSITIONS.get(cle)
+        if position is None:
+            raise KeyError(f"Caracteristique inconnue : {cle}")
+        if valeur is None:
+            self.codes[position] = ABSENT
+            return
+        if position in BOOLEENNES and not isinstance(valeur, bool):
+            raise ValueError(f"{cle} : booleen attendu, {valeur!r} recu")
+        try:
+            self.codes[position] = CODES[position][valeur]
+        except (KeyError, TypeError):
+            raise ValueError(f"{cle} : valeur inconnue {valeur!r}") from None
+
+    def __delitem__(self, cle: str) -> None:
+        position = POSITIONS[cle]
+        if self.codes[position] == ABSENT:
+            raise KeyError(cle)
+        self.codes[position] = ABSENT
+
+    def __iter__(self) -> Iterator[str]:
+        return (ATTRIBUTS[position] for position, code in enumerate(self.codes) if code != ABSENT)
+
+    def __len__(self) -> int:
+        return len(self.codes) - self.codes.count(ABSENT)
+
+    def effacer(self) -> None:
+        """Efface tous les faits (sans reallocation)."""
+        self.codes[:] = _VIDE
+
+    def en_dict(self) -> Dict[str, Any]:
+        """Retourne les faits sous forme de dictionnaire (pour le moteur d'inference)."""
+        return {ATTRIBUTS[position]: OPTIONS[position][code]
+                for position, code in enumerate(self.codes) if code != ABSENT}
+
+    def __repr__(self) -> str:
+        return f"FaitsCompacts({self.en_dict()!r})"
+
+
+# ============================================================
+# SESSIONS
+# ============================================================
+
+class Session:
+    """
+    Session d'un utilisateur.
+
+    Attributes:
+        identifiant (int): Identifiant unique (jamais reutilise)
+        faits (FaitsCompacts): Faits collectes
+        derniere_activite (float): Date de la derniere activite (horloge du gestionnaire)
+    """
+
+    __slots__ = ("identifiant", "faits", "derniere_activite")
+
+    def __init__(self):
+        self.identifiant = 0
+        self.faits = FaitsCompacts()
+        self.derniere_activite = 0.0
+
+
+class GestionnaireSessions:
+    """
+    Sessions vivantes, reserve de sessions reutilisables et eviction sous budget memoire.
+
+    Attributes:
+        budget_octets (int): Memoire maximale des sessions vivantes
+        taille_reserve (int): Nombre maximal de sessions gardees pour reutilisation
+        octets_par_session (int): Memoire d'une session vivante (session,
+                                  faits compacts et entree de l'index)
+    """
+
+    def __init__(self, budget_octets: int = 64 * 1024 * 1024, taille_reserve: int = 1024,
+                 horloge: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            budget_octets: Memoire maximale des sessions vivantes (defaut: 64 Mo)
+            taille_reserve: Sessions gardees pour reutilisation (defaut: 1024)
+            horloge: Source de temps des dates d'activite (defaut: time.monotonic)
+        """
+        self.budget_octets = budget_octets
+        self.taille_reserve = taille_reserve
+        self._horloge = horloge
+        self._sessions: "OrderedDict[int, Session]" = OrderedDict()  # de la moins a la plus recente
+        self._reserve: List[Session] = []
+        self._identifiants = count(1)
+        self.octets_par_session = self._mesurer_session()
+
+        self._ouvertes = 0
+        self._fermees = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._recyclees = 0
+
+    @staticmethod
+    def _mesurer_session() -> int:
+        """Estime la memoire d'une session vivante (objets et entree de l'index)."""
+        session = Session()
+        index = OrderedDict((i, None) for i in range(1024))
+        entree = sys.getsizeof(index) // 1024 + sys.getsizeof(2 ** 40)
+        return (sys.getsizeof(session) + sys.getsizeof(session.faits)
+                + sys.getsizeof(session.faits.codes) + sys.getsizeof(0.0) + entree)
+
+    # ------------------------------------------------------------
+    # Cycle de vie
+    # ------------------------------------------------------------
+
+    def ouvrir(self) -> Session:
+        """
+        Ouvre une session (reprise dans la reserve si possible).
+
+        Si le budget memoire est depasse, les sessions inactives depuis le
+        plus longtemps sont evincees.
+
+        Returns:
+            La session, sans faits
+        """
+        if self._reserve:
+            session = self._reserve.pop()
+            self._recyclees += 1
+        else:
+            session = Session()
+        session.identifiant = next(self._identifiants)
+        session.derniere_activite = self._horloge()
+        self._sessions[session.identifiant] = session
+        self._ouvertes += 1
+
+        maximum = max(1, self.budget_octets // self.octets_par_session)
+        while len(self._sessions) > maximum:
+            _, evincee = self._sessions.popitem(last=False)
+            self._evictions += 1
+            self._recycler(evincee)
+        return session
+
+    def obtenir(self, identifiant: int) -> Session:
+        """
+        Retourne une session et la marque active.
+
+        Args:
+            identifiant: Identifiant de la session
+
+        Returns:
+            La session
+
+        Raises:
+            KeyError: Session inconnue, fermee, evincee ou expiree
+        """
+        session = self._sessions[identifiant]
+        session.derniere_activite = self._horloge()
+        self._sessions.move_to_end(identifiant)
+        return session
+
+    def fermer(self, identifiant: int) -> bool:
+        """
+        Ferme une session ; elle retourne dans la reserve.
+
+        Args:
+            identifiant: Identifiant de la session
+
+        Returns:
+            False si la session n'etait plus vivante (deja fermee ou evincee)
+        """
+        session = self._sessions.pop(identifiant, None)
+        if session is None:
+            return False
+        self._fermees += 1
+        self._recycler(session)
+        return True
+
+    def expirer(self, inactivite_max: float) -> int:
+        """
+        Ferme les sessions inactives depuis plus de inactivite_max secondes.
+
+        Args:
+            inactivite_max: Duree d'inactivite maximale (secondes)
+
+        Returns:
+            Le nombre de sessions expirees
+        """
+        limite = self._horloge() - inactivite_max
+        expirees = 0
+        while self._sessions:
+            identifiant, session = next(iter(self._sessions.items()))
+            if session.derniere_activite > limite:
+                break
+            del self._sessions[identifiant]
+            self._recycler(session)
+            expirees += 1
+        self._expirations += expirees
+        return expirees
+
+    def _recycler(self, session: Session) -> None:
+        """Efface une session sortie de l'index et la garde pour reutilisation."""
+        if len(self._reserve) < self.taille_reserve:
+            session.faits.effacer()
+            session.identifiant = 0
+            self._reserve.append(session)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, identifiant: int) -> bool:
+        return identifiant in self._sessions
+
+    def statistiques(self) -> Dict[str, Any]:
+        """
+        Retourne les compteurs du gestionnaire.
+
+        Returns:
+            Dictionnaire {sessions_vivantes, octets_par_session, octets_utilises,
+            budget_octets, ouvertes, fermees, evictions, expirations,
+            reserve, reutilisations}
+        """
+        return {
+            "sessions_vivantes": len(self._sessions),
+            "octets_par_session": self.octets_par_session,
+            "octets_utilises": len(self._sessions) * self.octets_par_session,
+            "budget_octets": self.budget_octets,
+            "ouvertes": self._ouvertes,
+            "fermees": self._fermees,
+            "evictions": self._evictions,
+            "expirations": self._expirations,
+            "reserve": len(self._reserve),
+            "reutilisations": self._recyclees,
+        }
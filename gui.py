@@ -15,12 +15,13 @@ Date: Novembre 2025
 
 import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 
 # Importation des modules du systeme expert
 from base_faits import BaseFaits
 from base_regles import BaseRegles
-from moteur_inference import MoteurInference
+from moteur_incremental import MoteurIncremental
+from questionnaire_adaptatif import QuestionsAdaptatives
 
 
 # ============================================================
@@ -38,6 +39,7 @@ COLORS = {
     "text_yellow": "#ffff00",
     "text_orange": "#ff6600",
     "text_red": "#ff0040",
+    "text_purple": "#bf40ff",
     "text_white": "#e6edf3",
     "text_gray": "#8b949e",
     "border": "#30363d",
@@ -57,7 +59,10 @@ class SystemeExpertGUI:
         # Initialisation des composants du systeme expert
         self.base_faits = BaseFaits()
         self.base_regles = BaseRegles()
-        self.moteur = MoteurInference(self.base_faits, self.base_regles)
+        self.moteur = MoteurIncremental(self.base_faits, self.base_regles)
+        
+        # Re-estimation en direct apres la premiere analyse
+        self.estimation_live = False
         
         # Creation de la fenetre principale
         self.root = tk.Tk()
@@ -357,6 +362,7 @@ class SystemeExpertGUI:
             )
             combo.pack(anchor="w", pady=(3, 0))
             combo.current(0)
+            self._suivre_modifications(var_name, self.variables[var_name])
             
             # Configuration du style de la combobox
             combo.option_add('*TCombobox*Listbox.background', COLORS["bg_input"])
@@ -418,6 +424,7 @@ class SystemeExpertGUI:
                 bd=0
             )
             check.grid(row=row, column=col, sticky="w", padx=15, pady=5)
+            self._suivre_modifications(var_name, self.check_vars[var_name])
     
     def _creer_boutons(self):
         """Cree les boutons d'action."""
@@ -446,6 +453,19 @@ class SystemeExpertGUI:
         )
         btn_estimer.pack(side="left", padx=5)
         
+        # Bouton Mode guide - Vert clair
+        btn_guide = tk.Button(
+            boutons_frame,
+            text="[ GUIDED MODE ]",
+            bg=COLORS["text_secondary"],
+            fg=COLORS["bg_dark"],
+            activebackground=COLORS["accent"],
+            activeforeground=COLORS["bg_dark"],
+            command=self._lancer_mode_guide,
+            **btn_config
+        )
+        btn_guide.pack(side="left", padx=5)
+        
         # Bouton Reinitialiser - Jaune
         btn_reset = tk.Button(
             boutons_frame,
@@ -472,6 +492,19 @@ class SystemeExpertGUI:
         )
         btn_regles.pack(side="left", padx=5)
         
+        # Bouton Expliquer - Violet
+        btn_expliquer = tk.Button(
+            boutons_frame,
+            text="[ EXPLAIN ]",
+            bg=COLORS["text_purple"],
+            fg=COLORS["bg_dark"],
+            activebackground="#9933cc",
+            activeforeground=COLORS["bg_dark"],
+            command=self._afficher_explications,
+            **btn_config
+        )
+        btn_expliquer.pack(side="left", padx=5)
+        
         # Bouton Aide - Orange
         btn_aide = tk.Button(
             boutons_frame,
@@ -655,19 +688,152 @@ class SystemeExpertGUI:
         self.base_faits.reinitialiser()
         
         for var_name, var in self.variables.items():
-            self.base_faits.ajouter_fait(var_name, var.get())
+            # Un champ vide est une question non posee par le mode guide
+            if var.get():
+                self.base_faits.ajouter_fait(var_name, var.get())
         
         for var_name, var in self.check_vars.items():
             self.base_faits.ajouter_fait(var_name, var.get())
     
     def _lancer_estimation(self):
-        """Lance l'estimation de prix."""
+        """Lance l'estimation de prix et active la re-estimation en direct."""
         self._collecter_specifications()
-        estimations = self.moteur.inferer()
+        estimations = self.moteur.inferer(k=3)
         self._afficher_resultats(estimations)
+        self.estimation_live = True
+    
+    def _lancer_mode_guide(self):
+        """Pose seulement les questions utiles, une par une (questionnaire adaptatif)."""
+        # Pas de re-estimation en direct pendant que le formulaire est rempli
+        estimation_live = self.estimation_live
+        self.estimation_live = False
+        faits = {}
+        questions = QuestionsAdaptatives(self.moteur, faits)
+        
+        guide_window = tk.Toplevel(self.root)
+        guide_window.title("[GUIDED MODE]")
+        guide_window.geometry("560x560")
+        guide_window.configure(bg=COLORS["bg_dark"])
+        guide_window.transient(self.root)
+        guide_window.grab_set()
+        
+        def abandonner():
+            # Fermeture par la barre de titre : formulaire inchange, re-estimation retablie
+            self.estimation_live = estimation_live
+            guide_window.destroy()
+        
+        guide_window.protocol("WM_DELETE_WINDOW", abandonner)
+        
+        container = tk.Frame(guide_window, bg=COLORS["text_secondary"], padx=2, pady=2)
+        container.pack(fill="both", expand=True, padx=10, pady=10)
+        
+        inner = tk.Frame(container, bg=COLORS["bg_dark"], padx=15, pady=15)
+        inner.pack(fill="both", expand=True)
+        
+        progression_label = tk.Label(
+            inner,
+            font=("Consolas", 9),
+            fg=COLORS["text_gray"],
+            bg=COLORS["bg_dark"],
+            wraplength=500,
+            justify="left",
+            anchor="w"
+        )
+        progression_label.pack(fill="x")
+        
+        question_label = tk.Label(
+            inner,
+            font=("Consolas", 11, "bold"),
+            fg=COLORS["text_cyan"],
+            bg=COLORS["bg_dark"],
+            wraplength=500,
+            justify="left",
+            anchor="w"
+        )
+        question_label.pack(fill="x", pady=(5, 10))
+        
+        reponses_frame = tk.Frame(inner, bg=COLORS["bg_dark"])
+        reponses_frame.pack(fill="both", expand=True)
+        
+        def question_suivante():
+            for widget in reponses_frame.winfo_children():
+                widget.destroy()
+            
+            question = questions.prochaine()
+            if question is None:
+                guide_window.destroy()
+                self._terminer_mode_guide(faits, questions)
+                return
+            
+            cle, texte = question
+            progression_label.config(
+                text=f"[QUESTION {questions.nb_posees}] En course : {', '.join(questions.en_course)}"
+            )
+            question_label.config(text=f"> {texte}")
+            
+            if cle in self.check_vars:
+                choix = [("OUI", True), ("NON", False)]
+            else:
+                choix = [(option, option) for option in self.base_faits.obtenir_options(cle)]
+            
+            for libelle, valeur in choix:
+                btn_reponse = tk.Button(
+                    reponses_frame,
+                    text=f"[ {libelle} ]",
+                    anchor="w",
+                    font=("Consolas", 10),
+                    bg=COLORS["bg_button"],
+                    fg=COLORS["text_primary"],
+                    activebackground=COLORS["bg_button_hover"],
+                    activeforeground=COLORS["text_cyan"],
+                    bd=0,
+                    padx=10,
+                    pady=4,
+                    cursor="hand2",
+                    command=lambda valeur=valeur: repondre(cle, valeur)
+                )
+                btn_reponse.pack(fill="x", pady=2)
+        
+        def repondre(cle, valeur):
+            faits[cle] = valeur
+            question_suivante()
+        
+        question_suivante()
     
-    def _afficher_resultats(self, estimations: List[Tuple[str, float, str, int, int]]):
-        """Affiche les resultats de l'estimation avec style futuriste."""
+    def _terminer_mode_guide(self, faits, questions):
+        """Reporte les reponses du mode guide dans le formulaire et affiche l'estimation."""
+        # Les questions non posees restent vides (non cochees pour les options)
+        for var_name, var in self.variables.items():
+            var.set(faits.get(var_name, ""))
+        for var_name, var in self.check_vars.items():
+            var.set(faits.get(var_name, False))
+        
+        self.base_faits.reinitialiser()
+        for cle, valeur in faits.items():
+            self.base_faits.ajouter_fait(cle, valeur)
+        
+        estimations = self.moteur.inferer(k=3)
+        self._afficher_resultats(
+            estimations,
+            f"[ADAPTIVE] {questions.nb_posees}/{questions.nb_questions} questions posees : "
+            "les autres reponses ne pouvaient plus changer la gamme en tete.\n"
+        )
+        self.estimation_live = True
+    
+    def _suivre_modifications(self, var_name, var):
+        """Branche la re-estimation en direct sur une variable de l'interface."""
+        var.trace_add("write", lambda *_: self._sur_modification(var_name, var.get()))
+    
+    def _sur_modification(self, var_name, valeur):
+        """Propage un fait modifie au moteur incremental et rafraichit les resultats."""
+        if not self.estimation_live:
+            return
+        estimations = self.moteur.on_fait_modifie(var_name, valeur)
+        self._afficher_resultats(estimations)
+    
+    def _afficher_resultats(self, estimations: List[Tuple[str, float, str, int, int]],
+                            note: Optional[str] = None):
+        """Affiche les resultats de l'estimation avec style futuriste (et une note optionnelle)."""
         self.resultats_text.config(state=tk.NORMAL)
         self.resultats_text.delete(1.0, tk.END)
         
@@ -735,6 +901,9 @@ class SystemeExpertGUI:
                 self.resultats_text.insert(tk.END, f"{description}\n", "white")
                 self.resultats_text.insert(tk.END, f"└──────────────────────────────────────────────────────────────┘\n\n", conf_color)
         
+        if note:
+            self.resultats_text.insert(tk.END, note, "cyan")
+        
         # Footer
         self.resultats_text.insert(tk.END, "═" * 70 + "\n", "gray")
         self.resultats_text.insert(tk.END, "[NOTICE] Cette estimation est INDICATIVE uniquement.\n", "yellow")
@@ -744,6 +913,9 @@ class SystemeExpertGUI:
     
     def _reinitialiser(self):
         """Reinitialise le formulaire."""
+        # Suspendre la re-estimation en direct jusqu'a la prochaine analyse
+        self.estimation_live = False
+        
         # Remettre les ComboBox a la premiere valeur
         for var_name, var in self.variables.items():
             options = getattr(self.base_faits, f"options_{var_name}", None)
@@ -830,6 +1002,60 @@ class SystemeExpertGUI:
         
         text_area.config(state=tk.DISABLED)
     
+    def _afficher_explications(self):
+        """Affiche le detail du calcul de chaque regle dans une nouvelle fenetre."""
+        self._collecter_specifications()
+        explications = self.moteur.expliquer()
+        
+        explications_window = tk.Toplevel(self.root)
+        explications_window.title("[INFERENCE TRACE]")
+        explications_window.geometry("750x550")
+        explications_window.configure(bg=COLORS["bg_dark"])
+        
+        container = tk.Frame(explications_window, bg=COLORS["text_purple"], padx=2, pady=2)
+        container.pack(fill="both", expand=True, padx=10, pady=10)
+        
+        inner = tk.Frame(container, bg=COLORS["bg_dark"])
+        inner.pack(fill="both", expand=True)
+        
+        text_area = tk.Text(
+            inner,
+            font=("Consolas", 10),
+            bg=COLORS["bg_dark"],
+            fg=COLORS["text_primary"],
+            wrap=tk.WORD,
+            padx=10,
+            pady=10
+        )
+        text_area.pack(fill="both", expand=True)
+        text_area.tag_configure("ok", foreground=COLORS["accent"])
+        text_area.tag_configure("ko", foreground=COLORS["text_red"])
+        text_area.tag_configure("gris", foreground=COLORS["text_gray"])
+        
+        scrollbar = tk.Scrollbar(text_area, command=text_area.yview)
+        scrollbar.pack(side="right", fill="y")
+        text_area.config(yscrollcommand=scrollbar.set)
+        
+        header = """
+╔══════════════════════════════════════════════════════════════════════╗
+║                 INFERENCE TRACE :: DETAIL DU CALCUL                  ║
+╚══════════════════════════════════════════════════════════════════════╝
+"""
+        text_area.insert(tk.END, header)
+        text_area.insert(tk.END, "\n[FORMULA] base x (0.7 + 0.3 x requises) + 0.15 x optionnelles\n\n", "gris")
+        
+        # Regles applicables d'abord, par confiance decroissante
+        explications.sort(key=lambda explication: -explication.confiance)
+        for explication in explications:
+            lignes = explication.formater(self.moteur.seuil_confiance)
+            retenue = explication.correspond and explication.confiance > self.moteur.seuil_confiance
+            text_area.insert(tk.END, f"> {lignes[0]}\n", "ok" if retenue else "ko")
+            for ligne in lignes[1:]:
+                text_area.insert(tk.END, f"{ligne}\n", "gris" if "[-]" in ligne else "")
+            text_area.insert(tk.END, "\n")
+        
+        text_area.config(state=tk.DISABLED)
+    
     def _afficher_aide(self):
         """Affiche l'aide."""
         aide_window = tk.Toplevel(self.root)
@@ -855,6 +1081,7 @@ class SystemeExpertGUI:
   2. Cochez les options supplementaires si presentes
   3. Cliquez sur [ EXECUTE ANALYSIS ]
   4. Les resultats s'affichent dans le terminal
+  5. Ensuite, chaque modification met a jour les resultats en direct
 
 [LEGEND] Interpretation des resultats:
 
@@ -865,8 +1092,10 @@ class SystemeExpertGUI:
 [BUTTONS] Actions disponibles:
 
   > [ EXECUTE ANALYSIS ] : Lance l'estimation
+  > [ GUIDED MODE ]      : Questions utiles seulement, une par une
   > [ RESET SYSTEM ]     : Reinitialise le formulaire
   > [ VIEW RULES ]       : Affiche la base de regles
+  > [ EXPLAIN ]          : Detail du calcul de chaque regle
   > [ HELP ]             : Affiche cette aide
 
 [WARNING] Ce systeme est a but educatif uniquement.
@@ -0,0 +1,535 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Instantane Binaire - Systeme Expert Prix PC Portable
+=====================================================
+
+Ce module sauvegarde et recharge la base de regles entierement compilee
+(conditions compilees, index inverse, masques de MoteurBitmask, tables de
+conditions de MoteurVectoriel et table des options) dans un fichier
+binaire plat :
+- au chargement, le fichier est projete en memoire (mmap, lecture seule)
+  et le reste tant que la base est utilisee. Les sections de largeur fixe
+  sont lues directement dans la projection (memoryview.cast, np.frombuffer),
+  sans copie : les processus de batch -j N qui ouvrent le meme instantane
+  partagent ses pages par le cache du systeme
+- seules les sections marshal (regles, conditions, vocabulaire) donnent
+  des objets Python propres a chaque processus ; les regles compilees et
+  l'index ne sont reconstruits qu'au premier acces (InstantaneRegles.differe),
+  et les masques de MoteurBitmask (entiers Python) a sa premiere estimation.
+  MoteurVectoriel n'a besoin d'aucun des deux
+- il est identifie par une empreinte SHA-256 du contenu des fichiers de
+  regles, des options de la base de faits et du format : un instantane
+  perime ou illisible est ignore puis reconstruit a partir des fichiers de
+  regles eux-memes (charger_ou_construire, BaseRegles(fichiers, instantane))
+
+Format (petit-boutiste, sections alignees sur 8 octets)
+-------------------------------------------------------
+En-tete :
+    magique "SEPC", version du format (u32), nombre de sections (u32),
+    empreinte (32 octets), puis pour chaque section : nom (8 octets),
+    position (u64), longueur (u64)
+Sections :
+    regles     marshal : liste des regles (dictionnaires)
+    vocab      marshal : couples (cle, valeur) ; l'indice est le numero de bit
+    conds      marshal : conditions distinctes (cle, tuple des valeurs)
+    rc_debut   u32[3R+1] : debut des conditions de chaque regle et type
+    rc_ids     u32[...]  : indices dans conds (excluantes, requises, optionnelles)
+    masques    u64[R x 3 x M] : masques de bits (excluantes, requises, optionnelles)
+    ix_debut   u32[3 x (B+1)] : index inverse par bit, pour chaque type
+    ix_regle   u32[...]  : indices des regles de l'index inverse
+    tab_cond   u8[3 x (B+1) x R] : 1 si la valeur du bit satisfait la condition
+                                   du type de la regle (ligne B : fait absent)
+    conf       f64[R]    : confiance de base de chaque regle
+    prix       i32[R x 2] : prix minimum et maximum de chaque regle
+    nb_cond    u32[R x 2] : nombres de conditions requises et optionnelles
+    gamme      u32[R]    : indice de la gamme de chaque regle dans gammes
+    gammes     marshal : noms des gammes, dans l'ordre de premiere apparition
+
+La regle r a les conditions rc_ids[rc_debut[3r+t] : rc_debut[3r+t+1]] pour
+le type t (0 = excluantes, 1 = requises, 2 = optionnelles). Le format marshal
+depend de la version de Python, qui fait donc partie de l'empreinte.
+"""
+
+import hashlib
+import json
+import logging
+import marshal
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # NumPy n'est utile qu'a MoteurVectoriel
+    np = None
+
+from base_faits import BaseFaits
+from base_regles import decoder_fichier_regles
+from compilation_regles import IndexRegles, InstantaneRegles, RegleCompilee
+from moteur_bitmask import TablesBitmask
+
+
+MAGIQUE = b"SEPC"
+VERSION_FORMAT = 2
+
+journal = logging.getLogger("instantane_binaire")
+
+_EN_TETE = struct.Struct("<4sII32s")
+_SECTION = struct.Struct("<8sQQ")
+_TYPES = ("excluantes", "requises", "optionnelles")
+
+
+def empreinte_source(contenus: List[bytes], base_faits) -> bytes:
+    """
+    Calcule l'empreinte d'un instantane.
+
+    Args:
+        contenus: Contenu brut de chaque fichier de regles, dans l'ordre
+        base_faits: Base de faits (ses options determinent les masques)
+
+    Returns:
+        L'empreinte SHA-256 (32 octets)
+    """
+    options = [(cle, base_faits.obtenir_options(cle)) for cle in base_faits.obtenir_attributs()]
+    empreinte = hashlib.sha256()
+    empreinte.update(f"{VERSION_FORMAT}:{marshal.version}:{sys.version_info[:2]}".encode())
+    empreinte.update(json.dumps(options, ensure_ascii=False).encode("utf-8"))
+    for contenu in contenus:
+        # La longueur separe les fichiers : [a, bc] et [ab, c] different
+        empreinte.update(len(contenu).to_bytes(8, "little"))
+        empreinte.update(contenu)
+    return empreinte.digest()
+
+
+# ============================================================
+# ECRITURE
+# ============================================================
+
+def ecrire_instantane(chemin: str, instantane: InstantaneRegles, base_faits, empreinte: bytes) -> int:
+    """
+    Ecrit l'instantane binaire d'une base de regles compilee.
+
+    Le fichier est ecrit a cote puis renomme : un lecteur ne voit jamais
+    un fichier partiellement ecrit.
+
+    Args:
+        chemin: Chemin du fichier a ecrire
+        instantane: Instantane compile (BaseRegles.obtenir_instantane())
+        base_faits: Base de faits (source des options)
+        empreinte: Empreinte de la source (voir empreinte_source)
+
+    Returns:
+        La taille du fichier en octets
+    """
+    regles = instantane.regles
+    tables = instantane.tables_bitmask or TablesBitmask(base_faits, regles)
+
+    # Table des options : numero de bit -> (cle, valeur)
+    vocabulaire: List[Tuple[str, Any]] = [None] * tables._nb_bits
+    for cle, table in tables.positions.items():
+        for valeur, bit in table.items():
+            vocabulaire[bit.bit_length() - 1] = (cle, valeur)
+
+    # Conditions distinctes, partagees entre les regles
+    ids_conditions: Dict[Tuple[str, frozenset], int] = {}
+    conditions = []
+    rc_debut = array("I", [0])
+    rc_ids = array("I")
+    for regle in regles:
+        for type_condition in _TYPES:
+            for condition in getattr(regle, type_condition):
+                identifiant = ids_conditions.get(condition)
+                if identifiant is None:
+                    identifiant = ids_conditions[condition] = len(conditions)
+                    conditions.append((condition[0], tuple(condition[1])))
+                rc_ids.append(identifiant)
+            rc_debut.append(len(rc_ids))
+
+    # Masques de bits, en mots de 64 bits
+    nb_mots = max(1, (len(vocabulaire) + 63) // 64)
+    masques = bytearray()
+    for excluantes, requises, _, optionnelles, _, _, _ in tables.masques:
+        for masque in (excluantes, requises, optionnelles):
+            masques += masque.to_bytes(8 * nb_mots, "little")
+
+    # Tables de conditions par bit (une ligne de R octets par bit et par type)
+    nb_bits = len(vocabulaire)
+    nb_regles = len(regles)
+    tab_cond = bytearray(3 * (nb_bits + 1) * nb_regles)
+    for r, (excluantes, requises, _, optionnelles, _, _, _) in enumerate(tables.masques):
+        for t, masque in enumerate((excluantes, requises, optionnelles)):
+            while masque:
+                bit = (masque & -masque).bit_length() - 1
+                tab_cond[(t * (nb_bits + 1) + bit) * nb_regles + r] = 1
+                masque &= masque - 1
+
+    # Caracteristiques numeriques des regles
+    noms_gammes: Dict[str, int] = {}
+    confiances = array("d")
+    prix = array("i")
+    nb_conditions = array("I")
+    gammes = array("I")
+    for regle in regles:
+        confiances.append(regle.confiance_base)
+        prix.extend((regle.regle["prix_min"], regle.regle["prix_max"]))
+        nb_conditions.extend((regle.nb_requises, regle.nb_optionnelles))
+        gammes.append(noms_gammes.setdefault(regle.nom, len(noms_gammes)))
+
+    # Index inverse par bit
+    ix_debut = array("I", [0])
+    ix_regles = array("I")
+    for type_condition in _TYPES:
+        index = getattr(instantane.index, type_condition)
+        for cle, valeur in vocabulaire:
+            ix_regles.extend(index.get(cle, {}).get(valeur, ()))
+            ix_debut.append(len(ix_regles))
+        if type_condition != _TYPES[-1]:
+            ix_debut.append(len(ix_regles))
+
+    sections = [
+        (b"regles", marshal.dumps([regle.regle for regle in regles])),
+        (b"vocab", marshal.dumps(vocabulaire)),
+        (b"conds", marshal.dumps(conditions)),
+        (b"rc_debut", _octets(rc_debut)),
+        (b"rc_ids", _octets(rc_ids)),
+        (b"masques", bytes(masques)),
+        (b"ix_debut", _octets(ix_debut)),
+        (b"ix_regle", _octets(ix_regles)),
+        (b"tab_cond", bytes(tab_cond)),
+        (b"conf", _octets(confiances)),
+        (b"prix", _octets(prix)),
+        (b"nb_cond", _octets(nb_conditions)),
+        (b"gamme", _octets(gammes)),
+        (b"gammes", marshal.dumps(list(noms_gammes))),
+    ]
+
+    position = _aligner(_EN_TETE.size + _SECTION.size * len(sections))
+    en_tete = bytearray(_EN_TETE.pack(MAGIQUE, VERSION_FORMAT, len(sections), empreinte))
+    corps = bytearray()
+    for nom, donnees in sections:
+        en_tete += _SECTION.pack(nom, position + len(corps), len(donnees))
+        corps += donnees
+        corps += b"\0" * (_aligner(len(corps)) - len(corps))
+    en_tete += b"\0" * (position - len(en_tete))
+
+    temporaire = f"{chemin}.{os.getpid()}.tmp"
+    with open(temporaire, "wb") as fichier:
+        fichier.write(en_tete)
+        fichier.write(corps)
+    os.replace(temporaire, chemin)
+    return len(en_tete) + len(corps)
+
+
+def _octets(tableau: array) -> bytes:
+    """Retourne le contenu d'un tableau en petit-boutiste."""
+    if sys.byteorder != "little":
+        tableau = array(tableau.typecode, tableau)
+        tableau.byteswap()
+    return tableau.tobytes()
+
+
+def _aligner(taille: int) -> int:
+    """Arrondit une taille au multiple de 8 superieur."""
+    return (taille + 7) & ~7
+
+
+# ============================================================
+# LECTURE
+# ============================================================
+
+class InstantaneBinaire:
+    """
+    Instantane binaire projete en memoire.
+
+    La projection reste ouverte tant que l'objet est utilise (l'instantane
+    construit par construire() le garde dans son attribut binaire) : les
+    sections de largeur fixe sont lues dans les pages du fichier, partagees
+    par tous les processus qui ouvrent le meme instantane.
+
+    Attributes:
+        chemin (str): Chemin du fichier
+        empreinte (bytes): Empreinte enregistree dans le fichier
+        sections (Dict[str, memoryview]): Contenu brut de chaque section (vues
+                                          sur la projection, sans copie)
+    """
+
+    def __init__(self, chemin: str):
+        """
+        Ouvre un instantane binaire.
+
+        Args:
+            chemin: Chemin du fichier
+
+        Raises:
+            ValueError: Si le fichier n'est pas un instantane de ce format
+        """
+        self.chemin = chemin
+        self.sections: Dict[str, memoryview] = {}
+        self._dictionnaires: Optional[List[Dict]] = None
+        with open(chemin, "rb") as fichier:
+            if os.fstat(fichier.fileno()).st_size < _EN_TETE.size:
+                raise ValueError(f"Instantane tronque : {chemin}")
+            # La projection survit a la fermeture du descripteur
+            self._projection = mmap.mmap(fichier.fileno(), 0, access=mmap.ACCESS_READ)
+        vue = memoryview(self._projection)
+
+        try:
+            magique, version, nb_sections, self.empreinte = _EN_TETE.unpack_from(vue)
+            if magique != MAGIQUE or version != VERSION_FORMAT:
+                raise ValueError(f"Format d'instantane non reconnu : {chemin}")
+            for i in range(nb_sections):
+                nom, position, longueur = _SECTION.unpack_from(vue, _EN_TETE.size + i * _SECTION.size)
+                if position + longueur > len(vue):
+                    raise ValueError(f"Instantane tronque : {chemin}")
+                self.sections[nom.rstrip(b"\0").decode("ascii")] = vue[position:position + longueur]
+        except (ValueError, struct.error):
+            vue.release()
+            self.fermer()
+            raise
+        vue.release()
+
+    def tableau(self, nom: str, format_elements: str = "I") -> memoryview:
+        """
+        Retourne une section numerique, sans copie.
+
+        Args:
+            nom: Nom de la section
+            format_elements: Code struct des elements (defaut: "I", entier 32 bits)
+
+        Returns:
+            Vue typee sur la projection (ordre des octets natif : les
+            valeurs ne sont exactes que sur une machine petit-boutiste)
+        """
+        return self.sections[nom].cast(format_elements)
+
+    def tableau_numpy(self, nom: str, type_elements: str, forme: Optional[Tuple[int, ...]] = None):
+        """
+        Retourne une section numerique en tableau NumPy, sans copie.
+
+        Args:
+            nom: Nom de la section
+            type_elements: Type NumPy petit-boutiste des elements (ex. "<u4")
+            forme: Forme du tableau (defaut: une dimension)
+
+        Returns:
+            Tableau en lecture seule sur la projection
+
+        Raises:
+            ImportError: Si NumPy n'est pas installe
+        """
+        if np is None:
+            raise ImportError("NumPy est requis pour lire un instantane en tableaux (pip install numpy)")
+        tableau = np.frombuffer(self.sections[nom], dtype=np.dtype(type_elements))
+        return tableau if forme is None else tableau.reshape(forme)
+
+    def dictionnaires(self) -> List[Dict]:
+        """
+        Retourne les regles (dictionnaires), relues au premier appel.
+
+        Returns:
+            La liste des regles, partagee par les regles compilees et les masques
+        """
+        if self._dictionnaires is None:
+            self._dictionnaires = marshal.loads(self.sections["regles"])
+        return self._dictionnaires
+
+    def _entiers(self, nom: str) -> List[int]:
+        """Retourne une section d'entiers u32 sous forme de liste."""
+        if sys.byteorder == "little":
+            return self.tableau(nom).tolist()
+        valeurs = array("I")
+        valeurs.frombytes(self.sections[nom])
+        valeurs.byteswap()
+        return valeurs.tolist()
+
+    def construire(self, version: int = 0) -> InstantaneRegles:
+        """
+        Assemble l'instantane de la base compilee, sans rien reconstruire.
+
+        Seule la table des options est relue ici. Les regles compilees et
+        l'index sont reconstruits au premier acces (compiler), les masques
+        de MoteurBitmask a sa premiere estimation ; l'instantane garde la
+        projection ouverte.
+
+        Args:
+            version: Version de base de regles attribuee a l'instantane
+
+        Returns:
+            L'instantane, avec ses tables de MoteurBitmask
+        """
+        vocabulaire = marshal.loads(self.sections["vocab"])
+        positions: Dict[str, Dict[Any, int]] = {}
+        for bit, (cle, valeur) in enumerate(vocabulaire):
+            positions.setdefault(cle, {})[valeur] = 1 << bit
+        # Tailles des sections lues plus tard : un fichier incoherent est ecarte des maintenant
+        nb_regles = len(self.sections["conf"]) // 8
+        nb_bits = len(vocabulaire)
+        tailles = {
+            "rc_debut": 4 * (3 * nb_regles + 1),
+            "masques": 3 * nb_regles * 8 * max(1, (nb_bits + 63) // 64),
+            "ix_debut": 4 * (3 * (nb_bits + 1)),
+            "tab_cond": 3 * (nb_bits + 1) * nb_regles,
+            "prix": 8 * nb_regles,
+            "nb_cond": 8 * nb_regles,
+            "gamme": 4 * nb_regles,
+        }
+        for nom, taille in tailles.items():
+            if len(self.sections[nom]) != taille:
+                raise ValueError(f"Section {nom} incoherente : {self.chemin}")
+        for nom in ("regles", "conds", "rc_ids", "ix_regle", "gammes"):
+            if nom not in self.sections:
+                raise KeyError(nom)
+
+        def masques() -> List[Tuple]:
+            return self._masques(len(vocabulaire))
+
+        def compiler() -> Tuple[List[RegleCompilee], IndexRegles]:
+            return self.compiler(vocabulaire)
+
+        return InstantaneRegles.differe(compiler, version, TablesBitmask.depuis_tableaux(positions, masques),
+                                        binaire=self)
+
+    def compiler(self, vocabulaire: List[Tuple[str, Any]]) -> Tuple[List[RegleCompilee], IndexRegles]:
+        """
+        Reconstruit les regles compilees et l'index inverse.
+
+        Les conditions communes a plusieurs regles ne sont compilees qu'une fois.
+
+        Args:
+            vocabulaire: Table des options (section vocab)
+
+        Returns:
+            Tuple (regles compilees, index)
+        """
+        regles = self.dictionnaires()
+        conditions = [(cle, frozenset(valeurs)) for cle, valeurs in marshal.loads(self.sections["conds"])]
+        rc_debut = self._entiers("rc_debut")
+        rc_ids = self._entiers("rc_ids")
+
+        regles_compilees = []
+        for r, regle in enumerate(regles):
+            groupes = [tuple(conditions[i] for i in rc_ids[rc_debut[3 * r + t]:rc_debut[3 * r + t + 1]])
+                       for t in range(3)]
+            regles_compilees.append(RegleCompilee.depuis_conditions(regle, groupes[1], groupes[2], groupes[0]))
+
+        # Index inverse : une entree par bit non vide
+        nb_bits = len(vocabulaire)
+        ix_debut = self._entiers("ix_debut")
+        ix_regles = self._entiers("ix_regle")
+        index_conditions = []
+        for t in range(3):
+            index: Dict[str, Dict[Any, Tuple[int, ...]]] = {}
+            decalage = t * (nb_bits + 1)
+            for bit, (cle, valeur) in enumerate(vocabulaire):
+                debut, fin = ix_debut[decalage + bit], ix_debut[decalage + bit + 1]
+                if fin > debut:
+                    index.setdefault(cle, {})[valeur] = tuple(ix_regles[debut:fin])
+            index_conditions.append(index)
+
+        return regles_compilees, IndexRegles(regles_compilees, tuple(index_conditions))
+
+    def _masques(self, nb_bits: int) -> List[Tuple]:
+        """Construit les tuples de masques de MoteurBitmask a partir des sections de largeur fixe."""
+        regles = self.dictionnaires()
+        octets_masque = 8 * max(1, (nb_bits + 63) // 64)
+        masques = self.sections["masques"]
+        confiances = array("d")
+        confiances.frombytes(self.sections["conf"])
+        if sys.byteorder != "little":
+            confiances.byteswap()
+        nb_conditions = self._entiers("nb_cond")
+        resultat = []
+        for r, regle in enumerate(regles):
+            debut = 3 * r * octets_masque
+            excluantes, requises, optionnelles = (
+                int.from_bytes(masques[debut + t * octets_masque:debut + (t + 1) * octets_masque], "little")
+                for t in range(3))
+            resultat.append((excluantes, requises, nb_conditions[2 * r], optionnelles,
+                             nb_conditions[2 * r + 1], confiances[r], regle))
+        return resultat
+
+    def fermer(self) -> None:
+        """Libere les vues et ferme la projection (plus aucune table ne doit la lire)."""
+        for vue in self.sections.values():
+            vue.release()
+        self.sections.clear()
+        projection, self._projection = getattr(self, "_projection", None), None
+        if projection is not None:
+            projection.close()
+
+
+def lire_instantane(chemin: str, empreinte: Optional[bytes] = None) -> Optional[InstantaneBinaire]:
+    """
+    Ouvre un instantane binaire s'il existe et correspond a l'empreinte.
+
+    Args:
+        chemin: Chemin du fichier
+        empreinte: Empreinte attendue (None = pas de verification)
+
+    Returns:
+        L'instantane ouvert, ou None s'il est absent, illisible ou perime
+    """
+    try:
+        instantane = InstantaneBinaire(chemin)
+    except (OSError, ValueError):
+        return None
+    if empreinte is not None and instantane.empreinte != empreinte:
+        instantane.fermer()
+        return None
+    return instantane
+
+
+def charger_ou_construire(chemin: str, fichiers: List[str],
+                          base_faits=None) -> Tuple[InstantaneRegles, bool]:
+    """
+    Charge l'instantane binaire de fichiers de regles, en le reconstruisant s'il est perime.
+
+    Chaque fichier de regles est lu une seule fois : son contenu sert a la
+    fois a l'empreinte et, si l'instantane est absent, perime ou corrompu,
+    a la compilation des regles ecrites dans le nouvel instantane.
+
+    Args:
+        chemin: Chemin de l'instantane
+        fichiers: Fichiers de regles JSON (voir lire_fichiers_regles)
+        base_faits: Base de faits (defaut: BaseFaits())
+
+    Returns:
+        Tuple (instantane compile de version 0, True s'il a ete charge du
+        fichier et False s'il a ete reconstruit)
+
+    Raises:
+        OSError, ValueError: Si un fichier de regles est illisible ou invalide
+    """
+    if base_faits is None:
+        base_faits = BaseFaits()
+    contenus = []
+    for fichier_regles in fichiers:
+        with open(fichier_regles, "rb") as fichier:
+            contenus.append(fichier.read())
+    empreinte = empreinte_source(contenus, base_faits)
+
+    fichier = lire_instantane(chemin, empreinte)
+    if fichier is not None:
+        try:
+            # L'instantane garde le fichier projete pour toute sa duree de vie
+            return fichier.construire(), True
+        except (ValueError, EOFError, TypeError, KeyError, IndexError) as erreur:
+            journal.warning("Instantane corrompu (%s) : %s, reconstruction", erreur, chemin)
+            fichier.fermer()
+
+    regles = []
+    for fichier_regles, contenu in zip(fichiers, contenus):
+        regles.extend(decoder_fichier_regles(contenu, fichier_regles))
+    compilation = InstantaneRegles(regles, 0)
+    instantane = InstantaneRegles.depuis_compilation(
+        compilation.regles, compilation.index, 0, TablesBitmask(base_faits, compilation.regles))
+    try:
+        taille = ecrire_instantane(chemin, instantane, base_faits, empreinte)
+        journal.info("Instantane reconstruit : %s (%d octets)", chemin, taille)
+    except OSError as erreur:
+        journal.warning("Instantane non ecrit (%s) : %s", erreur, chemin)
+    return instantane, False
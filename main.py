@@ -19,6 +19,9 @@ Structure du projet:
     - base_faits.py     : Gestion des faits (specifications utilisateur)
     - base_regles.py    : Gestion des regles d'estimation
     - moteur_inference.py : Moteur d'inference en chainage avant
+    - moteur_bitmask.py : Variante du moteur sur masques de bits
+    - diagramme_decision.py : Variante experimentale sur diagrammes de decision
+    - traitement_lot.py : Estimation d'un fichier JSONL/CSV (pipeline, processus)
 
 Gammes de prix estimees:
     1. Entree de gamme (< 500 euros)
@@ -48,12 +51,56 @@ Exemple d'execution:
     === ESTIMATION DE PRIX ===
     1. Milieu/haut de gamme (1 200 - 1 799 euros) - Confiance: 85%
     2. Bon rapport qualite/prix (800 - 1 199 euros) - Confiance: 65%
+
+Questionnaire adaptatif (question la plus utile d'abord, arret des que la
+gamme en tete ne peut plus changer):
+    $ python main.py --adaptatif
+
+Traitement par lots (fichier JSONL ou CSV, une configuration par ligne):
+    $ python main.py batch configurations.jsonl -o estimations.jsonl
+    $ python main.py batch catalogue.csv -o estimations.jsonl -j 1
+    $ python main.py batch codes.npy -o resultats.npy     (NumPy requis)
+
+Service HTTP/JSON local (requetes regroupees en lots):
+    $ python main.py serve --port 8080
+
+Questionnaire servi en TCP local (une session par connexion, telnet):
+    $ python main.py questionnaire --port 8023
+    $ python main.py questionnaire --budget-mo 16   (memoire des sessions bornee)
+    $ python main.py --adaptatif questionnaire
+
+Demon sur socket Unix (moteur garde en memoire) et client leger:
+    $ python main.py daemon &
+    $ python client_estimation.py usage=Gaming ram="16 Go"
+
+Regles externes (fichiers JSON, rechargees a chaud en mode interactif):
+    $ python main.py --regles regles.json
+    $ python main.py --regles regles.json batch configurations.jsonl
 """
 
+import argparse
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Iterator, List, Optional
+
 # Importation des modules du systeme expert
 from base_faits import BaseFaits
 from base_regles import BaseRegles
+from client_estimation import CHEMIN_SOCKET_DEFAUT
+from diagramme_decision import MoteurDiagramme
 from moteur_inference import MoteurInference
+from moteur_bitmask import MoteurBitmask
+
+if TYPE_CHECKING:
+    from rechargement_regles import SurveillantRegles
+
+
+# Moteurs d'inference disponibles (meme interface, memes resultats)
+MOTEURS = {
+    "standard": MoteurInference,
+    "bitmask": MoteurBitmask,
+    "diagramme": MoteurDiagramme,  # Experimental (voir diagramme_decision.py)
+}
 
 
 class SystemeExpertPrixPC:
@@ -69,14 +116,32 @@ class SystemeExpertPrixPC:
         base_faits (BaseFaits): Instance de la base de faits
         base_regles (BaseRegles): Instance de la base de regles
         moteur (MoteurInference): Instance du moteur d'inference
+        adaptatif (bool): Questionnaire adaptatif (voir questionnaire_adaptatif.py)
     """
     
-    def __init__(self):
-        """Initialise le systeme expert avec ses trois composants."""
+    def __init__(self, moteur: str = "standard", fichiers_regles: List[str] = None,
+                 adaptatif: bool = False, seuil_confiance: float = 0.4,
+                 fichier_instantane: Optional[str] = None):
+        """
+        Initialise le systeme expert avec ses trois composants.
+        
+        Args:
+            moteur: Nom du moteur d'inference a utiliser (voir MOTEURS)
+            fichiers_regles: Fichiers de regles JSON (defaut: regles predefinies)
+            adaptatif: Ne poser que les questions utiles, la plus utile d'abord
+                       (defaut: False, toutes les questions dans l'ordre)
+            seuil_confiance: Seuil minimum de confiance du moteur (defaut: 0.4)
+            fichier_instantane: Instantane binaire des fichiers de regles
+                                (voir instantane_binaire.py, defaut: aucun)
+        """
+        if moteur not in MOTEURS:
+            raise ValueError(f"Moteur inconnu : {moteur} (choix : {', '.join(MOTEURS)})")
+        
         # Initialisation des composants
         self.base_faits = BaseFaits()
-        self.base_regles = BaseRegles()
-        self.moteur = MoteurInference(self.base_faits, self.base_regles)
+        self.base_regles = BaseRegles(fichiers_regles, fichier_instantane)
+        self.moteur = MOTEURS[moteur](self.base_faits, self.base_regles, seuil_confiance)
+        self.adaptatif = adaptatif
     
     def afficher_avertissement(self) -> None:
         """Affiche l'avertissement obligatoire sur le caractere indicatif des estimations."""
@@ -109,6 +174,7 @@ class SystemeExpertPrixPC:
         3. Affichage du resume des faits
         4. Inference (evaluation des regles)
         5. Affichage des resultats
+        6. Detail du raisonnement (sur demande)
         """
         # Etape 1 : Affichage de l'en-tete
         self.afficher_entete()
@@ -120,20 +186,54 @@ class SystemeExpertPrixPC:
         input("Appuyez sur Entree pour commencer le questionnaire...")
         
         # Etape 3 : Collecte des faits (chainage avant - phase de collecte)
-        self.base_faits.collecter_faits()
+        if self.adaptatif:
+            from questionnaire_adaptatif import QuestionsAdaptatives
+            
+            questions = QuestionsAdaptatives(self.moteur, self.base_faits.faits)
+            self.base_faits.collecter_faits(questions)
+            print(f"[OK] {questions.nb_posees} question(s) posee(s) sur {questions.nb_questions} : "
+                  "les autres reponses ne pouvaient plus changer la gamme en tete.")
+        else:
+            self.base_faits.collecter_faits()
         
         # Etape 4 : Afficher le resume des faits collectes
         self.base_faits.afficher_resume()
         
         # Etape 5 : Inference (chainage avant - phase d'evaluation)
-        estimations = self.moteur.inferer()
+        estimations = self.moteur.inferer(k=3)
         
         # Etape 6 : Affichage des resultats
         self.moteur.afficher_resultats(estimations)
         
+        # Etape 7 : Detail du raisonnement, seulement sur demande
+        if input("Voir le detail du raisonnement ? (o/N) : ").strip().lower() == "o":
+            self.moteur.afficher_explications()
+        
         # Message de fin
         print("\nMerci d'avoir utilise le systeme expert d'estimation de prix !\n")
     
+    def estimer_fichier(self, chemin_entree: str, chemin_sortie: str,
+                        k: int = 3, format_entree: str = None) -> dict:
+        """
+        Estime un fichier de configurations JSONL ou CSV (voir traitement_lot.py).
+        
+        Les configurations sont lues, validees, estimees et ecrites une par
+        une : la memoire utilisee ne depend pas de la taille du fichier.
+        La base de faits du systeme n'est pas modifiee.
+        
+        Args:
+            chemin_entree: Fichier des configurations
+            chemin_sortie: Fichier JSONL des resultats
+            k: Nombre d'estimations par configuration (defaut: 3)
+            format_entree: "jsonl" ou "csv" (defaut: deduit de l'extension)
+            
+        Returns:
+            Dictionnaire {configurations, invalides, duree}
+        """
+        from traitement_lot import estimer_fichier
+        
+        return estimer_fichier(chemin_entree, chemin_sortie, self.moteur, k, format_entree)
+    
     def ajouter_regle(self, nom: str, prix_min: int, prix_max: int,
                       description: str, conditions_requises: dict,
                       conditions_optionnelles: dict = None,
@@ -186,22 +286,311 @@ def afficher_menu() -> str:
     return input("Votre choix (1-3) : ").strip()
 
 
-def main():
+def creer_parseur() -> argparse.ArgumentParser:
+    """
+    Construit le parseur de la ligne de commande.
+    
+    Returns:
+        Le parseur (sans sous-commande : menu interactif)
+    """
+    parseur = argparse.ArgumentParser(description="Systeme expert d'estimation du prix d'un PC portable")
+    parseur.add_argument("--regles", action="append", metavar="FICHIER",
+                         help="Fichier de regles JSON a utiliser a la place des regles predefinies "
+                              "(option repetable ; recharge a chaud en mode interactif)")
+    parseur.add_argument("--instantane", metavar="FICHIER",
+                         help="Instantane binaire de la base compilee (avec --regles) : "
+                              "recharge au demarrage s'il est a jour, reconstruit sinon")
+    parseur.add_argument("--adaptatif", action="store_true",
+                         help="Questionnaire adaptatif : la question la plus utile d'abord, "
+                              "arret des que la gamme en tete ne peut plus changer "
+                              "(mode interactif et questionnaire)")
+    sous_commandes = parseur.add_subparsers(dest="commande")
+    
+    lot = sous_commandes.add_parser("batch", help="Estimer un fichier JSONL ou CSV de configurations")
+    lot.add_argument("entree", help="Fichier JSONL (un objet de faits par ligne), CSV "
+                                    "ou .npy de codes uint8 (voir moteur_vectoriel.py)")
+    lot.add_argument("--format", choices=["jsonl", "csv"], default=None,
+                     help="Format du fichier d'entree (defaut: deduit de l'extension)")
+    lot.add_argument("-o", "--sortie", default="estimations.jsonl",
+                     help="Fichier JSONL des resultats (defaut: estimations.jsonl)")
+    lot.add_argument("--moteur", choices=list(MOTEURS), default="standard",
+                     help="Moteur d'inference (defaut: standard)")
+    lot.add_argument("-k", type=int, default=3,
+                     help="Nombre d'estimations par configuration (defaut: 3)")
+    lot.add_argument("--seuil", type=float, default=0.4,
+                     help="Seuil minimum de confiance (defaut: 0.4)")
+    lot.add_argument("-j", "--processus", type=int, default=None,
+                     help="Nombre de processus, 1 = sans pool (defaut: nombre de coeurs)")
+    lot.add_argument("--taille-paquet", type=int, default=500,
+                     help="Configurations par paquet envoye a un processus (defaut: 500)")
+    
+    service = sous_commandes.add_parser("serve", help="Servir les estimations en HTTP/JSON local")
+    service.add_argument("--hote", default="127.0.0.1", help="Adresse d'ecoute (defaut: 127.0.0.1)")
+    service.add_argument("--port", type=int, default=8080, help="Port d'ecoute (defaut: 8080)")
+    service.add_argument("--moteur", choices=list(MOTEURS), default="standard",
+                         help="Moteur d'inference (defaut: standard)")
+    service.add_argument("--seuil", type=float, default=0.4,
+                         help="Seuil minimum de confiance (defaut: 0.4)")
+    service.add_argument("--fenetre-ms", type=float, default=0.0,
+                         help="Attente maximale pour completer un lot, en ms (defaut: 0, "
+                              "lots formes des seules requetes deja en attente ; une fenetre "
+                              "donne des lots plus gros mais moins de requetes par seconde)")
+    service.add_argument("--lot-max", type=int, default=64,
+                         help="Nombre maximal de requetes par lot (defaut: 64)")
+    service.add_argument("--file-max", type=int, default=10000,
+                         help="Requetes en attente au-dela desquelles le service refuse (defaut: 10000)")
+    
+    demon = sous_commandes.add_parser("daemon", help="Garder le moteur en memoire derriere une socket Unix "
+                                                     "(voir client_estimation.py)")
+    demon.add_argument("--socket", default=CHEMIN_SOCKET_DEFAUT,
+                       help=f"Fichier de la socket Unix (defaut: {CHEMIN_SOCKET_DEFAUT})")
+    demon.add_argument("--moteur", choices=list(MOTEURS), default="standard",
+                       help="Moteur d'inference (defaut: standard)")
+    demon.add_argument("--seuil", type=float, default=0.4,
+                       help="Seuil minimum de confiance (defaut: 0.4)")
+    demon.add_argument("--fenetre-ms", type=float, default=0.0,
+                       help="Attente maximale pour completer un lot, en ms (defaut: 0, "
+                            "lots formes des seules demandes deja en attente)")
+    demon.add_argument("--lot-max", type=int, default=64,
+                       help="Nombre maximal de demandes par lot (defaut: 64)")
+    
+    questionnaire = sous_commandes.add_parser("questionnaire",
+                                              help="Poser le questionnaire en TCP local (telnet), "
+                                                   "une session par connexion")
+    questionnaire.add_argument("--hote", default="127.0.0.1", help="Adresse d'ecoute (defaut: 127.0.0.1)")
+    questionnaire.add_argument("--port", type=int, default=8023, help="Port d'ecoute (defaut: 8023)")
+    questionnaire.add_argument("--moteur", choices=list(MOTEURS), default="standard",
+                               help="Moteur d'inference (defaut: standard)")
+    questionnaire.add_argument("--seuil", type=float, default=0.4,
+                               help="Seuil minimum de confiance (defaut: 0.4)")
+    questionnaire.add_argument("--delai", type=float, default=600.0,
+                               help="Attente maximale d'une reponse, en secondes (defaut: 600)")
+    questionnaire.add_argument("--budget-mo", type=float, default=64.0,
+                               help="Memoire maximale des sessions vivantes, en Mo ; au-dela les "
+                                    "sessions inactives depuis le plus longtemps sont fermees (defaut: 64)")
+    return parseur
+
+
+@contextmanager
+def surveiller_regles(base_regles: BaseRegles,
+                      fichiers: Optional[List[str]]) -> Iterator[Optional["SurveillantRegles"]]:
+    """
+    Recharge a chaud les fichiers de regles pendant la duree du bloc.
+    
+    Sans fichier de regles, le bloc s'execute sans surveillance. Les
+    rechargements sont ecrits dans le journal (logging).
+    
+    Args:
+        base_regles: Base de regles a mettre a jour
+        fichiers: Fichiers de regles JSON (None = regles predefinies)
+        
+    Yields:
+        Le surveillant demarre (voir rechargement_regles.py), ou None
+    """
+    if not fichiers:
+        yield None
+        return
+    import logging
+    from rechargement_regles import SurveillantRegles
+    
+    logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s")
+    with SurveillantRegles(base_regles, fichiers) as surveillant:
+        yield surveillant
+
+
+def executer_lot(arguments: argparse.Namespace) -> None:
+    """
+    Execute la sous-commande batch.
+    
+    Args:
+        arguments: Arguments de la ligne de commande
+    """
+    if arguments.entree.lower().endswith(".npy"):
+        executer_lot_npy(arguments)
+        return
+    
+    if arguments.processus == 1:
+        # Pipeline dans le processus courant
+        systeme = SystemeExpertPrixPC(arguments.moteur, arguments.regles,
+                                      seuil_confiance=arguments.seuil,
+                                      fichier_instantane=arguments.instantane)
+        bilan = systeme.estimer_fichier(arguments.entree, arguments.sortie,
+                                        arguments.k, arguments.format)
+        repartition = "1 processus"
+    else:
+        from traitement_lot import traiter_lot
+        
+        bilan = traiter_lot(arguments.entree, arguments.sortie,
+                            classe_moteur=MOTEURS[arguments.moteur],
+                            seuil_confiance=arguments.seuil,
+                            k=arguments.k,
+                            nb_processus=arguments.processus,
+                            taille_paquet=arguments.taille_paquet,
+                            format_entree=arguments.format,
+                            fichiers_regles=arguments.regles,
+                            fichier_instantane=arguments.instantane)
+        repartition = f"{bilan['paquets']} paquet(s), {bilan['processus']} processus"
+    
+    debit = bilan["configurations"] / bilan["duree"] if bilan["duree"] else 0.0
+    print(f"[OK] {bilan['configurations']} configuration(s) estimee(s) en {bilan['duree']:.2f} s "
+          f"({repartition}, {debit:.0f} config/s)")
+    if bilan["invalides"]:
+        print(f"[!] {bilan['invalides']} configuration(s) invalide(s) (champ \"erreurs\" du resultat)")
+    print(f"[OK] Resultats ecrits dans {arguments.sortie}")
+
+
+def executer_lot_npy(arguments: argparse.Namespace) -> None:
+    """
+    Execute la sous-commande batch sur un fichier .npy de codes uint8.
+    
+    Le calcul se fait avec MoteurVectoriel.scorer_fichier (NumPy requis),
+    en memoire projetee ; la sortie est un fichier .npy (voir moteur_vectoriel.py).
+    
+    Args:
+        arguments: Arguments de la ligne de commande
+    """
+    from moteur_vectoriel import MoteurVectoriel
+    
+    if not arguments.sortie.lower().endswith(".npy"):
+        print("[!] Avec une entree .npy, le fichier de sortie doit aussi etre un .npy")
+        return
+    try:
+        moteur = MoteurVectoriel(BaseFaits(), BaseRegles(arguments.regles, arguments.instantane),
+                                 arguments.seuil)
+    except ImportError as erreur:
+        print(f"[!] {erreur}")
+        return
+    
+    debut = time.perf_counter()
+    nb_lignes = moteur.scorer_fichier(arguments.entree, arguments.sortie)
+    duree = time.perf_counter() - debut
+    print(f"[OK] {nb_lignes} configuration(s) estimee(s) en {duree:.2f} s")
+    print(f"[OK] Resultats ecrits dans {arguments.sortie} (gammes : {', '.join(moteur.noms_gammes())})")
+
+
+def executer_service(arguments: argparse.Namespace) -> None:
+    """
+    Execute la sous-commande serve (voir service_estimation.py).
+    
+    Args:
+        arguments: Arguments de la ligne de commande
+    """
+    import asyncio
+    from service_estimation import ServiceEstimation
+    
+    systeme = SystemeExpertPrixPC(arguments.moteur, arguments.regles,
+                                  seuil_confiance=arguments.seuil,
+                                  fichier_instantane=arguments.instantane)
+    service = ServiceEstimation(systeme.moteur, arguments.fenetre_ms,
+                                arguments.lot_max, arguments.file_max)
+    
+    with surveiller_regles(systeme.base_regles, arguments.regles):
+        try:
+            asyncio.run(service.servir(arguments.hote, arguments.port))
+        except KeyboardInterrupt:
+            print("\n[OK] Service arrete.")
+
+
+def executer_demon(arguments: argparse.Namespace) -> None:
+    """
+    Execute la sous-commande daemon (voir demon_estimation.py).
+    
+    Args:
+        arguments: Arguments de la ligne de commande
+    """
+    import asyncio
+    from demon_estimation import DemonEstimation
+    from service_estimation import ServiceEstimation
+    
+    systeme = SystemeExpertPrixPC(arguments.moteur, arguments.regles,
+                                  seuil_confiance=arguments.seuil,
+                                  fichier_instantane=arguments.instantane)
+    service = ServiceEstimation(systeme.moteur, arguments.fenetre_ms, arguments.lot_max)
+    
+    with surveiller_regles(systeme.base_regles, arguments.regles) as surveillant:
+        demon = DemonEstimation(service, arguments.socket, surveillant)
+        try:
+            asyncio.run(demon.servir())
+            print("[OK] Demon arrete.")
+        except OSError as erreur:
+            print(f"[!] {erreur}")
+
+
+def executer_questionnaire(arguments: argparse.Namespace) -> None:
+    """
+    Execute la sous-commande questionnaire (voir questionnaire.py).
+    
+    Args:
+        arguments: Arguments de la ligne de commande
+    """
+    import asyncio
+    from gestion_sessions import GestionnaireSessions
+    from questionnaire import servir_questionnaire
+    from service_estimation import ServiceEstimation
+    
+    systeme = SystemeExpertPrixPC(arguments.moteur, arguments.regles,
+                                  seuil_confiance=arguments.seuil,
+                                  fichier_instantane=arguments.instantane)
+    service = ServiceEstimation(systeme.moteur, fenetre_ms=0.0)
+    gestionnaire = GestionnaireSessions(int(arguments.budget_mo * 1024 * 1024))
+    
+    with surveiller_regles(systeme.base_regles, arguments.regles):
+        try:
+            asyncio.run(servir_questionnaire(service, arguments.hote, arguments.port, arguments.delai,
+                                             gestionnaire, arguments.adaptatif))
+        except KeyboardInterrupt:
+            stats = gestionnaire.statistiques()
+            print(f"\n[OK] Questionnaire arrete ({stats['ouvertes']} sessions, "
+                  f"{stats['evictions']} evincees, {stats['expirations']} expirees, "
+                  f"{stats['octets_par_session']} octets par session).")
+
+
+def main(arguments=None):
     """
     Fonction principale du programme.
     
-    Propose un menu permettant de :
+    Sans sous-commande, propose un menu permettant de :
     - Lancer une estimation de prix
     - Afficher les regles du systeme
     - Quitter le programme
+    
+    Args:
+        arguments: Arguments de la ligne de commande (defaut: sys.argv)
     """
+    arguments = creer_parseur().parse_args(arguments)
+    if arguments.commande == "batch":
+        executer_lot(arguments)
+        return
+    if arguments.commande == "serve":
+        executer_service(arguments)
+        return
+    if arguments.commande == "daemon":
+        executer_demon(arguments)
+        return
+    if arguments.commande == "questionnaire":
+        executer_questionnaire(arguments)
+        return
+    
     # Creation du systeme expert
-    systeme = SystemeExpertPrixPC()
+    systeme = SystemeExpertPrixPC(fichiers_regles=arguments.regles, adaptatif=arguments.adaptatif,
+                                  fichier_instantane=arguments.instantane)
     
     print("\n" + "=" * 65)
     print("    BIENVENUE DANS LE SYSTEME EXPERT PRIX PC PORTABLE")
     print("=" * 65)
     
+    # Les fichiers de regles sont recharges a chaud pendant la session
+    with surveiller_regles(systeme.base_regles, arguments.regles):
+        menu(systeme)
+
+
+def menu(systeme: SystemeExpertPrixPC) -> None:
+    """
+    Boucle du menu principal du mode interactif.
+    
+    Args:
+        systeme: Systeme expert utilise pour les estimations
+    """
     while True:
         choix = afficher_menu()
         
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Moteur d'Inference Bitmask - Systeme Expert Prix PC Portable
+=============================================================
+
+Ce module contient la classe MoteurBitmask, une variante de MoteurInference
+qui travaille sur un codage des faits en masques de bits :
+- chaque couple (caracteristique, valeur) recoit un bit
+- les faits deviennent un entier ou un seul bit est positionne par caracteristique
+- chaque regle devient trois masques (excluantes, requises, optionnelles)
+
+Comme une condition porte sur une seule caracteristique et qu'un fait n'a
+qu'une valeur par caracteristique, le nombre de conditions satisfaites est
+simplement le nombre de bits de (faits & masque) :
+- exclusion      : faits & masque_excluantes != 0
+- ratio requis   : popcount(faits & masque_requises) / nb_requises
+- bonus optionnel: popcount(faits & masque_optionnelles) / nb_optionnelles
+
+Les resultats sont identiques a ceux de MoteurInference.inferer().
+"""
+
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple, Union
+
+from moteur_inference import MoteurInference
+
+
+# int.bit_count n'existe qu'a partir de Python 3.10
+_popcount = getattr(int, "bit_count", None) or (lambda x: bin(x).count("1"))
+
+
+class TablesBitmask:
+    """
+    Codage en masques de bits des faits et des regles compilees.
+
+    Attributes:
+        positions (Dict[str, Dict[Any, int]]): Pour chaque caracteristique,
+            le bit associe a chacune de ses valeurs
+        masques (List[Tuple]): Pour chaque regle, le tuple
+            (excluantes, requises, nb_requises, optionnelles, nb_optionnelles,
+             confiance_base, regle)
+    """
+
+    def __init__(self, base_faits, regles_compilees):
+        """
+        Construit les tables de codage.
+
+        Le vocabulaire de chaque caracteristique est celui de la base de faits,
+        complete par les valeurs rencontrees dans les regles (une regle peut
+        citer une valeur ou une caracteristique absente des options).
+
+        Args:
+            base_faits: Instance de BaseFaits (source des options)
+            regles_compilees: Liste de RegleCompilee
+        """
+        self.positions: Dict[str, Dict[Any, int]] = {}
+        self._nb_bits = 0
+
+        for cle in base_faits.obtenir_attributs():
+            for valeur in base_faits.obtenir_options(cle):
+                self._bit(cle, valeur)
+
+        self._masques: Optional[List[Tuple]] = []
+        self._charger_masques = None
+        for regle in regles_compilees:
+            self._masques.append((
+                self._masque(regle.excluantes),
+                self._masque(regle.requises),
+                regle.nb_requises,
+                self._masque(regle.optionnelles),
+                regle.nb_optionnelles,
+                regle.confiance_base,
+                regle.regle
+            ))
+
+    @classmethod
+    def depuis_tableaux(cls, positions: Dict[str, Dict[Any, int]],
+                        masques: Union[List[Tuple], Callable[[], List[Tuple]]]) -> "TablesBitmask":
+        """
+        Reconstruit des tables deja calculees (voir instantane_binaire.py).
+
+        Args:
+            positions: Bit de chaque valeur de chaque caracteristique
+            masques: Tuples de masques des regles, au format de l'attribut
+                     masques, ou fonction qui les construit au premier acces
+
+        Returns:
+            Les tables de codage
+        """
+        tables = cls.__new__(cls)
+        tables.positions = positions
+        tables._nb_bits = sum(len(table) for table in positions.values())
+        if callable(masques):
+            tables._masques, tables._charger_masques = None, masques
+        else:
+            tables._masques, tables._charger_masques = masques, None
+        return tables
+
+    @property
+    def masques(self) -> List[Tuple]:
+        """Tuples de masques des regles (construits au premier acces s'ils sont differes)."""
+        masques = self._masques
+        if masques is None:
+            # Deux threads peuvent construire la meme liste : le resultat est identique
+            masques = self._masques = self._charger_masques()
+        return masques
+
+    def _bit(self, cle: str, valeur: Any) -> int:
+        """Retourne le bit d'une valeur, en l'allouant si necessaire."""
+        table = self.positions.setdefault(cle, {})
+        bit = table.get(valeur)
+        if bit is None:
+            bit = 1 << self._nb_bits
+            self._nb_bits += 1
+            table[valeur] = bit
+        return bit
+
+    def _masque(self, conditions) -> int:
+        """Calcule le masque (OU des bits) d'un tuple de conditions compilees."""
+        masque = 0
+        for cle, valeurs in conditions:
+            for valeur in valeurs:
+                masque |= self._bit(cle, valeur)
+        return masque
+
+    def encoder(self, faits: Mapping[str, Any]) -> int:
+        """
+        Encode un dictionnaire de faits en masque de bits.
+
+        Un fait absent ou dont la valeur n'est citee nulle part ne positionne
+        aucun bit : il ne peut alors satisfaire aucune condition.
+
+        Args:
+            faits: Dictionnaire des faits
+
+        Returns:
+            Le masque des faits
+        """
+        masque = 0
+        get = faits.get
+        for cle, table in self.positions.items():
+            bit = table.get(get(cle))
+            if bit:
+                masque |= bit
+        return masque
+
+
+class MoteurBitmask(MoteurInference):
+    """
+    Moteur d'inference evaluant les regles par operations bit a bit.
+
+    S'utilise exactement comme MoteurInference ; les tables de codage sont
+    reconstruites automatiquement quand la base de regles est modifiee.
+    """
+
+    def __init__(self, base_faits, base_regles, seuil_confiance: float = 0.4,
+                 taille_cache: int = 0):
+        """
+        Initialise le moteur bitmask.
+
+        Args:
+            base_faits: Instance de BaseFaits contenant les specifications
+            base_regles: Instance de BaseRegles contenant les regles
+            seuil_confiance: Seuil minimum de confiance (defaut: 0.4)
+            taille_cache: Nombre maximal de resultats en cache LRU (defaut: 0)
+        """
+        super().__init__(base_faits, base_regles, seuil_confiance, taille_cache)
+        # Couple (version de la base, tables), remplace d'un seul bloc
+        self._tables: Optional[Tuple[int, TablesBitmask]] = None
+
+    def obtenir_tables(self) -> TablesBitmask:
+        """
+        Retourne les tables de codage a jour avec la base de regles.
+
+        Returns:
+            Les tables de codage en masques de bits
+        """
+        instantane = self.base_regles.obtenir_instantane()
+        tables = self._tables
+        if tables is None or tables[0] != instantane.version:
+            # Tables deja chargees avec l'instantane (instantane binaire) ou a calculer
+            tables = (instantane.version,
+                      instantane.tables_bitmask or TablesBitmask(self.base_faits, instantane.regles))
+            self._tables = tables
+        return tables[1]
+
+    def _evaluer_regles(self, faits: Mapping[str, Any],
+                        k: Optional[int] = None) -> List[Tuple[str, float, str, int, int]]:
+        """
+        Evalue les regles sur le codage en masques de bits.
+
+        Toutes les regles sont evaluees (le test d'une regle ne coute que
+        quelques operations) ; k ne fait que tronquer le classement.
+
+        Args:
+            faits: Dictionnaire des faits
+            k: Nombre d'estimations voulues (defaut: toutes)
+
+        Returns:
+            Liste de tuples (nom_gamme, score_confiance, description, prix_min, prix_max)
+        """
+        tables = self.obtenir_tables()
+        faits = tables.encoder(faits)
+
+        correspondances = []
+        for excluantes, requises, nb_requises, optionnelles, nb_optionnelles, \
+                confiance_base, regle in tables.masques:
+            if faits & excluantes:
+                continue
+
+            if nb_requises:
+                ratio_requis = _popcount(faits & requises) / nb_requises
+                if ratio_requis < 0.5:
+                    continue
+            else:
+                ratio_requis = 1.0
+
+            confiance = confiance_base * (0.7 + 0.3 * ratio_requis)
+
+            if nb_optionnelles:
+                bonus = (_popcount(faits & optionnelles) / nb_optionnelles) * 0.15
+            else:
+                bonus = 0.0
+
+            correspondances.append((regle, min(1.0, confiance + bonus)))
+
+        estimations = self._construire_estimations(correspondances)
+        return estimations if k is None else estimations[:max(0, k)]
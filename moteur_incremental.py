@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Moteur d'Inference Incremental - Systeme Expert Prix PC Portable
+=================================================================
+
+Ce module contient la classe MoteurIncremental, un reseau de filtrage
+inspire de Rete pour la re-estimation en direct :
+- un index caracteristique -> conditions (regle, type, valeurs acceptees)
+- pour chaque regle, le nombre courant de conditions requises, optionnelles
+  et excluantes satisfaites
+- pour chaque gamme, un tas des scores de ses regles retenues
+
+Quand un seul fait change (on_fait_modifie), seules les regles qui citent
+cette caracteristique sont mises a jour ; le classement est ensuite relu
+sur les tas des gammes. Le resultat est identique a celui de inferer().
+"""
+
+import heapq
+from typing import Any, Dict, List, Optional, Tuple
+
+from moteur_inference import MoteurInference
+
+
+class MoteurIncremental(MoteurInference):
+    """
+    Moteur d'inference incremental pour la re-estimation en direct.
+
+    inferer() resynchronise tout le reseau sur la base de faits ;
+    on_fait_modifie() ne propage qu'un changement de fait.
+    """
+
+    def __init__(self, base_faits, base_regles, seuil_confiance: float = 0.4):
+        """
+        Initialise le moteur incremental.
+
+        Args:
+            base_faits: Instance de BaseFaits contenant les specifications
+            base_regles: Instance de BaseRegles contenant les regles
+            seuil_confiance: Seuil minimum de confiance (defaut: 0.4)
+        """
+        super().__init__(base_faits, base_regles, seuil_confiance)
+        self._version_reseau = -1
+
+    # ------------------------------------------------------------
+    # Construction et synchronisation du reseau
+    # ------------------------------------------------------------
+
+    def _construire_reseau(self) -> None:
+        """Construit l'index des conditions a partir de la base de regles."""
+        instantane = self.base_regles.obtenir_instantane()
+        self._regles = instantane.regles
+        self._version_reseau = instantane.version
+
+        # Index caracteristique -> [(indice regle, type de condition, valeurs)]
+        self._index: Dict[str, List[Tuple[int, str, frozenset]]] = {}
+        for r, regle in enumerate(self._regles):
+            for type_condition, conditions in (("excluantes", regle.excluantes),
+                                               ("requises", regle.requises),
+                                               ("optionnelles", regle.optionnelles)):
+                for cle, valeurs in conditions:
+                    self._index.setdefault(cle, []).append((r, type_condition, valeurs))
+
+        # Gamme de chaque regle (ordre de premiere apparition)
+        indices_gammes: Dict[str, int] = {}
+        self._gamme_regle = [indices_gammes.setdefault(regle.nom, len(indices_gammes))
+                             for regle in self._regles]
+        self._membres_gammes: List[List[int]] = [[] for _ in indices_gammes]
+        for r, g in enumerate(self._gamme_regle):
+            self._membres_gammes[g].append(r)
+
+        self._resynchroniser()
+
+    def _resynchroniser(self) -> None:
+        """Recalcule tous les compteurs a partir de la base de faits."""
+        self._faits: Dict[str, Any] = dict(self.base_faits.faits)
+        nb_regles = len(self._regles)
+        self._compteurs = {
+            "excluantes": [0] * nb_regles,
+            "requises": [0] * nb_regles,
+            "optionnelles": [0] * nb_regles,
+        }
+        for cle, conditions in self._index.items():
+            valeur = self._faits.get(cle)
+            for r, type_condition, valeurs in conditions:
+                if valeur in valeurs:
+                    self._compteurs[type_condition][r] += 1
+
+        self._scores: List[Optional[float]] = [None] * nb_regles
+        self._tas_scores: List[List[Tuple[float, int]]] = [[] for _ in self._membres_gammes]
+        self._tas_ordre: List[List[int]] = [[] for _ in self._membres_gammes]
+        for r in range(nb_regles):
+            self._mettre_a_jour_regle(r)
+
+    # ------------------------------------------------------------
+    # Mise a jour incrementale
+    # ------------------------------------------------------------
+
+    def _calculer_score(self, r: int) -> Optional[float]:
+        """Calcule le score retenu d'une regle a partir de ses compteurs (None si rejetee)."""
+        if self._compteurs["excluantes"][r]:
+            return None
+
+        confiance = self._regles[r].calculer_confiance(self._compteurs["requises"][r],
+                                                       self._compteurs["optionnelles"][r])
+        if confiance is None or confiance <= self.seuil_confiance:
+            return None
+        return confiance
+
+    def _mettre_a_jour_regle(self, r: int) -> None:
+        """Recalcule le score d'une regle et l'enregistre dans les tas de sa gamme."""
+        score = self._calculer_score(r)
+        ancien = self._scores[r]
+        if score == ancien:
+            return
+
+        self._scores[r] = score
+        if score is None:
+            return  # Les entrees perimees sont ecartees a la lecture
+
+        g = self._gamme_regle[r]
+        heapq.heappush(self._tas_scores[g], (-score, r))
+        if ancien is None:
+            heapq.heappush(self._tas_ordre[g], r)
+
+        # Compactage si les entrees perimees s'accumulent
+        if len(self._tas_scores[g]) > 2 * len(self._membres_gammes[g]) + 8:
+            self._compacter_gamme(g)
+
+    def _compacter_gamme(self, g: int) -> None:
+        """Reconstruit les tas d'une gamme a partir des scores courants."""
+        membres = [r for r in self._membres_gammes[g] if self._scores[r] is not None]
+        self._tas_scores[g] = [(-self._scores[r], r) for r in membres]
+        self._tas_ordre[g] = membres
+        heapq.heapify(self._tas_scores[g])
+        heapq.heapify(self._tas_ordre[g])
+
+    def _meilleure_regle(self, g: int) -> Optional[Tuple[float, int, int]]:
+        """Retourne (score, meilleure regle, premiere regle retenue) d'une gamme ou None."""
+        tas_scores = self._tas_scores[g]
+        while tas_scores and self._scores[tas_scores[0][1]] != -tas_scores[0][0]:
+            heapq.heappop(tas_scores)
+        if not tas_scores:
+            return None
+
+        tas_ordre = self._tas_ordre[g]
+        while self._scores[tas_ordre[0]] is None:
+            heapq.heappop(tas_ordre)
+
+        score, r = tas_scores[0]
+        return (-score, r, tas_ordre[0])
+
+    def classement(self) -> List[Tuple[str, float, str, int, int]]:
+        """
+        Retourne le classement courant du reseau, sans reevaluer de regle.
+
+        Returns:
+            Liste de tuples (nom_gamme, score_confiance, description, prix_min, prix_max)
+        """
+        meilleures = []
+        for g in range(len(self._membres_gammes)):
+            meilleure = self._meilleure_regle(g)
+            if meilleure is not None:
+                meilleures.append(meilleure)
+
+        # Confiance decroissante, puis ordre d'apparition de la gamme
+        meilleures.sort(key=lambda m: (-m[0], m[2]))
+
+        estimations = []
+        for score, r, _ in meilleures:
+            regle = self._regles[r].regle
+            estimations.append((regle["nom"], score, regle["description"],
+                                regle["prix_min"], regle["prix_max"]))
+        return estimations
+
+    def on_fait_modifie(self, cle: str, valeur: Any) -> List[Tuple[str, float, str, int, int]]:
+        """
+        Propage la modification d'un fait et retourne le classement mis a jour.
+
+        Le fait est aussi enregistre dans la base de faits. Seules les regles
+        ayant une condition sur cette caracteristique sont reevaluees.
+
+        Args:
+            cle: La cle du fait modifie
+            valeur: La nouvelle valeur du fait
+
+        Returns:
+            Liste de tuples (nom_gamme, score_confiance, description, prix_min, prix_max)
+        """
+        self.base_faits.ajouter_fait(cle, valeur)
+        if self._version_reseau != self.base_regles.version:
+            self._construire_reseau()
+            return self.classement()
+
+        ancienne = self._faits.get(cle)
+        self._faits[cle] = valeur
+
+        modifiees = set()
+        for r, type_condition, valeurs in self._index.get(cle, ()):
+            avant = ancienne in valeurs
+            apres = valeur in valeurs
+            if avant != apres:
+                self._compteurs[type_condition][r] += 1 if apres else -1
+                modifiees.add(r)
+
+        for r in modifiees:
+            self._mettre_a_jour_regle(r)
+
+        return self.classement()
+
+    # ------------------------------------------------------------
+    # Interface MoteurInference
+    # ------------------------------------------------------------
+
+    def inferer(self, k: Optional[int] = None) -> List[Tuple[str, float, str, int, int]]:
+        """
+        Resynchronise le reseau sur la base de faits et retourne le classement.
+
+        Args:
+            k: Nombre d'estimations voulues (defaut: toutes)
+
+        Returns:
+            Liste de tuples (nom_gamme, score_confiance, description, prix_min, prix_max)
+        """
+        if self._version_reseau != self.base_regles.version:
+            self._construire_reseau()
+        else:
+            self._resynchroniser()
+        estimations = self.classement()
+        return estimations if k is None else estimations[:max(0, k)]
+
+    def modifier_seuil_confiance(self, nouveau_seuil: float) -> None:
+        """
+        Modifie le seuil minimum de confiance et recalcule les scores retenus.
+
+        Args:
+            nouveau_seuil: Nouveau seuil entre 0 et 1
+        """
+        super().modifier_seuil_confiance(nouveau_seuil)
+        if self._version_reseau == self.base_regles.version:
+            self._resynchroniser()
@@ -13,9 +13,27 @@ Ce module contient la classe MoteurInference qui implemente :
 Le moteur d'inference est le coeur du systeme expert. Il utilise
 les faits collectes (base de faits) pour evaluer les regles (base de regles)
 et determiner les estimations de prix les plus probables.
+
+L'evaluation s'appuie sur la forme compilee des regles (voir
+compilation_regles.py) fournie par BaseRegles.obtenir_instantane().
+Un cache LRU optionnel des resultats peut etre active a la construction.
+La methode evaluer(faits) est reentrante : elle ne lit pas la base de faits
+et peut etre appelee par plusieurs threads sur le meme moteur.
+
+Une instrumentation par regle (nombre d'evaluations, exclusions, rejets
+par le seuil de 50% des conditions requises, temps d'evaluation) peut etre
+activee avec activer_instrumentation() ; desactivee, elle ne coute rien.
+La methode expliquer() detaille, a la demande seulement, le calcul de
+chaque regle (voir ExplicationRegle).
 """
 
-from typing import List, Dict, Tuple, Any
+import heapq
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Dict, Tuple, Any, Iterable, Mapping, Optional, Union
+
+from compilation_regles import ExplicationRegle, RegleCompilee, compiler_regle, retirer_non_hachables
 
 
 class MoteurInference:
@@ -30,9 +48,16 @@ class MoteurInference:
         base_faits: Instance de la classe BaseFaits
         base_regles: Instance de la classe BaseRegles
         seuil_confiance (float): Seuil minimum de confiance pour retenir une estimation
+        version_seuil (int): Compteur incremente a chaque modification du seuil
+        taille_cache (int): Nombre maximal de resultats en cache (0 = cache desactive)
+        min_candidats_separation (int): En dessous de ce nombre de regles
+            candidates, inferer(k) evalue tout au lieu de separer et evaluer
     """
     
-    def __init__(self, base_faits, base_regles, seuil_confiance: float = 0.4):
+    min_candidats_separation = 32
+    
+    def __init__(self, base_faits, base_regles, seuil_confiance: float = 0.4,
+                 taille_cache: int = 0):
         """
         Initialise le moteur d'inference.
         
@@ -40,10 +65,27 @@ class MoteurInference:
             base_faits: Instance de BaseFaits contenant les specifications
             base_regles: Instance de BaseRegles contenant les regles
             seuil_confiance: Seuil minimum de confiance (defaut: 0.4)
+            taille_cache: Nombre maximal de resultats gardes en cache LRU
+                          (defaut: 0, cache desactive)
         """
         self.base_faits = base_faits
         self.base_regles = base_regles
         self.seuil_confiance = seuil_confiance
+        self.version_seuil = 0
+        
+        # Cache LRU : faits projetes -> estimations
+        self.taille_cache = taille_cache
+        self._cache: "OrderedDict[tuple, List[Tuple[str, float, str, int, int]]]" = OrderedDict()
+        self._version_cache = None
+        self._cles_cache: Tuple[str, ...] = ()
+        self._cache_succes = 0
+        self._cache_echecs = 0
+        self._cache_evictions = 0
+        self._verrou_cache = threading.Lock()
+        
+        # Instrumentation par regle (voir activer_instrumentation)
+        self._statistiques: Optional[Dict[str, Any]] = None
+        self._verrou_statistiques = threading.Lock()
     
     def verifier_condition(self, cle: str, valeurs_acceptees: Any) -> bool:
         """
@@ -57,88 +99,73 @@ class MoteurInference:
             True si la condition est satisfaite, False sinon
         """
         valeur_utilisateur = self.base_faits.obtenir_fait(cle)
-        
         if valeur_utilisateur is None:
             return False
-        
-        # Si c'est une liste de valeurs acceptees
+        # Meme semantique que compiler_valeurs, sans construire d'ensemble
         if isinstance(valeurs_acceptees, list):
             return valeur_utilisateur in valeurs_acceptees
-        # Si c'est une valeur booleenne
-        elif isinstance(valeurs_acceptees, bool):
-            return valeur_utilisateur == valeurs_acceptees
-        else:
-            return valeur_utilisateur == valeurs_acceptees
+        return valeur_utilisateur == valeurs_acceptees
     
-    def verifier_conditions_excluantes(self, regle: Dict) -> bool:
+    def verifier_conditions_excluantes(self, regle: Union[Dict, RegleCompilee]) -> bool:
         """
         Verifie si des conditions excluantes sont presentes.
         
         Args:
-            regle: La regle a evaluer
+            regle: La regle a evaluer (dictionnaire ou RegleCompilee)
             
         Returns:
             True si une condition excluante est satisfaite (regle exclue), False sinon
         """
-        conditions_excluantes = regle.get("conditions_excluantes", {})
-        
-        for cle, valeurs in conditions_excluantes.items():
-            if self.verifier_condition(cle, valeurs):
-                return True  # Une condition excluante est satisfaite
-        
-        return False  # Aucune condition excluante satisfaite
+        get = retirer_non_hachables(self.base_faits.faits).get
+        return any(get(cle) in valeurs for cle, valeurs in self._compiler(regle).excluantes)
     
-    def calculer_ratio_conditions_requises(self, regle: Dict) -> float:
+    def calculer_ratio_conditions_requises(self, regle: Union[Dict, RegleCompilee]) -> float:
         """
         Calcule le ratio de conditions requises satisfaites.
         
         Args:
-            regle: La regle a evaluer
+            regle: La regle a evaluer (dictionnaire ou RegleCompilee)
             
         Returns:
             Ratio entre 0 et 1 des conditions requises satisfaites
         """
-        conditions_requises = regle.get("conditions_requises", {})
-        
-        if not conditions_requises:
+        regle = self._compiler(regle)
+        if not regle.nb_requises:
             return 1.0  # Pas de conditions requises = toutes satisfaites
-        
-        conditions_satisfaites = 0
-        total_conditions = len(conditions_requises)
-        
-        for cle, valeurs in conditions_requises.items():
-            if self.verifier_condition(cle, valeurs):
-                conditions_satisfaites += 1
-        
-        return conditions_satisfaites / total_conditions
+        get = retirer_non_hachables(self.base_faits.faits).get
+        return sum(get(cle) in valeurs for cle, valeurs in regle.requises) / regle.nb_requises
     
-    def calculer_bonus_optionnels(self, regle: Dict) -> float:
+    def calculer_bonus_optionnels(self, regle: Union[Dict, RegleCompilee]) -> float:
         """
         Calcule le bonus de confiance pour les conditions optionnelles satisfaites.
         
         Args:
-            regle: La regle a evaluer
+            regle: La regle a evaluer (dictionnaire ou RegleCompilee)
             
         Returns:
             Bonus de confiance (entre 0 et 0.15)
         """
-        conditions_optionnelles = regle.get("conditions_optionnelles", {})
-        
-        if not conditions_optionnelles:
+        regle = self._compiler(regle)
+        if not regle.nb_optionnelles:
             return 0.0
-        
-        nb_satisfaites = 0
-        total_optionnelles = len(conditions_optionnelles)
-        
-        for cle, valeurs in conditions_optionnelles.items():
-            if self.verifier_condition(cle, valeurs):
-                nb_satisfaites += 1
-        
+        get = retirer_non_hachables(self.base_faits.faits).get
+        nb_satisfaites = sum(get(cle) in valeurs for cle, valeurs in regle.optionnelles)
         # Bonus maximum de 15%
-        bonus = (nb_satisfaites / total_optionnelles) * 0.15
-        return bonus
+        return (nb_satisfaites / regle.nb_optionnelles) * 0.15
+    
+    def _compiler(self, regle: Union[Dict, RegleCompilee]) -> RegleCompilee:
+        """
+        Retourne la forme compilee d'une regle.
+        
+        Une regle de la base est lue dans l'instantane courant ; une regle
+        qui n'en fait pas partie est compilee a la volee.
+        """
+        if isinstance(regle, RegleCompilee):
+            return regle
+        regle_compilee = self.base_regles.obtenir_instantane().compilee(regle)
+        return regle_compilee if regle_compilee is not None else compiler_regle(regle)
     
-    def evaluer_regle(self, regle: Dict) -> Tuple[bool, float]:
+    def evaluer_regle(self, regle: Union[Dict, RegleCompilee]) -> Tuple[bool, float]:
         """
         Evalue une regle par rapport aux faits de l'utilisateur.
         
@@ -147,84 +174,507 @@ class MoteurInference:
         2. Verifier les conditions requises (au moins 50% doivent etre vraies)
         3. Calculer le score de confiance avec bonus optionnels
         
+        L'evaluation se fait sur la forme compilee de la regle (celle de
+        l'instantane courant pour une regle de la base, compilee a la volee
+        sinon). Un fait non hashable ne satisfait aucune condition.
+        
         Args:
-            regle: La regle a evaluer
+            regle: La regle a evaluer (dictionnaire ou RegleCompilee)
             
         Returns:
             Tuple (correspondance, score_confiance)
             - correspondance: True si la regle s'applique
             - score_confiance: Score de confiance ajuste (0 a 1)
         """
-        # Etape 1 : Verifier les conditions excluantes
-        if self.verifier_conditions_excluantes(regle):
-            return (False, 0.0)
+        return self._compiler(regle).evaluer(retirer_non_hachables(self.base_faits.faits))
+    
+    def inferer(self, k: Optional[int] = None) -> List[Tuple[str, float, str, int, int]]:
+        """
+        Execute le moteur d'inference en chainage avant.
+        
+        Evalue les regles de la base de regles en fonction des faits
+        collectes et retourne les estimations de prix triees par ordre
+        de confiance decroissante. Seules les regles candidates fournies
+        par l'index inverse (non exclues, au moins 50% des conditions
+        requises satisfaites) sont evaluees.
+        
+        Si k est donne, seules les k premieres estimations sont calculees :
+        les regles sont parcourues par confiance maximale decroissante et le
+        parcours s'arrete des qu'aucune regle restante ne peut depasser la
+        k-ieme confiance courante. Le resultat est inferer()[:k].
         
-        # Etape 2 : Verifier les conditions requises
-        ratio_requis = self.calculer_ratio_conditions_requises(regle)
+        Args:
+            k: Nombre d'estimations voulues (defaut: toutes)
         
-        # Si moins de 50% des conditions requises sont satisfaites, rejeter
-        if ratio_requis < 0.5:
-            return (False, 0.0)
+        Returns:
+            Liste de tuples (nom_gamme, score_confiance, description, prix_min, prix_max)
+        """
+        return self.evaluer(self.base_faits.faits, k)
+    
+    def evaluer(self, faits: Mapping[str, Any],
+                k: Optional[int] = None) -> List[Tuple[str, float, str, int, int]]:
+        """
+        Evalue des faits passes en argument, sans passer par la base de faits.
+        
+        Fonction pure du point de vue de l'appelant : les faits ne sont ni
+        copies ni modifies, les regles sont lues dans l'instantane immuable
+        de la base de regles et seul l'acces au cache LRU est protege par un
+        verrou. Plusieurs threads peuvent donc appeler evaluer() en meme
+        temps sur le meme moteur.
         
-        # Etape 3 : Calculer le score de confiance
-        confiance = regle["confiance_base"]
+        Args:
+            faits: Dictionnaire (ou Mapping) des faits
+            k: Nombre d'estimations voulues (defaut: toutes)
         
-        # Ajuster selon le ratio de conditions requises satisfaites
-        # (70% de base + 30% proportionnel au ratio)
-        confiance *= (0.7 + 0.3 * ratio_requis)
+        Returns:
+            Liste de tuples (nom_gamme, score_confiance, description, prix_min, prix_max)
+        """
+        if not self.taille_cache:
+            return self._evaluer_faits(faits, k)
+        
+        with self._verrou_cache:
+            cle = self._cle_cache(faits)
+            version = self._version_cache
+            if cle is not None:
+                cle = (k, cle)
+                estimations = self._cache.get(cle)
+                if estimations is not None:
+                    self._cache.move_to_end(cle)
+                    self._cache_succes += 1
+                    return list(estimations)
+                self._cache_echecs += 1
+        
+        # L'evaluation elle-meme se fait hors du verrou
+        estimations = self._evaluer_faits(faits, k)
+        if cle is None:
+            return estimations
+        
+        with self._verrou_cache:
+            # Ne pas inserer un resultat calcule avant un changement de version
+            if self._version_cache != version:
+                return estimations
+            self._cache[cle] = tuple(estimations)
+            if len(self._cache) > self.taille_cache:
+                self._cache.popitem(last=False)
+                self._cache_evictions += 1
+        return estimations
+    
+    def evaluer_lot(self, configurations: List[Mapping[str, Any]],
+                    k: Optional[int] = None) -> List[List[Tuple[str, float, str, int, int]]]:
+        """
+        Evalue un lot de configurations en une seule passe.
         
-        # Etape 4 : Ajouter le bonus pour les conditions optionnelles
-        bonus = self.calculer_bonus_optionnels(regle)
-        confiance = min(1.0, confiance + bonus)
+        Les configurations identiques sur les caracteristiques citees par
+        les regles (cas frequent quand quelques modeles dominent les
+        demandes) ne sont evaluees qu'une fois. Le cache LRU n'est pas
+        utilise : chaque configuration distincte du lot est evaluee.
         
-        return (True, confiance)
+        Args:
+            configurations: Dictionnaires de faits
+            k: Nombre d'estimations voulues par configuration (defaut: toutes)
+            
+        Returns:
+            Pour chaque configuration, dans l'ordre, le resultat de evaluer(faits, k)
+        """
+        cles = sorted(self.base_regles.obtenir_index().cles)
+        resultats = []
+        deja_evaluees: Dict[tuple, List[Tuple[str, float, str, int, int]]] = {}
+        for faits in configurations:
+            cle = tuple(faits.get(c) for c in cles)
+            try:
+                estimations = deja_evaluees.get(cle)
+            except TypeError:  # valeur non hashable : pas de regroupement
+                resultats.append(self._evaluer_faits(faits, k))
+                continue
+            if estimations is None:
+                estimations = self._evaluer_faits(faits, k)
+                deja_evaluees[cle] = estimations
+            resultats.append(list(estimations))
+        return resultats
     
-    def inferer(self) -> List[Tuple[str, float, str, int, int]]:
+    def _evaluer_faits(self, faits: Mapping[str, Any],
+                       k: Optional[int] = None) -> List[Tuple[str, float, str, int, int]]:
         """
-        Execute le moteur d'inference en chainage avant.
+        Evalue des faits avec _evaluer_regles, meme s'ils contiennent des valeurs non hashables.
+        
+        Une valeur non hashable (une liste par exemple) ne satisfait aucune
+        condition, comme un fait absent : en cas de TypeError, les faits sont
+        evalues de nouveau sans ces valeurs. Le cas courant ne paie rien.
         
-        Evalue toutes les regles de la base de regles en fonction
-        des faits collectes et retourne les estimations de prix
-        triees par ordre de confiance decroissante.
+        Args:
+            faits: Dictionnaire des faits
+            k: Nombre d'estimations voulues (defaut: toutes)
+            
+        Returns:
+            Liste de tuples (nom_gamme, score_confiance, description, prix_min, prix_max)
+        """
+        try:
+            return self._evaluer_regles(faits, k)
+        except TypeError:
+            hachables = retirer_non_hachables(faits)
+            if hachables is faits:
+                raise
+            return self._evaluer_regles(hachables, k)
+    
+    def _evaluer_regles(self, faits: Mapping[str, Any],
+                        k: Optional[int] = None) -> List[Tuple[str, float, str, int, int]]:
+        """
+        Evalue les regles candidates pour un dictionnaire de faits (sans cache).
         
+        Args:
+            faits: Dictionnaire des faits
+            k: Nombre d'estimations voulues (defaut: toutes)
+            
         Returns:
             Liste de tuples (nom_gamme, score_confiance, description, prix_min, prix_max)
         """
+        if k is not None:
+            return self._evaluer_meilleures(faits, k)
+        
+        instantane = self.base_regles.obtenir_instantane()
+        regles = instantane.regles
+        
+        # Evaluer chaque regle candidate (compilee) de la base de regles
+        correspondances = []
+        for r in instantane.index.candidats(faits):
+            regle_compilee = regles[r]
+            correspond, confiance = regle_compilee.evaluer(faits)
+            if correspond:
+                correspondances.append((regle_compilee.regle, confiance))
+        
+        return self._construire_estimations(correspondances)
+    
+    def _evaluer_meilleures(self, faits: Mapping[str, Any], k: int,
+                            candidats: Optional[Iterable[int]] = None) -> List[Tuple[str, float, str, int, int]]:
+        """
+        Calcule les k meilleures estimations par separation et evaluation.
+        
+        Les regles candidates sont evaluees par confiance maximale
+        decroissante. Le parcours s'arrete quand la confiance maximale de
+        la regle suivante ne depasse pas le seuil, ou quand elle est
+        strictement inferieure a la k-ieme meilleure confiance de gamme :
+        aucune regle restante ne peut alors modifier le classement. Seul
+        l'ordre d'apparition des gammes ex aequo demande ensuite de verifier
+        les regles non evaluees qui les precedent dans la base.
+        
+        Args:
+            faits: Dictionnaire des faits
+            k: Nombre d'estimations voulues
+            candidats: Regles qui peuvent etre retenues (defaut: regles
+                       candidates de l'index) ; toute regle absente est ignoree
+            
+        Returns:
+            Les k premieres estimations de inferer()
+        """
+        if k <= 0:
+            return []
+        
+        instantane = self.base_regles.obtenir_instantane()
+        regles = instantane.regles
+        index = instantane.index
+        if candidats is None:
+            candidats = index.candidats(faits, trier=False)
+        else:
+            candidats = list(candidats)
+        
+        # Peu de candidats : l'evaluation complete est plus rapide
+        if len(candidats) <= self.min_candidats_separation:
+            candidats.sort()
+            correspondances = []
+            for r in candidats:
+                correspond, confiance = regles[r].evaluer(faits)
+                if correspond:
+                    correspondances.append((regles[r].regle, confiance))
+            return self._construire_estimations(correspondances)[:k]
+        
+        candidats = set(candidats)
+        seuil = self.seuil_confiance
+        
+        # Pour chaque gamme : [confiance, meilleure regle, premiere regle retenue connue]
+        gammes: Dict[str, List] = {}
+        evaluees = set()
+        kieme = -1.0
+        
+        for borne, r in index.par_borne:
+            if borne <= seuil or (len(gammes) >= k and borne < kieme):
+                break
+            if r not in candidats:
+                continue
+            
+            evaluees.add(r)
+            correspond, confiance = regles[r].evaluer(faits)
+            if not correspond or confiance <= seuil:
+                continue
+            
+            gamme = gammes.get(regles[r].nom)
+            if gamme is None:
+                gammes[regles[r].nom] = [confiance, r, r]
+            else:
+                if gamme[2] > r:
+                    gamme[2] = r
+                if confiance > gamme[0] or (confiance == gamme[0] and r < gamme[1]):
+                    gamme[0], gamme[1] = confiance, r
+                else:
+                    continue
+            
+            if len(gammes) >= k:
+                kieme = heapq.nlargest(k, (g[0] for g in gammes.values()))[-1]
+        
+        # Seules les gammes ayant au moins la k-ieme confiance peuvent etre retenues
+        retenues = [g for g in gammes.values() if len(gammes) < k or g[0] >= kieme]
+        
+        # Ex aequo : la premiere regle retenue de chaque gamme doit etre exacte
+        effectifs: Dict[float, int] = {}
+        for gamme in retenues:
+            effectifs[gamme[0]] = effectifs.get(gamme[0], 0) + 1
+        for gamme in retenues:
+            if effectifs[gamme[0]] < 2:
+                continue
+            for r in index.par_nom[regles[gamme[1]].nom]:
+                if r >= gamme[2]:
+                    break
+                if r in candidats and r not in evaluees:
+                    correspond, confiance = regles[r].evaluer(faits)
+                    if correspond and confiance > seuil:
+                        gamme[2] = r
+                        break
+        
+        retenues.sort(key=lambda g: (-g[0], g[2]))
         estimations = []
-        gammes_vues = set()  # Pour eviter les doublons
+        for confiance, r, _ in retenues[:k]:
+            regle = regles[r].regle
+            estimations.append((regle["nom"], confiance, regle["description"],
+                                regle["prix_min"], regle["prix_max"]))
+        return estimations
+    
+    def _cle_cache(self, faits: Mapping[str, Any]):
+        """
+        Calcule la cle de cache des faits, en videant le cache s'il est perime.
+        
+        Doit etre appelee avec le verrou du cache.
+        
+        La cle est le tuple des seules valeurs des caracteristiques citees
+        par au moins une regle : les autres faits n'influent pas sur le resultat.
+        
+        Args:
+            faits: Dictionnaire des faits
+            
+        Returns:
+            La cle de cache, ou None si une valeur n'est pas hashable
+        """
+        version = (self.base_regles.version, self.version_seuil)
+        if version != self._version_cache:
+            self._cache.clear()
+            self._cles_cache = tuple(sorted(self.base_regles.obtenir_index().cles))
+            self._version_cache = version
+        
+        cle = tuple(faits.get(c) for c in self._cles_cache)
+        try:
+            hash(cle)
+        except TypeError:
+            return None
+        return cle
+    
+    def statistiques_cache(self) -> Dict[str, int]:
+        """
+        Retourne les compteurs du cache de resultats.
+        
+        Returns:
+            Dictionnaire {taille, capacite, succes, echecs, evictions}
+        """
+        with self._verrou_cache:
+            return {
+                "taille": len(self._cache),
+                "capacite": self.taille_cache,
+                "succes": self._cache_succes,
+                "echecs": self._cache_echecs,
+                "evictions": self._cache_evictions,
+            }
+    
+    def vider_cache(self) -> None:
+        """Vide le cache de resultats et remet ses compteurs a zero."""
+        with self._verrou_cache:
+            self._cache.clear()
+            self._cache_succes = 0
+            self._cache_echecs = 0
+            self._cache_evictions = 0
+    
+    # ------------------------------------------------------------
+    # Instrumentation par regle
+    # ------------------------------------------------------------
+    
+    def activer_instrumentation(self, active: bool = True) -> None:
+        """
+        Active ou desactive les statistiques par regle.
+        
+        Active, l'evaluation (hors cache) passe par _evaluer_instrumente,
+        installe comme attribut de l'instance a la place de _evaluer_regles ;
+        desactivee, l'attribut est retire et le chemin normal ne fait ni
+        mesure de temps ni mise a jour de compteur. Les estimations sont
+        les memes dans les deux cas.
+        
+        Args:
+            active: True pour activer, False pour desactiver
+        """
+        if active:
+            self._evaluer_regles = self._evaluer_instrumente
+        else:
+            vars(self).pop("_evaluer_regles", None)
+    
+    def instrumentation_active(self) -> bool:
+        """Indique si les statistiques par regle sont collectees."""
+        return "_evaluer_regles" in vars(self)
+    
+    def _evaluer_instrumente(self, faits: Mapping[str, Any],
+                             k: Optional[int] = None) -> List[Tuple[str, float, str, int, int]]:
+        """
+        Evalue les regles candidates en collectant les statistiques par regle.
         
-        # Evaluer chaque regle de la base de regles
-        for regle in self.base_regles.obtenir_regles():
-            correspond, confiance = self.evaluer_regle(regle)
+        Toutes les regles candidates sont evaluees (pas de separation et
+        evaluation pour k) afin que les compteurs ne dependent pas de k.
+        
+        Args:
+            faits: Dictionnaire des faits
+            k: Nombre d'estimations voulues (defaut: toutes)
             
+        Returns:
+            Liste de tuples (nom_gamme, score_confiance, description, prix_min, prix_max)
+        """
+        instantane = self.base_regles.obtenir_instantane()
+        regles = instantane.regles
+        index = instantane.index
+        get = faits.get
+        horloge = time.perf_counter_ns
+        
+        # Conditions excluantes declenchees, par l'index inverse
+        declenchees = []
+        for cle, par_valeur in index.excluantes.items():
+            for r in par_valeur.get(get(cle), ()):
+                declenchees.append((r, cle))
+        
+        mesures = []
+        correspondances = []
+        for r in index.candidats(faits):
+            debut = horloge()
+            correspond, confiance = regles[r].evaluer(faits)
+            mesures.append((r, horloge() - debut, confiance > self.seuil_confiance))
+            if correspond:
+                correspondances.append((regles[r].regle, confiance))
+        
+        with self._verrou_statistiques:
+            statistiques = self._statistiques
+            if statistiques is None or statistiques["version"] != instantane.version:
+                statistiques = self._nouvelles_statistiques(instantane)
+            statistiques["appels"] += 1
+            evaluations, retenues, temps = (statistiques["evaluations"], statistiques["retenues"],
+                                            statistiques["temps_ns"])
+            for r, duree, retenue in mesures:
+                evaluations[r] += 1
+                temps[r] += duree
+                if retenue:
+                    retenues[r] += 1
+            exclusions, exclues = statistiques["exclusions"], statistiques["exclues"]
+            for r in {r for r, _ in declenchees}:
+                exclues[r] += 1
+            for condition in declenchees:
+                exclusions[condition] = exclusions.get(condition, 0) + 1
+        
+        estimations = self._construire_estimations(correspondances)
+        return estimations if k is None else estimations[:max(0, k)]
+    
+    def _nouvelles_statistiques(self, instantane) -> Dict[str, Any]:
+        """Cree des compteurs a zero pour une version de la base (verrou tenu)."""
+        nb_regles = len(instantane.regles)
+        self._statistiques = {
+            "version": instantane.version,
+            "instantane": instantane,
+            "appels": 0,
+            "evaluations": [0] * nb_regles,
+            "retenues": [0] * nb_regles,
+            "temps_ns": [0] * nb_regles,
+            "exclues": [0] * nb_regles,
+            "exclusions": {},
+        }
+        return self._statistiques
+    
+    def statistiques(self) -> Dict[str, Any]:
+        """
+        Retourne un instantane des statistiques par regle.
+        
+        Les compteurs portent sur les appels evalues depuis la derniere
+        remise a zero (les resultats servis par le cache ne sont pas
+        comptes) ; ils repartent de zero quand la base de regles change.
+        Une regle qui n'est ni exclue ni candidate a ete rejetee par le
+        seuil de 50% des conditions requises.
+        
+        Returns:
+            Dictionnaire {version, appels, regles} ou regles est une liste,
+            dans l'ordre de la base, de dictionnaires {indice, nom,
+            description, evaluations, retenues, exclusions,
+            exclusions_par_condition, rejets_ratio, temps_total_us,
+            temps_moyen_us}
+        """
+        with self._verrou_statistiques:
+            statistiques = self._statistiques
+            if statistiques is None:
+                return {"version": None, "appels": 0, "regles": []}
+            appels = statistiques["appels"]
+            par_condition: Dict[int, Dict[str, int]] = {}
+            for (r, cle), nombre in statistiques["exclusions"].items():
+                par_condition.setdefault(r, {})[cle] = nombre
+            
+            regles = []
+            for r, regle in enumerate(statistiques["instantane"].regles):
+                evaluations = statistiques["evaluations"][r]
+                temps_us = statistiques["temps_ns"][r] / 1e3
+                regles.append({
+                    "indice": r,
+                    "nom": regle.nom,
+                    "description": regle.regle["description"],
+                    "evaluations": evaluations,
+                    "retenues": statistiques["retenues"][r],
+                    "exclusions": statistiques["exclues"][r],
+                    "exclusions_par_condition": par_condition.get(r, {}),
+                    "rejets_ratio": appels - evaluations - statistiques["exclues"][r],
+                    "temps_total_us": round(temps_us, 3),
+                    "temps_moyen_us": round(temps_us / evaluations, 3) if evaluations else 0.0,
+                })
+            return {"version": statistiques["version"], "appels": appels, "regles": regles}
+    
+    def reinitialiser_statistiques(self) -> None:
+        """Remet les statistiques par regle a zero."""
+        with self._verrou_statistiques:
+            self._statistiques = None
+    
+    def _construire_estimations(self, correspondances) -> List[Tuple[str, float, str, int, int]]:
+        """
+        Construit la liste finale des estimations a partir des regles satisfaites.
+        
+        Args:
+            correspondances: Couples (regle, confiance) des regles satisfaites,
+                             dans l'ordre de la base de regles
+            
+        Returns:
+            Liste de tuples (nom_gamme, score_confiance, description, prix_min, prix_max)
+            triee par confiance decroissante
+        """
+        # Meilleure regle de chaque gamme ; l'ordre d'insertion du dictionnaire
+        # conserve l'ordre d'apparition des gammes pour departager les ex aequo
+        meilleures: Dict[str, Tuple[Dict, float]] = {}
+        
+        for regle, confiance in correspondances:
             # Garder seulement les estimations au-dessus du seuil de confiance
-            if correspond and confiance > self.seuil_confiance:
-                cle_gamme = regle["nom"]
-                
+            if confiance > self.seuil_confiance:
+                meilleure = meilleures.get(regle["nom"])
                 # Garder seulement la meilleure confiance pour chaque gamme
-                if cle_gamme not in gammes_vues:
-                    gammes_vues.add(cle_gamme)
-                    estimations.append((
-                        regle["nom"],
-                        confiance,
-                        regle["description"],
-                        regle["prix_min"],
-                        regle["prix_max"]
-                    ))
-                else:
-                    # Mettre a jour si meilleure confiance
-                    for i, (nom, conf, desc, pmin, pmax) in enumerate(estimations):
-                        if nom == cle_gamme and confiance > conf:
-                            estimations[i] = (
-                                regle["nom"],
-                                confiance,
-                                regle["description"],
-                                regle["prix_min"],
-                                regle["prix_max"]
-                            )
-                            break
-        
-        # Trier par confiance decroissante
+                if meilleure is None or confiance > meilleure[1]:
+                    meilleures[regle["nom"]] = (regle, confiance)
+        
+        estimations = [(regle["nom"], confiance, regle["description"],
+                        regle["prix_min"], regle["prix_max"])
+                       for regle, confiance in meilleures.values()]
+        
+        # Trier par confiance decroissante (tri stable)
         estimations.sort(key=lambda x: x[1], reverse=True)
         
         return estimations
@@ -283,6 +733,52 @@ class MoteurInference:
         print("Consultez plusieurs revendeurs pour comparer les offres.")
         print("=" * 65)
     
+    def expliquer(self, faits: Optional[Mapping[str, Any]] = None,
+                  nom: Optional[str] = None) -> List[ExplicationRegle]:
+        """
+        Explique l'evaluation de chaque regle pour des faits.
+        
+        Les explications sont construites seulement quand cette methode est
+        appelee : inferer() et evaluer() n'en gardent aucune trace.
+        Toutes les regles sont expliquees, y compris celles que l'index
+        inverse ecarte sans les evaluer.
+        
+        Args:
+            faits: Dictionnaire des faits (defaut: la base de faits)
+            nom: Nom de gamme pour n'expliquer que ses regles (defaut: toutes)
+            
+        Returns:
+            Liste des explications, dans l'ordre de la base de regles
+        """
+        if faits is None:
+            faits = self.base_faits.faits
+        instantane = self.base_regles.obtenir_instantane()
+        if nom is None:
+            regles = instantane.regles
+        else:
+            regles = [instantane.regles[r] for r in instantane.index.par_nom.get(nom, ())]
+        return [regle.expliquer(faits) for regle in regles]
+    
+    def afficher_explications(self, faits: Optional[Mapping[str, Any]] = None,
+                              nom: Optional[str] = None) -> None:
+        """
+        Affiche le detail du calcul de chaque regle (voir expliquer).
+        
+        Args:
+            faits: Dictionnaire des faits (defaut: la base de faits)
+            nom: Nom de gamme pour n'expliquer que ses regles (defaut: toutes)
+        """
+        print("\n" + "=" * 65)
+        print("    DETAIL DU RAISONNEMENT")
+        print("=" * 65)
+        print("Score = confiance de base x (0.7 + 0.3 x part des conditions requises)")
+        print("        + 0.15 x part des conditions optionnelles (maximum 1)\n")
+        for explication in self.expliquer(faits, nom):
+            for ligne in explication.formater(self.seuil_confiance):
+                print(ligne)
+            print()
+        print("=" * 65)
+    
     def obtenir_meilleure_estimation(self) -> Tuple[str, float, str, int, int]:
         """
         Retourne la meilleure estimation (celle avec la confiance la plus elevee).
@@ -291,7 +787,7 @@ class MoteurInference:
             Tuple (nom_gamme, score_confiance, description, prix_min, prix_max)
             ou None si aucune estimation
         """
-        estimations = self.inferer()
+        estimations = self.inferer(k=1)
         
         if estimations:
             return estimations[0]
@@ -306,6 +802,7 @@ class MoteurInference:
         """
         if 0 <= nouveau_seuil <= 1:
             self.seuil_confiance = nouveau_seuil
+            self.version_seuil += 1  # Invalide le cache de resultats
             print(f"[OK] Seuil de confiance modifie a {nouveau_seuil * 100:.0f}%")
         else:
             print("[!] Le seuil doit etre entre 0 et 1.")
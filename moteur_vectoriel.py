@@ -0,0 +1,470 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Moteur d'Inference Vectoriel - Systeme Expert Prix PC Portable
+===============================================================
+
+Ce module contient la classe MoteurVectoriel qui evalue les regles sur un
+lot de configurations a la fois avec NumPy (dependance optionnelle).
+
+Codage des configurations
+-------------------------
+Un lot est une matrice d'entiers (N x A) : une ligne par configuration,
+une colonne par caracteristique dans l'ordre de BaseFaits.obtenir_attributs()
+(les 11 caracteristiques a choix multiples puis les 6 options booleennes).
+Chaque case contient l'indice de la valeur dans la liste options_* de la
+caracteristique (0 = False, 1 = True pour une option booleenne). Tout code
+hors de [0, nb_options[ (par exemple -1 ou 255) signifie "fait absent".
+
+Calcul
+------
+Pour chaque caracteristique, une table (nb_options + 1) x R indique si la
+valeur satisfait la condition excluante / requise / optionnelle de chaque
+regle. Une indexation par la colonne de codes donne les conditions satisfaites
+de toutes les lignes pour toutes les regles ; la suite reprend exactement la
+formule de MoteurInference.evaluer_regle :
+    confiance = min(1.0, confiance_base * (0.7 + 0.3 * ratio) + bonus)
+avec rejet si une exclusion est satisfaite ou si ratio < 0.5.
+
+Fichiers memoire (scorer_fichier)
+---------------------------------
+Pour les gros catalogues, l'entree est un fichier .npy de codes uint8
+(N x A, meme ordre de colonnes, 255 = fait absent) ouvert en memoire
+projetee, et la sortie un fichier .npy de N enregistrements DTYPE_RESULTATS :
+    gamme      int16    indice dans noms_gammes() de la meilleure gamme (-1 si aucune)
+    confiance  float32  confiance de cette gamme (0 si aucune)
+    prix_min   int32    prix minimum de la regle retenue (0 si aucune)
+    prix_max   int32    prix maximum de la regle retenue (0 si aucune)
+Les deux fichiers sont traites par paquets de lignes, sans dictionnaire
+Python par ligne : le cache de pages du systeme peut les partager entre
+plusieurs processus. Les tableaux intermediaires d'un bloc (lignes x
+regles) sont bornes par octets_bloc, quelle que soit la taille de la base.
+
+Base chargee d'un instantane binaire (instantane_binaire.py) : les tables
+de conditions, confiances, prix et gammes sont des vues NumPy sur le
+fichier projete, sans regle compilee ni copie ; un code est traduit en
+ligne de la table (numero de bit de la valeur) avant l'indexation.
+"""
+
+import marshal
+import sys
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # NumPy est optionnel pour le reste du systeme
+    np = None
+
+from moteur_inference import MoteurInference
+
+
+# Code d'un fait absent dans un fichier de codes uint8
+CODE_ABSENT = 255
+
+# Memoire de travail de _scorer_bloc par case (ligne, regle), temporaires compris
+OCTETS_PAR_CASE = 64
+
+# Enregistrement de sortie de scorer_fichier
+DTYPE_RESULTATS = None if np is None else np.dtype([
+    ("gamme", np.int16),
+    ("confiance", np.float32),
+    ("prix_min", np.int32),
+    ("prix_max", np.int32),
+])
+
+
+class MoteurVectoriel(MoteurInference):
+    """
+    Moteur d'inference par lots, vectorise avec NumPy.
+
+    L'inference unitaire (inferer) est celle de MoteurInference ; les
+    methodes *_lot traitent une matrice de configurations codees.
+
+    Attributes:
+        attributs (List[str]): Ordre des colonnes de la matrice de codes
+        octets_bloc (int): Memoire de travail maximale d'un bloc de lignes
+    """
+
+    def __init__(self, base_faits, base_regles, seuil_confiance: float = 0.4,
+                 octets_bloc: int = 64 * 1024 * 1024):
+        """
+        Initialise le moteur vectoriel.
+
+        Args:
+            base_faits: Instance de BaseFaits (source des options)
+            base_regles: Instance de BaseRegles contenant les regles
+            seuil_confiance: Seuil minimum de confiance (defaut: 0.4)
+            octets_bloc: Memoire de travail maximale d'un bloc de lignes
+                         (defaut: 64 Mo)
+
+        Raises:
+            ImportError: Si NumPy n'est pas installe
+        """
+        if np is None:
+            raise ImportError("NumPy est requis pour MoteurVectoriel (pip install numpy)")
+        super().__init__(base_faits, base_regles, seuil_confiance)
+        self.attributs: List[str] = base_faits.obtenir_attributs()
+        self.octets_bloc = octets_bloc
+        self._tables = None
+        self._version_tables = -1
+
+    # ------------------------------------------------------------
+    # Codage des configurations
+    # ------------------------------------------------------------
+
+    def encoder_faits(self, faits: Mapping[str, Any]) -> List[int]:
+        """
+        Encode un dictionnaire de faits en ligne de codes.
+
+        Args:
+            faits: Dictionnaire des faits
+
+        Returns:
+            Liste des codes dans l'ordre des attributs (-1 si absent ou inconnu)
+        """
+        ligne = []
+        for cle in self.attributs:
+            options = self.base_faits.obtenir_options(cle)
+            valeur = faits.get(cle)
+            ligne.append(options.index(valeur) if valeur is not None and valeur in options else -1)
+        return ligne
+
+    def encoder_lot(self, configurations: Iterable[Mapping[str, Any]]):
+        """
+        Encode une suite de dictionnaires de faits en matrice de codes.
+
+        Args:
+            configurations: Dictionnaires de faits
+
+        Returns:
+            Matrice numpy int16 (N x nb_attributs)
+        """
+        lignes = [self.encoder_faits(faits) for faits in configurations]
+        return np.array(lignes, dtype=np.int16).reshape(len(lignes), len(self.attributs))
+
+    # ------------------------------------------------------------
+    # Tables de conditions
+    # ------------------------------------------------------------
+
+    def _construire_tables(self) -> Dict[str, Any]:
+        """Construit les tables de conditions pour la base de regles courante."""
+        instantane = self.base_regles.obtenir_instantane()
+        if instantane.binaire is not None and sys.byteorder == "little":
+            return self._tables_instantane(instantane)
+        regles = instantane.regles
+        nb_regles = len(regles)
+
+        colonnes = []
+        for j, cle in enumerate(self.attributs):
+            options = self.base_faits.obtenir_options(cle)
+            # Derniere ligne = fait absent : ne satisfait aucune condition
+            tables = {
+                "excluantes": np.zeros((len(options) + 1, nb_regles), dtype=bool),
+                "requises": np.zeros((len(options) + 1, nb_regles), dtype=bool),
+                "optionnelles": np.zeros((len(options) + 1, nb_regles), dtype=bool),
+            }
+            utilisee = False
+            for r, regle in enumerate(regles):
+                for type_condition, table in tables.items():
+                    for cle_condition, valeurs in getattr(regle, type_condition):
+                        if cle_condition != cle:
+                            continue
+                        utilisee = True
+                        for i, option in enumerate(options):
+                            if option in valeurs:
+                                table[i, r] = True
+            if utilisee:
+                colonnes.append((j, len(options), None, tables["excluantes"],
+                                 tables["requises"], tables["optionnelles"]))
+
+        # Regroupement des regles par gamme, dans l'ordre de premiere apparition
+        gammes: Dict[str, List[int]] = {}
+        for r, regle in enumerate(regles):
+            gammes.setdefault(regle.nom, []).append(r)
+
+        noms_gammes = list(gammes)
+        indices_gammes = {nom: g for g, nom in enumerate(noms_gammes)}
+
+        return {
+            "instantane": instantane,
+            "nb_regles": nb_regles,
+            "colonnes": colonnes,
+            "noms_gammes": noms_gammes,
+            "gamme_regle": np.array([indices_gammes[r.nom] for r in regles], dtype=np.int16),
+            "prix_min": np.array([r.regle["prix_min"] for r in regles], dtype=np.int32),
+            "prix_max": np.array([r.regle["prix_max"] for r in regles], dtype=np.int32),
+            "confiance_base": np.array([r.confiance_base for r in regles], dtype=np.float64),
+            "nb_requises": np.array([r.nb_requises for r in regles], dtype=np.int64),
+            "nb_optionnelles": np.array([r.nb_optionnelles for r in regles], dtype=np.int64),
+            "gammes": [np.array(membres, dtype=np.int64) for membres in gammes.values()],
+        }
+
+    def _tables_instantane(self, instantane) -> Dict[str, Any]:
+        """Construit les tables d'une base chargee d'un instantane binaire, en vues sur le fichier."""
+        binaire = instantane.binaire
+        nb_regles = len(binaire.sections["conf"]) // 8
+        positions = instantane.tables_bitmask.positions
+        nb_bits = instantane.tables_bitmask._nb_bits
+        # (type, bit, regle) ; la ligne nb_bits est celle du fait absent
+        tab_cond = binaire.tableau_numpy("tab_cond", "?", (3, nb_bits + 1, nb_regles))
+
+        colonnes = []
+        for j, cle in enumerate(self.attributs):
+            options = self.base_faits.obtenir_options(cle)
+            table = positions.get(cle, {})
+            lignes = np.array([table[option].bit_length() - 1 if option in table else nb_bits
+                               for option in options] + [nb_bits], dtype=np.int64)
+            if tab_cond[:, lignes[:-1], :].any():
+                colonnes.append((j, len(options), lignes, tab_cond[0], tab_cond[1], tab_cond[2]))
+
+        gamme_regle = binaire.tableau_numpy("gamme", "<u4")
+        noms_gammes = marshal.loads(binaire.sections["gammes"])
+        prix = binaire.tableau_numpy("prix", "<i4", (nb_regles, 2))
+        nb_conditions = binaire.tableau_numpy("nb_cond", "<u4", (nb_regles, 2))
+        return {
+            "instantane": instantane,
+            "nb_regles": nb_regles,
+            "colonnes": colonnes,
+            "noms_gammes": noms_gammes,
+            "gamme_regle": gamme_regle,
+            "prix_min": prix[:, 0],
+            "prix_max": prix[:, 1],
+            "confiance_base": binaire.tableau_numpy("conf", "<f8"),
+            "nb_requises": nb_conditions[:, 0],
+            "nb_optionnelles": nb_conditions[:, 1],
+            "gammes": [np.flatnonzero(gamme_regle == g) for g in range(len(noms_gammes))],
+        }
+
+    def obtenir_tables(self) -> Dict[str, Any]:
+        """
+        Retourne les tables de conditions a jour avec la base de regles.
+
+        Returns:
+            Dictionnaire des tables du lot
+        """
+        if self._tables is None or self._version_tables != self.base_regles.version:
+            # Version lue avant la compilation : une modification concurrente
+            # provoquera une nouvelle construction
+            version = self.base_regles.version
+            self._tables = self._construire_tables()
+            self._version_tables = version
+        return self._tables
+
+    def noms_gammes(self) -> List[str]:
+        """
+        Retourne les noms des gammes, dans l'ordre de premiere apparition.
+
+        Returns:
+            Liste des noms ; la colonne "gamme" de scorer_fichier y est un indice
+        """
+        return list(self.obtenir_tables()["noms_gammes"])
+
+    # ------------------------------------------------------------
+    # Inference par lots
+    # ------------------------------------------------------------
+
+    def _scorer_bloc(self, codes, tables, k: int):
+        """Calcule les k meilleures gammes pour un bloc de lignes."""
+        nb_lignes = codes.shape[0]
+        nb_regles = tables["nb_regles"]
+
+        # Au plus une condition de chaque type par caracteristique : int16 suffit
+        exclue = np.zeros((nb_lignes, nb_regles), dtype=bool)
+        nb_requises = np.zeros((nb_lignes, nb_regles), dtype=np.int16)
+        nb_optionnelles = np.zeros((nb_lignes, nb_regles), dtype=np.int16)
+
+        for j, nb_options, lignes, excluantes, requises, optionnelles in tables["colonnes"]:
+            colonne = codes[:, j].astype(np.int64)
+            # Codes hors plage -> ligne "fait absent"
+            colonne = np.where((colonne >= 0) & (colonne < nb_options), colonne, nb_options)
+            if lignes is not None:
+                # Tables d'un instantane binaire : une ligne par bit
+                colonne = lignes[colonne]
+            exclue |= excluantes[colonne]
+            nb_requises += requises[colonne]
+            nb_optionnelles += optionnelles[colonne]
+
+        # Ratio des conditions requises (1.0 si la regle n'en a aucune)
+        total_requises = tables["nb_requises"]
+        ratio = np.divide(nb_requises, np.maximum(total_requises, 1))
+        ratio = np.where(total_requises > 0, ratio, 1.0)
+
+        confiance = tables["confiance_base"] * (0.7 + 0.3 * ratio)
+
+        # Bonus optionnel (maximum 15%)
+        total_optionnelles = tables["nb_optionnelles"]
+        bonus = np.divide(nb_optionnelles, np.maximum(total_optionnelles, 1)) * 0.15
+        bonus = np.where(total_optionnelles > 0, bonus, 0.0)
+        confiance = np.minimum(1.0, confiance + bonus)
+
+        retenue = ~exclue & (ratio >= 0.5) & (confiance > self.seuil_confiance)
+        scores = np.where(retenue, confiance, -np.inf)
+
+        # Meilleure regle de chaque gamme (la premiere en cas d'egalite) et
+        # indice de la premiere regle retenue, qui departage les ex aequo
+        nb_gammes = len(tables["gammes"])
+        lignes = np.arange(nb_lignes)
+        meilleur_score = np.empty((nb_lignes, nb_gammes), dtype=np.float64)
+        meilleure_regle = np.empty((nb_lignes, nb_gammes), dtype=np.int64)
+        premiere = np.empty((nb_lignes, nb_gammes), dtype=np.int64)
+        for g, membres in enumerate(tables["gammes"]):
+            scores_gamme = scores[:, membres]
+            j = np.argmax(scores_gamme, axis=1)
+            meilleur_score[:, g] = scores_gamme[lignes, j]
+            meilleure_regle[:, g] = membres[j]
+            retenues_gamme = retenue[:, membres]
+            premiere[:, g] = np.where(retenues_gamme.any(axis=1),
+                                      membres[np.argmax(retenues_gamme, axis=1)],
+                                      nb_regles)
+
+        # Tri par confiance decroissante puis par ordre d'apparition
+        ordre = np.lexsort((premiere, -meilleur_score), axis=1)[:, :k]
+        scores_k = np.take_along_axis(meilleur_score, ordre, axis=1)
+        regles_k = np.take_along_axis(meilleure_regle, ordre, axis=1)
+        valide = np.isfinite(scores_k)
+        return np.where(valide, regles_k, -1), np.where(valide, scores_k, 0.0)
+
+    def scorer_lot(self, codes, k: int = 3):
+        """
+        Calcule les k meilleures estimations de chaque ligne d'une matrice de codes.
+
+        Args:
+            codes: Matrice d'entiers (N x nb_attributs), voir l'en-tete du module
+            k: Nombre d'estimations conservees par ligne
+
+        Returns:
+            Tuple (indices_regles, confiances) de deux matrices (N x k) :
+            indice dans base_regles.obtenir_regles() de la meilleure regle de
+            chaque gamme retenue (-1 si aucune) et confiance associee (0.0 si aucune)
+        """
+        return self._scorer(self._verifier_codes(codes), self.obtenir_tables(), k)
+
+    def _verifier_codes(self, codes):
+        """Convertit une matrice de codes en tableau numpy et verifie sa forme."""
+        codes = np.asarray(codes)
+        if codes.ndim != 2 or codes.shape[1] != len(self.attributs):
+            raise ValueError(f"Matrice de codes attendue de forme (N, {len(self.attributs)})")
+        return codes
+
+    def _scorer(self, codes, tables, k: int):
+        """Calcule les k meilleures gammes par blocs de lignes, avec les tables donnees."""
+        nb_lignes = codes.shape[0]
+        k = max(0, min(k, len(tables["gammes"])))
+        indices = np.full((nb_lignes, k), -1, dtype=np.int64)
+        confiances = np.zeros((nb_lignes, k), dtype=np.float64)
+        if nb_lignes == 0 or k == 0:
+            return indices, confiances
+
+        pas = max(1, self.octets_bloc // (OCTETS_PAR_CASE * max(1, tables["nb_regles"])))
+        for debut in range(0, nb_lignes, pas):
+            fin = min(debut + pas, nb_lignes)
+            indices[debut:fin], confiances[debut:fin] = self._scorer_bloc(codes[debut:fin], tables, k)
+        return indices, confiances
+
+    def inferer_lot(self, codes, k: int = 3) -> List[List[Tuple[str, float, str, int, int]]]:
+        """
+        Execute l'inference sur un lot de configurations codees.
+
+        Args:
+            codes: Matrice d'entiers (N x nb_attributs), voir l'en-tete du module
+            k: Nombre d'estimations conservees par ligne
+
+        Returns:
+            Pour chaque ligne, les k premieres estimations qu'aurait donne
+            inferer() : tuples (nom_gamme, score_confiance, description, prix_min, prix_max)
+        """
+        return self._inferer(codes, self.obtenir_tables(), k)
+
+    def _inferer(self, codes, tables, k: int) -> List[List[Tuple[str, float, str, int, int]]]:
+        """Construit les estimations de inferer_lot avec les tables donnees."""
+        indices, confiances = self._scorer(self._verifier_codes(codes), tables, k)
+        instantane = tables["instantane"]
+        # Instantane binaire : regles relues sans les compiler
+        regles = (instantane.binaire.dictionnaires() if instantane.binaire is not None
+                  else [regle.regle for regle in instantane.regles])
+
+        resultats = []
+        for ligne_indices, ligne_confiances in zip(indices.tolist(), confiances.tolist()):
+            estimations = []
+            for r, confiance in zip(ligne_indices, ligne_confiances):
+                if r < 0:
+                    break
+                regle = regles[r]
+                estimations.append((regle["nom"], confiance, regle["description"],
+                                    regle["prix_min"], regle["prix_max"]))
+            resultats.append(estimations)
+        return resultats
+
+    def evaluer_lot(self, configurations: List[Mapping[str, Any]],
+                    k: Optional[int] = None) -> List[List[Tuple[str, float, str, int, int]]]:
+        """
+        Evalue un lot de dictionnaires de faits en un seul calcul matriciel.
+
+        Args:
+            configurations: Dictionnaires de faits (valeurs connues de la base de faits)
+            k: Nombre d'estimations voulues par configuration (defaut: toutes)
+
+        Returns:
+            Pour chaque configuration, dans l'ordre, le resultat de evaluer(faits, k)
+        """
+        if not configurations:
+            return []
+        tables = self.obtenir_tables()
+        if k is None:
+            k = len(tables["gammes"])
+        return self._inferer(self.encoder_lot(configurations), tables, k)
+
+    def scorer_fichier(self, chemin_entree: str, chemin_sortie: str,
+                       taille_paquet: int = 1 << 16) -> int:
+        """
+        Calcule la meilleure estimation de chaque ligne d'un fichier de codes.
+
+        Le fichier d'entree est ouvert en memoire projetee (lecture seule)
+        et le fichier de sortie cree en memoire projetee, puis rempli par
+        paquets de lignes (voir l'en-tete du module pour les formats).
+
+        Args:
+            chemin_entree: Fichier .npy de codes uint8 (N x nb_attributs)
+            chemin_sortie: Fichier .npy cree, de N enregistrements DTYPE_RESULTATS
+            taille_paquet: Nombre de lignes traitees a la fois
+
+        Returns:
+            Le nombre de lignes traitees
+
+        Raises:
+            ValueError: Si le fichier d'entree n'a pas le type ou la forme attendus
+        """
+        codes = np.load(chemin_entree, mmap_mode="r")
+        if codes.dtype != np.uint8:
+            raise ValueError(f"Codes uint8 attendus, {codes.dtype} lus dans {chemin_entree}")
+        if codes.ndim != 2 or codes.shape[1] != len(self.attributs):
+            raise ValueError(f"Matrice de codes attendue de forme (N, {len(self.attributs)})")
+
+        tables = self.obtenir_tables()
+        nb_lignes = codes.shape[0]
+        sortie = np.lib.format.open_memmap(chemin_sortie, mode="w+",
+                                           dtype=DTYPE_RESULTATS, shape=(nb_lignes,))
+
+        for debut in range(0, nb_lignes, max(1, taille_paquet)):
+            fin = min(debut + taille_paquet, nb_lignes)
+            # Memes tables pour tout le fichier, meme si la base est rechargee entre-temps
+            indices, confiances = self._scorer(codes[debut:fin], tables, 1)
+            paquet = sortie[debut:fin]
+            if indices.shape[1] == 0:  # Base de regles vide
+                paquet["gamme"] = -1
+                paquet["confiance"] = 0.0
+                paquet["prix_min"] = 0
+                paquet["prix_max"] = 0
+                continue
+
+            regles = indices[:, 0]
+            trouvee = regles >= 0
+            regles = np.where(trouvee, regles, 0)
+            paquet["gamme"] = np.where(trouvee, tables["gamme_regle"][regles], -1)
+            paquet["confiance"] = confiances[:, 0]
+            paquet["prix_min"] = np.where(trouvee, tables["prix_min"][regles], 0)
+            paquet["prix_max"] = np.where(trouvee, tables["prix_max"][regles], 0)
+
+        sortie.flush()
+        del sortie
+        return nb_lignes
@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Questionnaire Asynchrone - Systeme Expert Prix PC Portable
+===========================================================
+
+Ce module pose le questionnaire de base_faits.py (QUESTIONS) sans bloquer
+sur input(), quelle que soit la facon dont les reponses arrivent. Une
+source de questions (SourceQuestions) pose une question et rend la
+reponse brute ; la coroutine questionner() applique les regles de
+validation de base_faits.py (lire_reponse_choix, lire_reponse_oui_non) et
+repose la question tant que la reponse est invalide. Une session ne
+bloque donc aucun thread pendant qu'elle attend une reponse : une seule
+boucle asyncio fait avancer des milliers de sessions (discussion web,
+telnet, banc de test). Le mode interactif du terminal reste synchrone
+(BaseFaits.collecter_faits).
+
+Sources fournies :
+- SourceFlux : flux asyncio (socket TCP ou Unix, telnet), une reponse par ligne
+- SourceScriptee : reponses donnees a l'avance (tests, charge)
+- SourceSuivie : enveloppe une autre source et rattache la session a un
+  GestionnaireSessions (gestion_sessions.py) : activite, eviction, expiration
+
+servir_questionnaire() pose le questionnaire a chaque connexion d'une
+socket TCP locale, puis envoie les estimations calculees par un
+ServiceEstimation (les sessions qui se terminent ensemble partagent un lot).
+Avec un GestionnaireSessions, les faits de chaque connexion sont gardes
+sous forme compacte et la memoire des sessions vivantes est bornee ; les
+sessions sans reponse depuis plus de delai_reponse (client bloque en
+ecriture, par exemple) expirent meme sous le budget. En
+mode adaptatif (questionnaire_adaptatif.py), seules les questions utiles
+sont posees.
+
+Usage:
+    $ python main.py questionnaire --port 8023
+    $ telnet localhost 8023
+"""
+
+import asyncio
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from base_faits import QUESTIONS, BaseFaits, lire_reponse_choix, lire_reponse_oui_non
+from questionnaire_adaptatif import QuestionsAdaptatives
+from service_estimation import ErreurRequete
+
+
+# Connexions en attente d'acceptation (le defaut d'asyncio, 100, sature quand
+# des centaines d'utilisateurs se connectent en meme temps)
+CONNEXIONS_EN_ATTENTE = 4096
+
+
+class SourceQuestions(ABC):
+    """
+    Source des reponses d'une session de questionnaire.
+
+    Les sous-classes implementent poser() et signaler().
+    """
+
+    __slots__ = ()
+
+    @abstractmethod
+    async def poser(self, question: str, options: Optional[Sequence[str]],
+                    repetition: bool = False) -> str:
+        """
+        Pose une question et attend la reponse.
+
+        Args:
+            question: Texte de la question
+            options: Options numerotees a partir de 1 (None : question oui/non)
+            repetition: True si la question vient d'etre posee et la reponse refusee
+                        (la source peut se contenter de reafficher l'invite)
+
+        Returns:
+            La reponse brute (validee ensuite par questionner)
+
+        Raises:
+            EOFError: La session est terminee (deconnexion, delai depasse...)
+        """
+
+    @abstractmethod
+    async def signaler(self, message: str) -> None:
+        """
+        Transmet un message a l'utilisateur (reponse invalide, resultat...).
+
+        Args:
+            message: Texte du message
+        """
+
+
+async def questionner(source: SourceQuestions, base_faits: BaseFaits,
+                      faits: Optional[Dict[str, Any]] = None,
+                      questions: Iterable[Tuple[str, str]] = QUESTIONS) -> Dict[str, Any]:
+    """
+    Pose le questionnaire a une source et collecte les faits.
+
+    Args:
+        source: Source des reponses
+        base_faits: Base de faits (options de chaque caracteristique)
+        faits: Dictionnaire a completer (defaut: nouveau dictionnaire)
+        questions: Questions posees, dans l'ordre (defaut: QUESTIONS)
+
+    Returns:
+        Le dictionnaire des faits
+
+    Raises:
+        EOFError: La source a termine la session avant la fin
+    """
+    if faits is None:
+        faits = {}
+    booleennes = base_faits.options_booleennes
+    for cle, question in questions:
+        options = None if cle in booleennes else base_faits.obtenir_options(cle)
+        repetition = False
+        while True:
+            reponse = await source.poser(question, options, repetition)
+            try:
+                faits[cle] = (lire_reponse_oui_non(reponse) if options is None
+                              else lire_reponse_choix(reponse, options))
+                break
+            except ValueError as erreur:
+                await source.signaler(f"[!] {erreur}")
+                repetition = True
+    return faits
+
+
+def formater_estimations(estimations: List[Tuple[str, float, str, int, int]]) -> List[str]:
+    """
+    Formate des estimations en lignes de texte.
+
+    Args:
+        estimations: Tuples (nom_gamme, score_confiance, description, prix_min, prix_max)
+
+    Returns:
+        Une ligne par estimation
+    """
+    if not estimations:
+        return ["[!] Aucune estimation au-dessus du seuil de confiance"]
+    lignes = []
+    for rang, (nom, confiance, _, prix_min, prix_max) in enumerate(estimations, 1):
+        prix = f"> {prix_min} euros" if prix_max >= 10000 else f"{prix_min} - {prix_max} euros"
+        lignes.append(f"  {rang}. {nom} ({prix}) - Confiance: {confiance * 100:.0f}%")
+    return lignes
+
+
+# ============================================================
+# SOURCES
+# ============================================================
+
+class SourceFlux(SourceQuestions):
+    """
+    Questions posees sur un flux asyncio (socket TCP ou Unix, telnet) :
+    texte de la question puis invite, une reponse par ligne.
+
+    Attributes:
+        delai (float): Attente maximale d'une reponse en secondes (None = illimitee)
+    """
+
+    __slots__ = ("lecteur", "ecrivain", "delai")
+
+    def __init__(self, lecteur: asyncio.StreamReader, ecrivain: asyncio.StreamWriter,
+                 delai: Optional[float] = None):
+        """
+        Args:
+            lecteur: Flux des reponses
+            ecrivain: Flux des questions
+            delai: Attente maximale d'une reponse en secondes (defaut: illimitee)
+        """
+        self.lecteur = lecteur
+        self.ecrivain = ecrivain
+        self.delai = delai
+
+    async def poser(self, question: str, options: Optional[Sequence[str]],
+                    repetition: bool = False) -> str:
+        if options is None:
+            texte = f"{question} (oui/non) : "
+        elif repetition:
+            texte = "Votre choix (numero) : "
+        else:
+            texte = "\r\n".join([f"\r\n{question}"] + [f"  {i}. {option}" for i, option in enumerate(options, 1)]
+                                + ["Votre choix (numero) : "])
+        self.ecrivain.write(texte.encode("utf-8"))
+        try:
+            await self.ecrivain.drain()
+            ligne = await asyncio.wait_for(self.lecteur.readline(), self.delai)
+        except asyncio.TimeoutError:
+            raise EOFError("Delai de reponse depasse") from None
+        except (ConnectionError, ValueError) as erreur:  # deconnexion ou ligne trop longue
+            raise EOFError(str(erreur)) from None
+        if not ligne:
+            raise EOFError("Connexion fermee")
+        return ligne.decode("utf-8", "replace")
+
+    async def signaler(self, message: str) -> None:
+        self.ecrivain.write(f"{message}\r\n".encode("utf-8"))
+
+
+class SourceScriptee(SourceQuestions):
+    """
+    Reponses donnees a l'avance (tests, banc de charge).
+
+    Attributes:
+        delai (float): Temps de reflexion simule avant chaque reponse (secondes)
+        nb_questions (int): Questions posees (reposees comprises)
+        nb_signalements (int): Messages recus (reponses invalides...)
+    """
+
+    __slots__ = ("_reponses", "delai", "nb_questions", "nb_signalements")
+
+    def __init__(self, reponses: Iterable[str], delai: float = 0.0):
+        """
+        Args:
+            reponses: Reponses brutes, dans l'ordre des questions posees
+            delai: Temps de reflexion simule avant chaque reponse, en secondes
+        """
+        self._reponses = iter(reponses)
+        self.delai = delai
+        self.nb_questions = 0
+        self.nb_signalements = 0
+
+    async def poser(self, question: str, options: Optional[Sequence[str]],
+                    repetition: bool = False) -> str:
+        self.nb_questions += 1
+        await asyncio.sleep(self.delai)
+        try:
+            return next(self._reponses)
+        except StopIteration:
+            raise EOFError("Plus de reponses") from None
+
+    async def signaler(self, message: str) -> None:
+        self.nb_signalements += 1
+
+
+class SourceSuivie(SourceQuestions):
+    """
+    Source dont la session est suivie par un GestionnaireSessions.
+
+    Chaque reponse marque la session active ; si le gestionnaire l'a
+    evincee entre-temps, la session se termine (EOFError) avant que la
+    reponse ne soit enregistree dans des faits deja recycles.
+    """
+
+    __slots__ = ("source", "gestionnaire", "identifiant")
+
+    def __init__(self, source: SourceQuestions, gestionnaire, identifiant: int):
+        """
+        Args:
+            source: Source des reponses
+            gestionnaire: GestionnaireSessions de la session
+            identifiant: Identifiant de la session
+        """
+        self.source = source
+        self.gestionnaire = gestionnaire
+        self.identifiant = identifiant
+
+    async def poser(self, question: str, options: Optional[Sequence[str]],
+                    repetition: bool = False) -> str:
+        reponse = await self.source.poser(question, options, repetition)
+        try:
+            self.gestionnaire.obtenir(self.identifiant)
+        except KeyError:
+            await self.source.signaler("[!] Session expiree, reconnectez-vous.")
+            raise EOFError("Session expiree") from None
+        return reponse
+
+    async def signaler(self, message: str) -> None:
+        await self.source.signaler(message)
+
+
+def reponses_pour(base_faits: BaseFaits, faits: Dict[str, Any],
+                  questions: Iterable[Tuple[str, str]] = QUESTIONS) -> List[str]:
+    """
+    Retourne les reponses brutes qui menent a des faits donnes.
+
+    Args:
+        base_faits: Base de faits (options de chaque caracteristique)
+        faits: Faits voulus (chaque question doit avoir sa reponse)
+        questions: Questions posees, dans l'ordre (defaut: QUESTIONS)
+
+    Returns:
+        Numeros d'options et "oui"/"non", dans l'ordre des questions
+    """
+    reponses = []
+    for cle, _ in questions:
+        valeur = faits[cle]
+        if isinstance(valeur, bool):
+            reponses.append("oui" if valeur else "non")
+        else:
+            reponses.append(str(base_faits.obtenir_options(cle).index(valeur) + 1))
+    return reponses
+
+
+# ============================================================
+# SERVEUR DE QUESTIONNAIRES
+# ============================================================
+
+async def servir_questionnaire(service, hote: str = "127.0.0.1", port: int = 8023,
+                               delai_reponse: Optional[float] = 600.0,
+                               gestionnaire=None, adaptatif: bool = False) -> None:
+    """
+    Pose le questionnaire a chaque connexion TCP, puis envoie les estimations.
+
+    Args:
+        service: ServiceEstimation (moteur et regroupement des estimations)
+        hote: Adresse d'ecoute (defaut: 127.0.0.1, local uniquement)
+        port: Port d'ecoute (defaut: 8023)
+        delai_reponse: Attente maximale d'une reponse avant de fermer la session
+                       (secondes, defaut: 600)
+        gestionnaire: GestionnaireSessions des connexions (defaut: aucun,
+                      un dictionnaire de faits par connexion) ; ses sessions
+                      inactives depuis plus de delai_reponse sont expirees
+        adaptatif: Ne poser que les questions utiles, la plus utile d'abord
+                   (defaut: False, toutes les questions dans l'ordre)
+    """
+    base_faits = service.moteur.base_faits
+    
+    def questions_pour(faits):
+        return QuestionsAdaptatives(service.moteur, faits) if adaptatif else QUESTIONS
+
+    async def session(lecteur: asyncio.StreamReader, ecrivain: asyncio.StreamWriter) -> None:
+        source = SourceFlux(lecteur, ecrivain, delai_reponse)
+        identifiant = None
+        try:
+            await source.signaler("=== SYSTEME EXPERT - ESTIMATION PRIX PC PORTABLE ===")
+            if gestionnaire is None:
+                faits = {}
+                await questionner(source, base_faits, faits, questions_pour(faits))
+            else:
+                session_faits = gestionnaire.ouvrir()
+                identifiant = session_faits.identifiant
+                suivie = SourceSuivie(source, gestionnaire, identifiant)
+                await questionner(suivie, base_faits, session_faits.faits, questions_pour(session_faits.faits))
+                faits = session_faits.faits.en_dict()
+                gestionnaire.fermer(identifiant)
+                identifiant = None
+            await source.signaler("\r\n=== ESTIMATION DE PRIX ===")
+            for ligne in formater_estimations(await service.estimer(faits, 3)):
+                await source.signaler(ligne)
+            await ecrivain.drain()
+        except ErreurRequete as erreur:  # service sature
+            await source.signaler(f"[!] {erreur.message}")
+        except (EOFError, ConnectionError):
+            pass
+        finally:
+            if identifiant is not None:
+                gestionnaire.fermer(identifiant)
+            ecrivain.close()
+
+    async def expirer() -> None:
+        # Verifie deux fois par delai : une session vit au plus 1.5 delai sans reponse
+        while True:
+            await asyncio.sleep(delai_reponse / 2)
+            gestionnaire.expirer(delai_reponse)
+
+    service.demarrer()
+    expiration = None
+    if gestionnaire is not None and delai_reponse is not None:
+        expiration = asyncio.ensure_future(expirer())
+    serveur = await asyncio.start_server(session, hote, port, backlog=CONNEXIONS_EN_ATTENTE)
+    print(f"[OK] Questionnaire sur {hote}:{port} (telnet {hote} {port})")
+    try:
+        async with serveur:
+            await serveur.serve_forever()
+    finally:
+        if expiration is not None:
+            expiration.cancel()
+        await service.arreter()
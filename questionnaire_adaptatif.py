@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Questionnaire Adaptatif - Systeme Expert Prix PC Portable
+==========================================================
+
+Ce module contient la classe QuestionsAdaptatives : au lieu de poser les
+17 questions dans l'ordre, le questionnaire choisit apres chaque reponse
+la question la plus utile et s'arrete des que la gamme classee en tete
+ne peut plus changer.
+
+Bornes d'une regle : pour les faits deja connus, chaque condition est
+satisfaite ou non ; une caracteristique encore inconnue peut prendre
+n'importe laquelle de ses options (ou rester non renseignee si la
+question n'est jamais posee). Le score etant croissant avec les nombres
+de conditions satisfaites (voir RegleCompilee.calculer_confiance) :
+- borne haute : toutes les conditions inconnues satisfaites, aucune exclusion
+- borne basse : aucune condition inconnue satisfaite ; si une condition
+  excluante porte sur une caracteristique inconnue, la regle peut encore
+  etre exclue et n'a pas de borne basse
+
+La borne d'une gamme est la meilleure borne de ses regles. Le classement
+est decide quand la borne basse d'une gamme depasse strictement la borne
+haute de toutes les autres (ou quand aucune gamme ne peut depasser le
+seuil de confiance) : aucune reponse ne peut alors changer la gamme en
+tete, et les questions restantes ne sont pas posees.
+
+Choix de la question : pour chaque question restante et chaque reponse
+possible, les bornes sont recalculees ; la question retenue est celle qui
+laisse en moyenne (reponses equiprobables) le moins de gammes pouvant
+encore finir en tete, puis l'ecart de bornes le plus faible, puis la
+premiere dans l'ordre du questionnaire. Une question qui ne touche
+aucune regle encore en course n'est posee que si elle peut departager des
+gammes ex aequo : une regle ecartee d'une gamme en course, placee avant sa
+premiere regle surement retenue, peut encore avancer cette gamme dans le
+classement (les confiances plafonnees a 1.0 rendent les ex aequo courants).
+Le questionnaire ne s'arrete que lorsqu'une seule issue reste possible.
+
+Usage:
+    questions = QuestionsAdaptatives(moteur, faits)
+    await questionner(source, base_faits, faits, questions)
+"""
+
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+from base_faits import QUESTIONS
+
+
+MOINS_INFINI = float("-inf")
+PLUS_INFINI = float("inf")
+
+# Issue encore ouverte (plusieurs gammes peuvent finir en tete)
+INDECIS = object()
+
+# Types de conditions, dans l'ordre des compteurs d'une regle
+REQUISE, OPTIONNELLE, EXCLUANTE = 0, 1, 2
+
+
+def compter_conditions(conditions: Mapping[str, List[Tuple[int, frozenset]]], get,
+                       inconnues) -> Optional[List[int]]:
+    """
+    Compte les conditions satisfaites et encore possibles d'une regle.
+
+    Args:
+        conditions: Conditions de la regle par caracteristique {cle: [(type, valeurs)]}
+        get: Lecture d'un fait (faits.get)
+        inconnues: Caracteristiques dont la question n'a pas encore ete posee
+
+    Returns:
+        Compteurs [requises satisfaites, requises possibles, optionnelles
+        satisfaites, optionnelles possibles, exclusions possibles], ou None
+        si une condition excluante est deja satisfaite
+    """
+    etat = [0, 0, 0, 0, 0]
+    for cle, liste in conditions.items():
+        if cle in inconnues:
+            for type_condition, _ in liste:
+                etat[4 if type_condition == EXCLUANTE else 2 * type_condition + 1] += 1
+            continue
+        valeur = get(cle)
+        for type_condition, valeurs in liste:
+            if valeur in valeurs:
+                if type_condition == EXCLUANTE:
+                    return None
+                etat[2 * type_condition] += 1
+    return etat
+
+
+def bornes_regle(regle, etat: List[int], seuil: float) -> Tuple[float, float]:
+    """
+    Calcule les bornes du score d'une regle a partir de ses compteurs.
+
+    Args:
+        regle: Regle compilee (RegleCompilee)
+        etat: Compteurs [requises satisfaites, requises possibles,
+              optionnelles satisfaites, optionnelles possibles, exclusions possibles]
+        seuil: Seuil de confiance du moteur
+
+    Returns:
+        Tuple (borne_basse, borne_haute) ; MOINS_INFINI si la regle peut
+        (borne basse) ou ne peut pas (borne haute) rester sous le seuil
+    """
+    requises, requises_possibles, optionnelles, optionnelles_possibles, exclusions = etat
+    haute = regle.calculer_confiance(requises + requises_possibles, optionnelles + optionnelles_possibles)
+    if haute is None or haute <= seuil:
+        return (MOINS_INFINI, MOINS_INFINI)
+    if exclusions:
+        return (MOINS_INFINI, haute)
+    basse = regle.calculer_confiance(requises, optionnelles)
+    if basse is None or basse <= seuil:
+        return (MOINS_INFINI, haute)
+    return (basse, haute)
+
+
+def evaluer_course(gammes: Mapping[str, Tuple[float, float, float]],
+                   premiers: Mapping[str, Tuple[float, int]], seuil: float) -> Tuple[int, float, Optional[str]]:
+    """
+    Mesure l'incertitude restante sur la gamme en tete.
+
+    Le moteur classe les gammes par confiance decroissante puis, a egalite,
+    par rang de leur premiere regle retenue dans la base. Chaque gamme est
+    donc encadree par deux cles (confiance, -rang) : la cle basse (borne
+    basse, premiere regle surement retenue) et la cle haute (borne haute,
+    premiere regle pouvant etre retenue).
+
+    Args:
+        gammes: Pour chaque gamme (borne basse, borne haute, rang de la
+                premiere regle surement retenue)
+        premiers: Pour chaque gamme, rangs de la premiere regle surement
+                  retenue et de la premiere regle pouvant etre retenue, parmi
+                  toutes ses regles (y compris celles qui ne sont plus en course)
+        seuil: Seuil de confiance du moteur
+
+    Returns:
+        Tuple (issues, ecart, tete) : nombre d'issues possibles (gammes
+        pouvant finir en tete, plus l'absence d'estimation si elle reste
+        possible), somme des ecarts entre bornes de ces gammes, et gamme
+        en tete quand il ne reste qu'une issue (None : aucune estimation)
+    """
+    meilleure = (MOINS_INFINI, MOINS_INFINI)
+    tete = None
+    for nom, (basse, _, premier_sur) in gammes.items():
+        if basse > MOINS_INFINI:
+            cle = (basse, -min(premier_sur, premiers[nom][0]))
+            if cle > meilleure:
+                meilleure, tete = cle, nom
+    issues = 0 if tete is not None else 1
+    ecart = 0.0
+    for nom, (basse, haute, _) in gammes.items():
+        if haute > MOINS_INFINI and (haute, -premiers[nom][1]) >= meilleure:
+            issues += 1
+            ecart += haute - max(basse, seuil)
+    return issues, ecart, tete
+
+
+def agreger(gammes: Dict[str, Tuple[float, float, float]], nom: str, r: int,
+            basse: float, haute: float) -> None:
+    """Ajoute les bornes d'une regle a celles de sa gamme (meilleures bornes, premier rang sur)."""
+    premier_sur = r if basse > MOINS_INFINI else PLUS_INFINI
+    actuelle = gammes.get(nom)
+    if actuelle is None:
+        gammes[nom] = (basse, haute, premier_sur)
+    else:
+        gammes[nom] = (max(actuelle[0], basse), max(actuelle[1], haute), min(actuelle[2], premier_sur))
+
+
+class QuestionsAdaptatives:
+    """
+    Questions a poser, choisies une par une selon les reponses deja donnees.
+
+    S'itere comme QUESTIONS (couples (cle, question)) : questionner() peut
+    l'utiliser a la place de l'ordre fixe. Chaque question est choisie au
+    moment ou elle est demandee, d'apres les faits deja enregistres.
+
+    Attributes:
+        moteur (MoteurInference): Moteur (regles et seuil de confiance)
+        faits (Mapping): Faits collectes, completes par le questionnaire
+        restantes (List[Tuple[str, str]]): Questions pas encore posees
+        nb_posees (int): Nombre de questions posees
+        nb_questions (int): Nombre total de questions
+        en_course (List[str]): Gammes pouvant encore finir en tete
+                               (apres le dernier calcul)
+    """
+
+    def __init__(self, moteur, faits: Mapping[str, Any],
+                 questions: Iterable[Tuple[str, str]] = QUESTIONS):
+        """
+        Args:
+            moteur: Moteur d'inference (base de faits, base de regles, seuil)
+            faits: Faits collectes (dictionnaire ou FaitsCompacts), lus a chaque choix
+            questions: Questions possibles, ordre de preference a egalite (defaut: QUESTIONS)
+        """
+        self.moteur = moteur
+        self.faits = faits
+        self.restantes = list(questions)
+        self.nb_questions = len(self.restantes)
+        self.nb_posees = 0
+        self.en_course: List[str] = []
+        self._options = {cle: tuple(moteur.base_faits.obtenir_options(cle))
+                         for cle, _ in self.restantes}
+        self._domaines = {cle: frozenset(options) for cle, options in self._options.items()}
+        self._plan = None
+
+    def __iter__(self) -> Iterator[Tuple[str, str]]:
+        while True:
+            question = self.prochaine()
+            if question is None:
+                return
+            yield question
+
+    @property
+    def decide(self) -> bool:
+        """True si la gamme en tete ne peut plus changer (questions restantes inutiles)."""
+        return self.prochaine(retirer=False) is None
+
+    # ------------------------------------------------------------
+    # Preparation des regles
+    # ------------------------------------------------------------
+
+    def _preparer(self, instantane) -> List[Dict[str, List[Tuple[int, frozenset]]]]:
+        """
+        Regroupe les conditions de chaque regle par caracteristique (une fois par instantane).
+
+        Les conditions sur une caracteristique du questionnaire qu'aucune
+        option ne satisfait sont ecartees : elles ne seront jamais satisfaites.
+
+        Returns:
+            Pour chaque regle : {cle: [(type de condition, valeurs acceptees)]}
+        """
+        if self._plan is not None and self._plan[0] is instantane:
+            return self._plan[1]
+        plan = []
+        for regle in instantane.regles:
+            conditions: Dict[str, List[Tuple[int, frozenset]]] = {}
+            for type_condition, liste in ((REQUISE, regle.requises), (OPTIONNELLE, regle.optionnelles),
+                                          (EXCLUANTE, regle.excluantes)):
+                for cle, valeurs in liste:
+                    domaine = self._domaines.get(cle)
+                    if domaine is not None and valeurs.isdisjoint(domaine):
+                        continue
+                    conditions.setdefault(cle, []).append((type_condition, valeurs))
+            plan.append(conditions)
+        self._plan = (instantane, plan)
+        return plan
+
+    # ------------------------------------------------------------
+    # Choix de la question
+    # ------------------------------------------------------------
+
+    def prochaine(self, retirer: bool = True) -> Optional[Tuple[str, str]]:
+        """
+        Choisit la prochaine question d'apres les faits deja collectes.
+
+        Args:
+            retirer: Retirer la question des questions restantes (defaut: True,
+                     elle est consideree comme posee)
+
+        Returns:
+            Le couple (cle, question), ou None si la gamme en tete ne peut plus changer
+        """
+        moteur = self.moteur
+        seuil = moteur.seuil_confiance
+        instantane = moteur.base_regles.obtenir_instantane()
+        plan = self._preparer(instantane)
+        get = self.faits.get
+        inconnues = {cle for cle, _ in self.restantes if get(cle) is None}
+
+        # Compteurs et bornes de chaque regle ; premieres regles surement et
+        # possiblement retenues de chaque gamme (rangs gardes tels quels apres
+        # une reponse : ils restent des bornes pour departager les ex aequo)
+        regles = instantane.regles
+        etats = {}
+        premiers: Dict[str, Tuple[float, int]] = {}
+        for r, conditions in enumerate(plan):
+            etat = compter_conditions(conditions, get, inconnues)
+            if etat is None:
+                continue
+            basse, haute = bornes_regle(regles[r], etat, seuil)
+            if haute > MOINS_INFINI:
+                etats[r] = (etat, basse, haute)
+                premier_sur, premier_possible = premiers.get(regles[r].nom, (PLUS_INFINI, r))
+                if basse > MOINS_INFINI and premier_sur == PLUS_INFINI:
+                    premier_sur = r
+                premiers[regles[r].nom] = (premier_sur, premier_possible)
+
+        # Une regle dont la borne haute n'atteint pas la meilleure borne basse
+        # ne peut plus placer sa gamme en tete (les bornes ne font que se resserrer)
+        possibles = etats
+        meilleure_basse = max((basse for _, basse, _ in etats.values()), default=MOINS_INFINI)
+        etats = {r: e for r, e in etats.items() if e[2] >= meilleure_basse}
+        gammes: Dict[str, Tuple[float, float, float]] = {}
+        for r, (_, basse, haute) in etats.items():
+            agreger(gammes, regles[r].nom, r, basse, haute)
+        self.en_course = sorted(gammes, key=lambda nom: -gammes[nom][1])
+
+        issues, ecart, _ = evaluer_course(gammes, premiers, seuil)
+        if issues <= 1:
+            return None
+
+        # Regles ecartees qui peuvent encore departager des ex aequo : une regle
+        # d'une gamme en course placee avant sa premiere regle surement retenue
+        # peut, si elle est retenue, avancer la gamme dans le classement
+        departage = [r for r in possibles
+                     if r not in etats and regles[r].nom in gammes and r < premiers[regles[r].nom][0]]
+
+        # Regles encore en course touchees par chaque question restante
+        meilleure = None
+        for rang, (cle, question) in enumerate(self.restantes):
+            if cle not in inconnues:
+                continue
+            touchees = [r for r in etats if cle in plan[r]]
+            if touchees:
+                cout, decidee = self._cout_question(cle, touchees, plan, regles, etats, premiers, seuil)
+                if decidee:
+                    # Quelle que soit la reponse (ou sans reponse), la meme gamme finit en tete
+                    return None
+            elif any(cle in plan[r] for r in departage):
+                # Ne change que l'ordre des ex aequo : aucune incertitude levee a coup sur
+                cout = (float(issues), ecart)
+            else:
+                continue
+            if meilleure is None or cout < meilleure[0]:
+                meilleure = (cout, rang)
+
+        if meilleure is None:
+            # Plusieurs issues restent possibles mais aucune question ne touche
+            # les regles qui les departagent : questions restantes dans l'ordre
+            rangs = [rang for rang, (cle, _) in enumerate(self.restantes) if cle in inconnues]
+            if not rangs:
+                return None
+            meilleure = (None, rangs[0])
+        question = self.restantes[meilleure[1]]
+        if retirer:
+            del self.restantes[meilleure[1]]
+            self.nb_posees += 1
+        return question
+
+    def _cout_question(self, cle: str, touchees: List[int], plan, regles,
+                       etats, premiers: Dict[str, Tuple[float, int]], seuil: float) -> Tuple[Tuple[float, float], bool]:
+        """
+        Incertitude moyenne apres la reponse a une question (reponses equiprobables).
+
+        Les bornes sont aussi calculees sans reponse (None : question jamais
+        posee) ; si chaque cas laisse une seule issue, toujours la meme, la
+        gamme en tete est deja decidee, meme si les bornes de chaque gamme
+        prises separement ne le montraient pas.
+
+        Returns:
+            Tuple ((issues moyennes, ecart moyen), decidee) ; un cout plus
+            petit designe une question plus utile
+        """
+        touchees_set = set(touchees)
+        fixes: Dict[str, Tuple[float, float, float]] = {}
+        for r, (_, basse, haute) in etats.items():
+            if r not in touchees_set:
+                agreger(fixes, regles[r].nom, r, basse, haute)
+        options = self._options[cle]
+        total_issues = 0
+        total_ecart = 0.0
+        tetes = set()
+        for valeur in options + (None,):
+            gammes = dict(fixes)
+            for r in touchees:
+                etat = list(etats[r][0])
+                exclue = False
+                for type_condition, valeurs in plan[r][cle]:
+                    if type_condition == EXCLUANTE:
+                        etat[4] -= 1
+                        if valeur in valeurs:
+                            exclue = True
+                    else:
+                        etat[2 * type_condition + 1] -= 1
+                        if valeur in valeurs:
+                            etat[2 * type_condition] += 1
+                if exclue:
+                    continue
+                basse, haute = bornes_regle(regles[r], etat, seuil)
+                if haute > MOINS_INFINI:
+                    agreger(gammes, regles[r].nom, r, basse, haute)
+            issues, ecart, tete = evaluer_course(gammes, premiers, seuil)
+            tetes.add(tete if issues == 1 else INDECIS)
+            if valeur is not None:
+                total_issues += issues
+                total_ecart += ecart
+        decidee = len(tetes) == 1 and INDECIS not in tetes
+        return (total_issues / len(options), total_ecart / len(options)), decidee
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Rechargement a Chaud des Regles - Systeme Expert Prix PC Portable
+==================================================================
+
+Ce module contient la classe SurveillantRegles qui surveille des fichiers
+de regles JSON (voir BaseRegles.charger_fichiers) et les recharge sans
+redemarrage :
+- la date de modification (et la taille) de chaque fichier est relue
+  periodiquement par un thread d'arriere-plan
+- apres un changement, les fichiers sont relus et la base est compilee
+  dans ce thread, sans bloquer les estimations en cours
+- la nouvelle base est publiee par un echange de reference atomique
+  (BaseRegles.installer_instantane) : les appels a inferer() en cours
+  terminent sur l'ancien instantane, les suivants utilisent le nouveau
+
+Un fichier invalide est signale dans le journal et l'ancienne base reste
+en service. La duree du rechargement et celle de la fenetre d'echange
+sont journalisees avec le module logging (journal "rechargement_regles").
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from base_regles import BaseRegles, lire_fichiers_regles
+from compilation_regles import InstantaneRegles
+
+
+journal = logging.getLogger("rechargement_regles")
+
+
+class SurveillantRegles:
+    """
+    Surveille des fichiers de regles et recharge la base a chaque modification.
+
+    S'utilise comme gestionnaire de contexte :
+        with SurveillantRegles(base_regles, ["regles.json"]):
+            ...  # les estimations suivent les modifications du fichier
+
+    Attributes:
+        base_regles (BaseRegles): Base de regles mise a jour
+        chemins (List[str]): Fichiers de regles surveilles
+        intervalle (float): Periode de verification en secondes
+        nb_rechargements (int): Nombre de rechargements reussis
+    """
+
+    def __init__(self, base_regles: BaseRegles, chemins: List[str], intervalle: float = 1.0):
+        """
+        Initialise le surveillant (sans demarrer le thread).
+
+        La signature courante des fichiers est relevee : seule une
+        modification ulterieure declenche un rechargement.
+
+        Args:
+            base_regles: Base de regles a mettre a jour
+            chemins: Fichiers de regles JSON a surveiller
+            intervalle: Periode de verification en secondes (defaut: 1.0)
+        """
+        self.base_regles = base_regles
+        self.chemins = list(chemins)
+        self.intervalle = intervalle
+        self.nb_rechargements = 0
+        self._signature = self._lire_signature()
+        self._arret = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _lire_signature(self) -> Tuple:
+        """Retourne (date de modification en ns, taille) de chaque fichier, None si absent."""
+        signature = []
+        for chemin in self.chemins:
+            try:
+                etat = os.stat(chemin)
+                signature.append((etat.st_mtime_ns, etat.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def verifier(self) -> bool:
+        """
+        Verifie les fichiers une fois et recharge la base s'ils ont change.
+
+        Returns:
+            True si la base a ete rechargee
+        """
+        signature = self._lire_signature()
+        if signature == self._signature:
+            return False
+        self._signature = signature
+        return self.recharger()
+
+    def recharger(self) -> bool:
+        """
+        Relit et compile les fichiers de regles, puis publie la nouvelle base.
+
+        Returns:
+            True si la base a ete remplacee, False si un fichier est invalide
+        """
+        debut = time.perf_counter()
+        try:
+            regles = lire_fichiers_regles(self.chemins)
+            instantane = InstantaneRegles(regles, 0)
+        except (OSError, ValueError) as erreur:
+            # Souvent un fichier en cours d'ecriture : il sera relu a la prochaine modification
+            journal.warning("Rechargement des regles abandonne, ancienne base conservee : %s", erreur)
+            return False
+        compilation = time.perf_counter()
+
+        # Echange de reference : seule cette etape est visible des lecteurs
+        self.base_regles.installer_instantane(instantane, regles)
+        fin = time.perf_counter()
+
+        self.nb_rechargements += 1
+        journal.info("Regles rechargees : %d regle(s), version %d, rechargement %.1f ms, "
+                     "fenetre d'echange %.1f us",
+                     len(regles), self.base_regles.version,
+                     (compilation - debut) * 1e3, (fin - compilation) * 1e6)
+        return True
+
+    def _surveiller(self) -> None:
+        """Boucle du thread de surveillance."""
+        while not self._arret.wait(self.intervalle):
+            try:
+                self.verifier()
+            except Exception:  # Le thread ne doit pas mourir sur une erreur imprevue
+                journal.exception("Erreur pendant la surveillance des fichiers de regles")
+
+    def demarrer(self) -> None:
+        """Demarre le thread de surveillance (sans effet s'il tourne deja)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._arret.clear()
+        self._thread = threading.Thread(target=self._surveiller, name="SurveillantRegles", daemon=True)
+        self._thread.start()
+        journal.info("Surveillance de %s (toutes les %.1f s)", ", ".join(self.chemins), self.intervalle)
+
+    def arreter(self) -> None:
+        """Arrete le thread de surveillance et attend sa fin."""
+        self._arret.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> "SurveillantRegles":
+        self.demarrer()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.arreter()
@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Service d'Estimation HTTP - Systeme Expert Prix PC Portable
+============================================================
+
+Ce module expose le moteur d'inference en service HTTP/JSON local,
+avec la seule bibliotheque standard (asyncio) :
+
+    POST /estimer        {"faits": {"usage": "Gaming", ...}, "k": 3}
+                      -> {"estimations": [{"nom": ..., "confiance": ...,
+                                           "prix_min": ..., "prix_max": ...}]}
+    GET  /statistiques   compteurs, profondeur de file, histogrammes
+    GET  /sante          {"etat": "ok", "version_regles": ...}
+
+Les requetes ne sont pas estimees une par une : elles sont placees dans
+une file, et une tache de regroupement les reunit en lots, jusqu'a
+taille_lot_max requetes ou pendant au plus fenetre_ms apres la premiere,
+puis evalue chaque lot en une passe (MoteurInference.evaluer_lot). Par
+defaut la fenetre est nulle : un lot reunit les requetes deja en attente,
+ce qui donne le meilleur debit ; une fenetre positive forme des lots plus
+gros au prix de requetes par seconde en moins. La fenetre borne la latence
+ajoutee ; quand la file est pleine, les nouvelles requetes sont refusees
+(503) au lieu d'allonger la queue de latence.
+
+Usage:
+    $ python main.py serve --port 8080
+    $ curl -d '{"faits": {"usage": "Gaming", "ram": "16 Go"}}' localhost:8080/estimer
+"""
+
+import asyncio
+import json
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from traitement_lot import convertir_estimations
+
+
+# Taille maximale du corps d'une requete HTTP (octets)
+TAILLE_CORPS_MAX = 1 << 20
+
+# Nombre de latences gardees pour les centiles de /statistiques
+NB_LATENCES_GARDEES = 10000
+
+MESSAGES_HTTP = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+                 413: "Payload Too Large", 503: "Service Unavailable"}
+
+
+def classe_histogramme(valeur: int) -> str:
+    """Retourne la classe (puissance de 2) d'une valeur : "0", "1", "2-3", "4-7"..."""
+    if valeur < 2:
+        return str(valeur)
+    debut = 1 << (valeur.bit_length() - 1)
+    return f"{debut}-{2 * debut - 1}"
+
+
+class ErreurRequete(Exception):
+    """Requete refusee, avec son statut HTTP."""
+
+    def __init__(self, statut: int, message: Any):
+        super().__init__(message)
+        self.statut = statut
+        self.message = message
+
+
+def lire_demande(corps: bytes) -> Tuple[Dict[str, Any], Optional[int]]:
+    """
+    Decode une demande d'estimation {"faits": {...}, "k": 3}.
+
+    Args:
+        corps: Objet JSON de la demande (k facultatif, 3 par defaut, null = toutes)
+
+    Returns:
+        Tuple (faits, k)
+
+    Raises:
+        ErreurRequete: JSON invalide ou objet mal forme (400)
+    """
+    try:
+        demande = json.loads(corps)
+    except ValueError as erreur:
+        raise ErreurRequete(400, f"JSON invalide : {erreur}") from None
+    return verifier_demande(demande)
+
+
+def verifier_demande(demande: Any) -> Tuple[Dict[str, Any], Optional[int]]:
+    """
+    Verifie la forme d'une demande d'estimation deja decodee.
+
+    Args:
+        demande: Objet JSON decode
+
+    Returns:
+        Tuple (faits, k)
+
+    Raises:
+        ErreurRequete: Objet mal forme (400)
+    """
+    if not isinstance(demande, dict) or not isinstance(demande.get("faits"), dict):
+        raise ErreurRequete(400, 'Objet {"faits": {...}, "k": 3} attendu')
+    k = demande.get("k", 3)
+    if k is not None and (not isinstance(k, int) or isinstance(k, bool)):
+        raise ErreurRequete(400, "k doit etre un entier ou null")
+    return demande["faits"], k
+
+
+class ServiceEstimation:
+    """
+    Service d'estimation a regroupement de requetes (micro-lots).
+
+    Attributes:
+        moteur: Moteur d'inference (MoteurInference ou derive)
+        fenetre (float): Attente maximale apres la premiere requete d'un lot (secondes)
+        taille_lot_max (int): Nombre maximal de requetes par lot
+        taille_file_max (int): Requetes en attente au-dela desquelles le service refuse
+    """
+
+    def __init__(self, moteur, fenetre_ms: float = 0.0, taille_lot_max: int = 64,
+                 taille_file_max: int = 10000):
+        """
+        Initialise le service (sans demarrer la tache de regroupement).
+
+        Args:
+            moteur: Moteur d'inference utilise pour les lots
+            fenetre_ms: Attente maximale pour completer un lot, en ms (defaut: 0, seules les
+                        requetes deja en attente)
+            taille_lot_max: Nombre maximal de requetes par lot (defaut: 64)
+            taille_file_max: Taille maximale de la file d'attente (defaut: 10000)
+        """
+        self.moteur = moteur
+        self.fenetre = fenetre_ms / 1000
+        self.taille_lot_max = max(1, taille_lot_max)
+        self.taille_file_max = taille_file_max
+        self._file: Optional[asyncio.Queue] = None
+        self._tache: Optional[asyncio.Task] = None
+
+        self._requetes = 0
+        self._invalides = 0
+        self._refusees = 0
+        self._lots = 0
+        self._profondeur_max = 0
+        self._histogramme_lots: Dict[int, int] = {}
+        self._histogramme_file: Dict[str, int] = {}
+        self._latences = deque(maxlen=NB_LATENCES_GARDEES)
+        self._debut = time.perf_counter()
+
+    # ------------------------------------------------------------
+    # File et regroupement
+    # ------------------------------------------------------------
+
+    def demarrer(self) -> None:
+        """Cree la file et demarre la tache de regroupement (boucle asyncio courante)."""
+        self._file = asyncio.Queue(self.taille_file_max)
+        self._tache = asyncio.get_running_loop().create_task(self._regrouper())
+
+    async def arreter(self) -> None:
+        """Arrete la tache de regroupement."""
+        if self._tache is not None:
+            self._tache.cancel()
+            try:
+                await self._tache
+            except asyncio.CancelledError:
+                pass
+            self._tache = None
+
+    async def estimer(self, faits: Dict[str, Any], k: Optional[int] = 3) -> List[Tuple]:
+        """
+        Estime une configuration via le prochain lot.
+
+        Args:
+            faits: Dictionnaire des faits
+            k: Nombre d'estimations voulues (None = toutes)
+
+        Returns:
+            Liste de tuples (nom_gamme, score_confiance, description, prix_min, prix_max)
+
+        Raises:
+            ErreurRequete: Faits invalides (400) ou file pleine (503)
+        """
+        erreurs = self.moteur.base_faits.valider(faits)
+        if erreurs:
+            self._invalides += 1
+            raise ErreurRequete(400, erreurs)
+
+        futur = asyncio.get_running_loop().create_future()
+        try:
+            self._file.put_nowait((faits, k, futur, time.perf_counter()))
+        except asyncio.QueueFull:
+            self._refusees += 1
+            raise ErreurRequete(503, "File d'attente pleine, reessayez plus tard") from None
+        self._requetes += 1
+        self._profondeur_max = max(self._profondeur_max, self._file.qsize())
+        return await futur
+
+    async def _regrouper(self) -> None:
+        """Tache de regroupement : forme les lots et les evalue."""
+        file = self._file
+        boucle = asyncio.get_running_loop()
+        while True:
+            lot = [await file.get()]
+            echeance = boucle.time() + self.fenetre
+            while len(lot) < self.taille_lot_max:
+                if not file.empty():
+                    lot.append(file.get_nowait())
+                    continue
+                reste = echeance - boucle.time()
+                if reste <= 0:
+                    break
+                try:
+                    lot.append(await asyncio.wait_for(file.get(), reste))
+                except asyncio.TimeoutError:
+                    break
+
+            classe = classe_histogramme(file.qsize())
+            self._histogramme_file[classe] = self._histogramme_file.get(classe, 0) + 1
+            self._traiter_lot(lot)
+
+    def _traiter_lot(self, lot: List[Tuple]) -> None:
+        """Evalue un lot (une passe par valeur de k) et transmet les resultats."""
+        self._lots += 1
+        self._histogramme_lots[len(lot)] = self._histogramme_lots.get(len(lot), 0) + 1
+
+        par_k: Dict[Optional[int], List[Tuple]] = {}
+        for requete in lot:
+            par_k.setdefault(requete[1], []).append(requete)
+
+        for k, requetes in par_k.items():
+            try:
+                resultats = self.moteur.evaluer_lot([faits for faits, _, _, _ in requetes], k)
+            except Exception as erreur:
+                for _, _, futur, _ in requetes:
+                    if not futur.done():
+                        futur.set_exception(erreur)
+                continue
+            fin = time.perf_counter()
+            for (_, _, futur, arrivee), estimations in zip(requetes, resultats):
+                if not futur.done():  # client deconnecte
+                    futur.set_result(estimations)
+                self._latences.append(fin - arrivee)
+
+    def statistiques(self) -> Dict[str, Any]:
+        """
+        Retourne les compteurs du service.
+
+        Returns:
+            Dictionnaire {requetes, invalides, refusees, lots, taille_moyenne_lot,
+            profondeur_file, profondeur_file_max, histogramme_tailles_lots,
+            histogramme_profondeur_file, latence_ms (p50, p99, max),
+            requetes_par_seconde, version_regles}
+        """
+        latences = sorted(self._latences)
+        if latences:
+            latence = {"p50": round(latences[len(latences) // 2] * 1e3, 3),
+                       "p99": round(latences[min(len(latences) - 1, int(len(latences) * 0.99))] * 1e3, 3),
+                       "max": round(latences[-1] * 1e3, 3)}
+        else:
+            latence = {"p50": None, "p99": None, "max": None}
+        traitees = sum(taille * nombre for taille, nombre in self._histogramme_lots.items())
+        return {
+            "requetes": self._requetes,
+            "invalides": self._invalides,
+            "refusees": self._refusees,
+            "lots": self._lots,
+            "taille_moyenne_lot": round(traitees / self._lots, 2) if self._lots else 0.0,
+            "profondeur_file": self._file.qsize() if self._file is not None else 0,
+            "profondeur_file_max": self._profondeur_max,
+            "histogramme_tailles_lots": {str(taille): nombre for taille, nombre
+                                         in sorted(self._histogramme_lots.items())},
+            "histogramme_profondeur_file": self._histogramme_file,
+            "latence_ms": latence,
+            "requetes_par_seconde": round(self._requetes / (time.perf_counter() - self._debut), 1),
+            "version_regles": self.moteur.base_regles.version,
+        }
+
+    # ------------------------------------------------------------
+    # HTTP
+    # ------------------------------------------------------------
+
+    async def traiter_requete(self, methode: str, chemin: str, corps: bytes) -> Tuple[int, Any]:
+        """
+        Traite une requete HTTP deja lue.
+
+        Args:
+            methode: Methode HTTP (GET, POST...)
+            chemin: Chemin demande
+            corps: Corps de la requete
+
+        Returns:
+            Tuple (statut HTTP, objet JSON de la reponse)
+        """
+        chemin = chemin.split("?", 1)[0]
+        try:
+            if chemin == "/estimer":
+                if methode != "POST":
+                    raise ErreurRequete(405, "Utilisez POST")
+                faits, k = lire_demande(corps)
+                estimations = await self.estimer(faits, k)
+                return 200, {"estimations": convertir_estimations(estimations)}
+            if chemin == "/statistiques":
+                return 200, self.statistiques()
+            if chemin == "/sante":
+                return 200, {"etat": "ok", "version_regles": self.moteur.base_regles.version}
+            raise ErreurRequete(404, f"Chemin inconnu : {chemin}")
+        except ErreurRequete as erreur:
+            cle = "erreurs" if isinstance(erreur.message, list) else "erreur"
+            return erreur.statut, {cle: erreur.message}
+
+    async def _servir_connexion(self, lecteur: asyncio.StreamReader,
+                                ecrivain: asyncio.StreamWriter) -> None:
+        """Sert les requetes HTTP/1.1 d'une connexion (keep-alive)."""
+        try:
+            while True:
+                ligne = await lecteur.readline()
+                if not ligne:
+                    break
+                try:
+                    methode, chemin, version = ligne.decode("latin-1").split()
+                except ValueError:
+                    self._ecrire_reponse(ecrivain, 400, {"erreur": "Requete HTTP invalide"}, False)
+                    break
+
+                entetes = {}
+                while True:
+                    ligne = await lecteur.readline()
+                    if ligne in (b"\r\n", b"\n", b""):
+                        break
+                    cle, _, valeur = ligne.decode("latin-1").partition(":")
+                    entetes[cle.strip().lower()] = valeur.strip()
+
+                connexion = entetes.get("connection", "").lower()
+                garder = connexion == "keep-alive" if version == "HTTP/1.0" else connexion != "close"
+                try:
+                    longueur = int(entetes.get("content-length") or 0)
+                except ValueError:
+                    longueur = -1
+                if not 0 <= longueur <= TAILLE_CORPS_MAX:
+                    self._ecrire_reponse(ecrivain, 413, {"erreur": "Corps de requete invalide ou trop grand"},
+                                         False)
+                    break
+                corps = await lecteur.readexactly(longueur) if longueur else b""
+
+                statut, reponse = await self.traiter_requete(methode, chemin, corps)
+                self._ecrire_reponse(ecrivain, statut, reponse, garder)
+                await ecrivain.drain()
+                if not garder:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            ecrivain.close()
+
+    @staticmethod
+    def _ecrire_reponse(ecrivain: asyncio.StreamWriter, statut: int, reponse: Any, garder: bool) -> None:
+        """Ecrit une reponse HTTP JSON."""
+        corps = json.dumps(reponse, ensure_ascii=False).encode("utf-8")
+        ecrivain.write(
+            f"HTTP/1.1 {statut} {MESSAGES_HTTP.get(statut, '')}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(corps)}\r\n"
+            f"Connection: {'keep-alive' if garder else 'close'}\r\n\r\n".encode("latin-1") + corps)
+
+    async def servir(self, hote: str = "127.0.0.1", port: int = 8080) -> None:
+        """
+        Demarre le service HTTP et le sert jusqu'a annulation.
+
+        Args:
+            hote: Adresse d'ecoute (defaut: 127.0.0.1, local uniquement)
+            port: Port d'ecoute (defaut: 8080)
+        """
+        self.demarrer()
+        serveur = await asyncio.start_server(self._servir_connexion, hote, port)
+        print(f"[OK] Service d'estimation sur http://{hote}:{port} "
+              f"(lots de {self.taille_lot_max} max, fenetre {self.fenetre * 1000:g} ms)")
+        try:
+            async with serveur:
+                await serveur.serve_forever()
+        finally:
+            await self.arreter()
@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Traitement par Lots - Systeme Expert Prix PC Portable
+======================================================
+
+Ce module contient le pipeline d'estimation d'un fichier de configurations,
+compose de generateurs qui ne gardent qu'une ligne a la fois en memoire :
+
+    lire_configurations -> valider_configurations -> estimer_configurations
+                        -> ecrire_resultats
+
+- estimer_fichier enchaine ces etapes dans le processus courant
+- traiter_lot repartit les memes etapes sur plusieurs processus
+  (ProcessPoolExecutor) : les configurations sont regroupees en paquets
+  pour amortir les echanges entre processus, chaque processus construit
+  une seule fois sa base de regles et son moteur d'inference, et les
+  resultats sont ecrits dans l'ordre du fichier avec un nombre borne de
+  paquets en cours
+
+Formats d'entree (memes cles que BaseFaits.faits) :
+- JSONL : un objet par ligne, par exemple
+      {"usage": "Gaming", "ram": "16 Go", "clavier_rgb": true}
+- CSV (extension .csv) : une ligne d'en-tete avec les cles, une case vide
+  pour un fait absent, oui/non (ou true/false, 1/0) pour une option booleenne
+
+Format de sortie (JSONL) : une ligne par configuration, dans le meme ordre,
+"ligne" etant le numero de ligne dans le fichier d'entree :
+    {"ligne": 1, "estimations": [{"nom": ..., "confiance": ...,
+                                  "prix_min": ..., "prix_max": ...}, ...]}
+ou, si la configuration est invalide :
+    {"ligne": 2, "erreurs": ["ram : valeur inconnue '12 Go'"]}
+"""
+
+import csv
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from base_faits import BaseFaits
+from base_regles import BaseRegles
+from moteur_inference import MoteurInference
+
+
+# Une configuration lue : (numero de ligne, faits ou None si illisible, erreurs)
+Configuration = Tuple[int, Optional[Dict[str, Any]], List[str]]
+
+# Une configuration estimee : (numero de ligne, estimations ou None, erreurs)
+Resultat = Tuple[int, Optional[List[Tuple[str, float, str, int, int]]], List[str]]
+
+# Valeurs acceptees pour une option booleenne dans un fichier CSV
+BOOLEENS_CSV = {
+    "oui": True, "true": True, "vrai": True, "1": True,
+    "non": False, "false": False, "faux": False, "0": False,
+}
+
+
+# ============================================================
+# ETAPES DU PIPELINE
+# ============================================================
+
+def lire_configurations(chemin: str, base_faits: BaseFaits,
+                        format_entree: Optional[str] = None) -> Iterator[Configuration]:
+    """
+    Lit un fichier de configurations, une ligne a la fois.
+
+    Une ligne illisible ne stoppe pas la lecture : elle est transmise
+    sans faits, avec son erreur. Les lignes vides sont ignorees.
+
+    Args:
+        chemin: Chemin du fichier d'entree
+        base_faits: Base de faits (pour reconnaitre les options booleennes en CSV)
+        format_entree: "jsonl" ou "csv" (defaut: deduit de l'extension)
+
+    Yields:
+        Des tuples (numero de ligne, faits, erreurs)
+    """
+    if format_entree is None:
+        format_entree = "csv" if chemin.lower().endswith(".csv") else "jsonl"
+
+    with open(chemin, "r", encoding="utf-8", newline="") as fichier:
+        if format_entree == "csv":
+            yield from _lire_csv(fichier, base_faits)
+        else:
+            yield from _lire_jsonl(fichier)
+
+
+def _lire_jsonl(fichier) -> Iterator[Configuration]:
+    """Lit des configurations au format JSONL."""
+    for numero, ligne in enumerate(fichier, 1):
+        if not ligne.strip():
+            continue
+        try:
+            faits = json.loads(ligne)
+        except ValueError as erreur:
+            yield numero, None, [f"JSON invalide : {erreur}"]
+            continue
+        if isinstance(faits, dict):
+            yield numero, faits, []
+        else:
+            yield numero, None, ["Un objet JSON est attendu"]
+
+
+def _lire_csv(fichier, base_faits: BaseFaits) -> Iterator[Configuration]:
+    """Lit des configurations au format CSV (une ligne d'en-tete)."""
+    lecteur = csv.reader(fichier)
+    entetes = [entete.strip() for entete in next(lecteur, [])]
+    for ligne in lecteur:
+        numero = lecteur.line_num
+        if not any(case.strip() for case in ligne):
+            continue
+        if len(ligne) != len(entetes):
+            yield numero, None, [f"{len(entetes)} colonnes attendues, {len(ligne)} lues"]
+            continue
+
+        faits: Dict[str, Any] = {}
+        erreurs = []
+        for cle, case in zip(entetes, ligne):
+            case = case.strip()
+            if not case:
+                continue
+            if cle in base_faits.options_booleennes:
+                valeur = BOOLEENS_CSV.get(case.lower())
+                if valeur is None:
+                    erreurs.append(f"{cle} : booleen attendu, {case!r} recu")
+                    continue
+                faits[cle] = valeur
+            else:
+                faits[cle] = case
+        yield numero, faits, erreurs
+
+
+def valider_configurations(configurations: Iterable[Configuration],
+                           base_faits: BaseFaits) -> Iterator[Configuration]:
+    """
+    Verifie chaque configuration par rapport aux options de la base de faits.
+
+    Args:
+        configurations: Tuples (numero, faits, erreurs) de lire_configurations
+        base_faits: Base de faits (source des listes options_*)
+
+    Yields:
+        Les memes tuples, completes des erreurs de validation
+    """
+    for numero, faits, erreurs in configurations:
+        if faits is not None:
+            erreurs = erreurs + base_faits.valider(faits)
+        yield numero, faits, erreurs
+
+
+def estimer_configurations(configurations: Iterable[Configuration], moteur,
+                           k: Optional[int] = 3) -> Iterator[Resultat]:
+    """
+    Estime chaque configuration valide avec moteur.evaluer().
+
+    Args:
+        configurations: Tuples (numero, faits, erreurs) valides
+        moteur: Moteur d'inference (MoteurInference ou derive)
+        k: Nombre d'estimations par configuration (None = toutes)
+
+    Yields:
+        Des tuples (numero, estimations, erreurs) ; estimations vaut None
+        si la configuration est invalide
+    """
+    for numero, faits, erreurs in configurations:
+        if erreurs or faits is None:
+            yield numero, None, erreurs
+        else:
+            yield numero, moteur.evaluer(faits, k), erreurs
+
+
+def convertir_estimations(estimations: List[Tuple[str, float, str, int, int]]) -> List[Dict[str, Any]]:
+    """
+    Convertit des estimations en objets JSON {nom, confiance, prix_min, prix_max}.
+    
+    Args:
+        estimations: Tuples (nom_gamme, score_confiance, description, prix_min, prix_max)
+        
+    Returns:
+        La liste des dictionnaires, confiance arrondie a 4 decimales
+    """
+    return [{"nom": nom, "confiance": round(confiance, 4),
+             "prix_min": prix_min, "prix_max": prix_max}
+            for nom, confiance, _, prix_min, prix_max in estimations]
+
+
+def formater_resultat(resultat: Resultat) -> str:
+    """
+    Formate le resultat d'une configuration en ligne JSON.
+
+    Args:
+        resultat: Tuple (numero, estimations, erreurs)
+
+    Returns:
+        La ligne JSON (sans retour a la ligne)
+    """
+    numero, estimations, erreurs = resultat
+    if estimations is None:
+        return json.dumps({"ligne": numero, "erreurs": erreurs}, ensure_ascii=False)
+    return json.dumps({"ligne": numero, "estimations": convertir_estimations(estimations)},
+                      ensure_ascii=False)
+
+
+def ecrire_resultats(resultats: Iterable[Resultat], sortie) -> Dict[str, int]:
+    """
+    Ecrit les resultats au format JSONL au fur et a mesure.
+
+    Args:
+        resultats: Tuples (numero, estimations, erreurs)
+        sortie: Fichier texte ouvert en ecriture
+
+    Returns:
+        Dictionnaire {configurations, invalides}
+    """
+    nb_configurations = 0
+    nb_invalides = 0
+    for resultat in resultats:
+        sortie.write(formater_resultat(resultat) + "\n")
+        nb_configurations += 1
+        if resultat[1] is None:
+            nb_invalides += 1
+    return {"configurations": nb_configurations, "invalides": nb_invalides}
+
+
+def estimer_fichier(chemin_entree: str, chemin_sortie: str, moteur,
+                    k: Optional[int] = 3, format_entree: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Estime un fichier de configurations dans le processus courant.
+
+    La memoire utilisee ne depend pas de la taille du fichier : chaque
+    ligne est lue, validee, estimee et ecrite avant de passer a la suivante.
+
+    Args:
+        chemin_entree: Fichier JSONL ou CSV des configurations
+        chemin_sortie: Fichier JSONL des resultats
+        moteur: Moteur d'inference (sa base de faits sert a la validation)
+        k: Nombre d'estimations par configuration (defaut: 3, None = toutes)
+        format_entree: "jsonl" ou "csv" (defaut: deduit de l'extension)
+
+    Returns:
+        Dictionnaire {configurations, invalides, duree}
+    """
+    debut = time.perf_counter()
+    base_faits = moteur.base_faits
+    configurations = lire_configurations(chemin_entree, base_faits, format_entree)
+    resultats = estimer_configurations(valider_configurations(configurations, base_faits), moteur, k)
+    with open(chemin_sortie, "w", encoding="utf-8") as sortie:
+        bilan = ecrire_resultats(resultats, sortie)
+    bilan["duree"] = time.perf_counter() - debut
+    return bilan
+
+
+# ============================================================
+# REPARTITION SUR PLUSIEURS PROCESSUS
+# ============================================================
+
+# Etat propre a chaque processus de travail (construit par _initialiser_travailleur)
+_moteur: Optional[MoteurInference] = None
+_k: Optional[int] = None
+
+
+def _initialiser_travailleur(classe_moteur, seuil_confiance: float, k: Optional[int],
+                             fichiers_regles: Optional[List[str]] = None,
+                             fichier_instantane: Optional[str] = None) -> None:
+    """
+    Construit la base de regles et le moteur d'un processus de travail.
+
+    Args:
+        classe_moteur: Classe du moteur d'inference (MoteurInference ou derivee)
+        seuil_confiance: Seuil minimum de confiance
+        k: Nombre d'estimations gardees par configuration (None = toutes)
+        fichiers_regles: Fichiers de regles JSON (defaut: regles predefinies)
+        fichier_instantane: Instantane binaire des fichiers de regles (defaut: aucun)
+    """
+    global _moteur, _k
+    _moteur = classe_moteur(BaseFaits(), BaseRegles(fichiers_regles, fichier_instantane), seuil_confiance)
+    _k = k
+
+
+def _estimer_paquet(paquet: List[Configuration]) -> Tuple[str, int]:
+    """
+    Valide et estime un paquet de configurations dans un processus de travail.
+
+    Args:
+        paquet: Tuples (numero, faits, erreurs) de lire_configurations
+
+    Returns:
+        Tuple (lignes JSON du paquet deja jointes, nombre de configurations invalides)
+    """
+    resultats = estimer_configurations(valider_configurations(paquet, _moteur.base_faits), _moteur, _k)
+    lignes = []
+    nb_invalides = 0
+    for resultat in resultats:
+        lignes.append(formater_resultat(resultat) + "\n")
+        if resultat[1] is None:
+            nb_invalides += 1
+    return "".join(lignes), nb_invalides
+
+
+def decouper(elements: Iterable[Any], taille: int) -> Iterator[List[Any]]:
+    """
+    Regroupe une suite d'elements en paquets.
+
+    Args:
+        elements: Suite quelconque (par exemple de configurations)
+        taille: Nombre d'elements par paquet
+
+    Yields:
+        Des listes d'au plus taille elements
+    """
+    iterateur = iter(elements)
+    while True:
+        paquet = list(islice(iterateur, taille))
+        if not paquet:
+            return
+        yield paquet
+
+
+def traiter_lot(chemin_entree: str, chemin_sortie: str,
+                classe_moteur=MoteurInference, seuil_confiance: float = 0.4,
+                k: Optional[int] = 3, nb_processus: Optional[int] = None,
+                taille_paquet: int = 500, format_entree: Optional[str] = None,
+                fichiers_regles: Optional[List[str]] = None,
+                fichier_instantane: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Estime toutes les configurations d'un fichier sur un pool de processus.
+
+    Au plus 2 x nb_processus paquets sont en cours a la fois : la memoire
+    reste bornee et le paquet le plus ancien est ecrit des qu'il est
+    termine, ce qui conserve l'ordre du fichier d'entree.
+
+    Args:
+        chemin_entree: Fichier JSONL ou CSV des configurations
+        chemin_sortie: Fichier JSONL des resultats
+        classe_moteur: Classe du moteur d'inference (defaut: MoteurInference)
+        seuil_confiance: Seuil minimum de confiance (defaut: 0.4)
+        k: Nombre d'estimations par configuration (defaut: 3, None = toutes)
+        nb_processus: Nombre de processus (defaut: nombre de coeurs)
+        taille_paquet: Nombre de configurations par paquet (defaut: 500)
+        format_entree: "jsonl" ou "csv" (defaut: deduit de l'extension)
+        fichiers_regles: Fichiers de regles JSON (defaut: regles predefinies)
+        fichier_instantane: Instantane binaire des fichiers de regles, charge
+                            par chaque processus (voir instantane_binaire.py)
+
+    Returns:
+        Dictionnaire {configurations, invalides, paquets, processus, duree}
+    """
+    nb_processus = nb_processus or os.cpu_count() or 1
+    max_en_cours = 2 * nb_processus
+    bilan = {"configurations": 0, "invalides": 0, "paquets": 0, "processus": nb_processus}
+    debut = time.perf_counter()
+
+    def ecrire(futur) -> None:
+        texte, nb_invalides = futur.result()
+        sortie.write(texte)
+        bilan["invalides"] += nb_invalides
+
+    configurations = lire_configurations(chemin_entree, BaseFaits(), format_entree)
+    with ProcessPoolExecutor(max_workers=nb_processus,
+                             initializer=_initialiser_travailleur,
+                             initargs=(classe_moteur, seuil_confiance, k, fichiers_regles,
+                                       fichier_instantane)) as pool, \
+            open(chemin_sortie, "w", encoding="utf-8") as sortie:
+        en_cours = deque()
+        for paquet in decouper(configurations, taille_paquet):
+            en_cours.append(pool.submit(_estimer_paquet, paquet))
+            bilan["configurations"] += len(paquet)
+            bilan["paquets"] += 1
+            if len(en_cours) >= max_en_cours:
+                ecrire(en_cours.popleft())
+        while en_cours:
+            ecrire(en_cours.popleft())
+
+    bilan["duree"] = time.perf_counter() - debut
+    return bilan